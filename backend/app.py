@@ -4,51 +4,199 @@ Flask API服务器
 """
 
 import base64
+import codecs
+import csv
+import importlib.util
 import io
 import json
+import logging
+import math
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from functools import partial
+from logging.handlers import RotatingFileHandler
 
-import matplotlib
-import pandas as pd
-from flask import Flask, jsonify, request, send_file
+import numpy as np
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from werkzeug.exceptions import BadRequest, HTTPException
 
-matplotlib.use("Agg")  # 使用非GUI后端
-import logging
-from logging.handlers import RotatingFileHandler
-
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-import seaborn as sns
-from plotly.utils import PlotlyJSONEncoder
-
+from columnar_export import (
+    BATCH_EXPORT_FIELDS,
+    EXTENSIONS,
+    MIMETYPES,
+    PORTFOLIO_SCHEDULE_FIELDS,
+    SCHEDULE_FIELDS,
+    schedule_columns,
+    write_table,
+)
+from excel_export import CURRENCY_FORMAT, PERCENT_FORMAT, XLSX_MIMETYPE, ExcelWriter, currency_cell, percent_cell
+from grid_engine import GRID_METHODS
 from lease_calculator import LeaseCalculator
+from micro_batch import MicroBatcher
+from result_cache import CACHE_VERSION, CacheBackendError, cache_key, create_cache, params_digest
+from schedule import Schedule
+from single_flight import SingleFlight, default_lock_dir
 
 # 设置前端构建目录
 FRONTEND_BUILD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../frontend"))
 
-app = Flask(__name__, static_folder=FRONTEND_BUILD_DIR, static_url_path="")
-CORS(app)  # 允许跨域请求
 
-# 配置日志
-if not app.debug:
-    if not os.path.exists("logs"):
-        os.mkdir("logs")
-    file_handler = RotatingFileHandler("logs/lease-calculator.log", maxBytes=10240000, backupCount=10)
+class LeaseJSONProvider(DefaultJSONProvider):
+    """JSON序列化：列式还款计划仅在响应边界转换为逐期字典列表"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Schedule):
+            return o.to_dicts()
+        return DefaultJSONProvider.default(o)
+
+
+# 与应用的 app.logger 为同一日志记录器（Flask以模块名命名）
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 日志文件（环境变量 LOG_FILE，相对路径以工作目录为准；设为空时不写日志文件）
+LOG_FILE = os.environ.get("LOG_FILE", "logs/lease-calculator.log")
+
+
+def configure_file_logging(flask_app):
+    """非调试模式下日志写入 LOG_FILE；同一进程多次创建应用时只添加一次"""
+    if flask_app.debug or not LOG_FILE:
+        return
+    if any(isinstance(handler, RotatingFileHandler) for handler in logger.handlers):
+        return
+    log_dir = os.path.dirname(LOG_FILE)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10240000, backupCount=10)
     file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"))
     file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info("融资租赁计算器启动")
+    logger.addHandler(file_handler)
+    logger.info("融资租赁计算器启动")
+
+# 接口按依赖划分为蓝图，由 create_app 注册：core 为只依赖numpy的计算接口，frontend 为前端页面，
+# charts（需要plotly）、exports（Excel、CSV导出）、arrow（Parquet、Arrow导出，需要pyarrow）为可选功能
+core = Blueprint("core", __name__)
+charts = Blueprint("charts", __name__)
+exports = Blueprint("exports", __name__)
+arrow = Blueprint("arrow", __name__)
+frontend = Blueprint("frontend", __name__)
 
 # 创建计算器实例
-calculator = LeaseCalculator()
+calculator = LeaseCalculator(engine="numpy")
+
+# 计算结果缓存：LEASE_CACHE_BACKEND 选择后端（memory/sqlite/redis/none，默认memory），
+# LEASE_CACHE_URL 为SQLite文件路径或Redis地址，LEASE_CACHE_SIZE、LEASE_CACHE_TTL 为条目数上限与过期秒数
+try:
+    result_cache = create_cache(
+        os.environ.get("LEASE_CACHE_BACKEND", "memory"),
+        url=os.environ.get("LEASE_CACHE_URL"),
+        max_entries=int(os.environ.get("LEASE_CACHE_SIZE") or 1024),
+        ttl=float(os.environ.get("LEASE_CACHE_TTL") or 3600),
+    )
+except (ValueError, CacheBackendError) as e:
+    logger.warning(f"结果缓存未启用: {e}")
+    result_cache = None
+
+# 结果存储：/api/calculate 的完整结果按结果ID保存，供导出、图表接口引用（条目被淘汰后按 export_data 重新计算）；
+# LEASE_RESULT_STORE_BACKEND 等环境变量含义同结果缓存，多worker部署时宜用 sqlite/redis 共享
+try:
+    result_store = create_cache(
+        os.environ.get("LEASE_RESULT_STORE_BACKEND", "memory"),
+        url=os.environ.get("LEASE_RESULT_STORE_URL"),
+        max_entries=int(os.environ.get("LEASE_RESULT_STORE_SIZE") or 256),
+        ttl=float(os.environ.get("LEASE_RESULT_STORE_TTL") or 3600),
+        name="results",
+    )
+except (ValueError, CacheBackendError) as e:
+    logger.warning(f"结果存储未启用，导出、图表接口按 export_data 重新计算: {e}")
+    result_store = None
+
+# 请求微批处理：LEASE_MICROBATCH_WINDOW_MS 为收集窗口（毫秒，默认0不启用），LEASE_MICROBATCH_SIZE 为每批上限。
+# 只需汇总指标的等额年金法、等额本金法请求在窗口内合并，由 calculate_summaries 一次计算；
+# 批次只在同一worker进程的线程之间合并，单批大小受gunicorn每进程线程数限制
+MICROBATCH_WINDOW_MS = float(os.environ.get("LEASE_MICROBATCH_WINDOW_MS") or 0)
+MICROBATCH_METHODS = ("equal_annuity", "equal_principal")
+micro_batcher = None
+if MICROBATCH_WINDOW_MS > 0:
+    micro_batcher = MicroBatcher(
+        calculator.calculate_summaries,
+        window=MICROBATCH_WINDOW_MS / 1000,
+        max_size=int(os.environ.get("LEASE_MICROBATCH_SIZE") or 256),
+    )
+
+# 重复请求合并：LEASE_SINGLE_FLIGHT 为 thread（默认，只在进程内合并）、process（同一主机各worker进程之间也合并，
+# 每次计算都需加文件锁，多worker且重复请求较多时才值得启用）或 none，
+# LEASE_SINGLE_FLIGHT_DIR 为跨进程合并的锁目录（默认系统临时目录下按用户区分）
+SINGLE_FLIGHT_MODE = os.environ.get("LEASE_SINGLE_FLIGHT", "thread")
+single_flight = None
+if SINGLE_FLIGHT_MODE == "process":
+    try:
+        single_flight = SingleFlight(os.environ.get("LEASE_SINGLE_FLIGHT_DIR") or default_lock_dir())
+    except (ValueError, OSError) as e:
+        logger.warning(f"跨进程请求合并未启用，只在进程内合并: {e}")
+        single_flight = SingleFlight()
+elif SINGLE_FLIGHT_MODE == "thread":
+    single_flight = SingleFlight()
+elif SINGLE_FLIGHT_MODE != "none":
+    logger.warning(f"不支持的请求合并方式: {SINGLE_FLIGHT_MODE}，未启用")
+
+# 可选功能的蓝图及其依赖：依赖在首次使用时导入，不计入worker启动耗时与内存
+OPTIONAL_FEATURES = {
+    "charts": (charts, ("plotly.graph_objects", "plotly.utils")),
+    "exports": (exports, ()),
+    "arrow": (arrow, ("pyarrow", "pyarrow.ipc", "pyarrow.parquet")),
+}
+
+
+def feature_available(name):
+    """可选功能的依赖是否均已安装（只查找顶层包，不导入）"""
+    return all(importlib.util.find_spec(module.split(".")[0]) is not None for module in OPTIONAL_FEATURES[name][1])
+
+
+def warm_up(features=None):
+    """
+    预先导入可选功能的依赖，首个导出、图表请求不再承担导入耗时
+
+    Args:
+        features: 可选功能名，默认为依赖已安装的全部可选功能
+    """
+    if features is None:
+        features = [name for name in OPTIONAL_FEATURES if feature_available(name)]
+    for name in features:
+        for module in OPTIONAL_FEATURES[name][1]:
+            importlib.import_module(module)
 
 
-@app.route("/api/health", methods=["GET"])
+class InvalidParameterError(Exception):
+    """计算参数错误（接口返回400）；与结果一样在合并的请求间共享"""
+
+
+class ResultNotFoundError(Exception):
+    """结果ID对应的结果不存在或已被淘汰，且请求未附带可重新计算的 export_data（接口返回404）"""
+
+
+def run_single_flight(key, func):
+    """键相同的并发请求只执行一次 func，共享其结果或异常（未启用时直接执行）"""
+    if single_flight is None:
+        return func()
+    return single_flight.do(key, func)
+
+
+def serialized_success_response(serialized):
+    """已序列化的结果（JSON字节串）直接拼入成功响应，不再反序列化、重新序列化还款计划"""
+    timestamp = json.dumps(datetime.now().isoformat())
+    body = f'{{"data":{serialized.decode("utf-8")},"status":"success","timestamp":{timestamp}}}\n'
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+
+@core.route("/api/health", methods=["GET"])
 def health_check():
     """健康检查接口"""
     return jsonify(
@@ -60,6 +208,13 @@ def health_check():
     )
 
 
+@core.route("/api/features", methods=["GET"])
+def get_features():
+    """可选功能（图表、导出）是否可用：依赖未安装或未启用时相应接口未注册"""
+    features = {name: name in current_app.blueprints for name in OPTIONAL_FEATURES}
+    return jsonify({"status": "success", "data": features, "timestamp": datetime.now().isoformat()})
+
+
 # 字段映射表 - 英文到中文
 FIELD_MAPPING = {
     # 基本信息字段
@@ -125,18 +280,18 @@ def extract_missing_params(data):
 
     # 从还款计划推导参数
     if "schedule" in data and data["schedule"]:
-        schedule = data["schedule"]
+        schedule = Schedule.from_records(data["schedule"])
         extracted["periods"] = len(schedule)
 
         # 从第一期推导本金（通过累计本金）
         if len(schedule) > 0:
-            total_principal = sum(item.get("principal", 0) for item in schedule)
+            total_principal = sum(schedule.principal.tolist())
             extracted["pv"] = total_principal
 
         # 从利息计算推导年利率（粗略估算）
         if len(schedule) > 1 and "pv" in extracted:
-            first_interest = schedule[0].get("interest", 0)
-            first_balance = schedule[0].get("remaining_balance", 0) + schedule[0].get("principal", 0)
+            first_interest = schedule.interest.item(0)
+            first_balance = schedule.remaining_balance.item(0) + schedule.principal.item(0)
             if first_balance > 0:
                 monthly_rate = first_interest / first_balance
                 extracted["annual_rate"] = monthly_rate * 12
@@ -198,16 +353,299 @@ def translate_result_fields(data):
         return data
 
 
-# 设置中文字体
-plt.rcParams["font.sans-serif"] = ["SimHei", "DejaVu Sans"]
-plt.rcParams["axes.unicode_minus"] = False
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# 流式响应每次写出的缓冲大小（字节），以及逐块序列化还款计划的期数
+NDJSON_BUFFER_SIZE = 64 * 1024
+SCHEDULE_STREAM_CHUNK = 256
+
+
+def wants_ndjson():
+    """是否以NDJSON流式返回：查询参数 stream=1 或 Accept 首选 application/x-ndjson"""
+    if request.args.get("stream", "").lower() in ("1", "true", "ndjson"):
+        return True
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(records):
+    """
+    NDJSON流式响应：记录在生成时才序列化，按缓冲大小分批写出；
+    生成过程中出错时以一条 {"type": "error"} 记录结束
+    """
+
+    def generate():
+        buffer, size = [], 0
+        try:
+            for record in records:
+                line = current_app.json.dumps(record) + "\n"
+                buffer.append(line)
+                size += len(line)
+                if size >= NDJSON_BUFFER_SIZE:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+        except Exception as e:
+            buffer.append(current_app.json.dumps({"type": "error", "message": str(e)}) + "\n")
+        if buffer:
+            yield "".join(buffer)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def iter_schedule_records(schedule):
+    """
+    还款计划逐期记录，每次只把一小段列数组转换为字典
+
+    schedule 为完整的 Schedule，或 LeaseCalculator.iter_schedule 按需生成的 Schedule 分块迭代器
+    """
+    chunks = schedule
+    if isinstance(schedule, Schedule):
+        chunks = (schedule[start : start + SCHEDULE_STREAM_CHUNK] for start in range(0, len(schedule), SCHEDULE_STREAM_CHUNK))
+    for chunk in chunks:
+        for row in chunk.to_dicts():
+            yield {"type": "schedule", **row}
+
+
+def iter_calculation_records(result, schedule=None):
+    """
+    单笔计算的NDJSON记录：首行header为不含还款计划的结果，其后逐期schedule记录（冲抵后的租金）
+
+    结果中不含还款计划时，逐期记录取自 schedule（惰性生成的分块迭代器）
+    """
+    schedule = result.pop("schedule", schedule)
+    offset_result = result.get("guarantee_offset")
+    if offset_result:
+        # 冲抵后的租金已体现在逐期记录中，header只保留冲抵汇总
+        result["guarantee_offset"] = {
+            "unused_guarantee": offset_result["unused_guarantee"],
+            "total_offset": offset_result["total_offset"],
+        }
+    yield {"type": "header", "status": "success", "data": result, "timestamp": datetime.now().isoformat()}
+    if schedule is not None:
+        yield from iter_schedule_records(schedule)
+
+
+def calculation_params(data):
+    """
+    请求参数规范化为计算参数，即结果中的 export_data
+
+    计算结果由这些参数完全确定：结果存储中的条目被淘汰后据此重新生成
+
+    Raises:
+        KeyError: 缺少必要参数
+        ValueError, TypeError: 参数类型错误
+    """
+    params = {
+        "method": data["method"],
+        "pv": float(data["pv"]),
+        "annual_rate": float(data["annual_rate"]),
+        "periods": int(data["periods"]),
+        "frequency": int(data.get("frequency", 12)),  # 默认月付
+        "guarantee": float(data.get("guarantee", 0)),
+        "guarantee_mode": data.get("guarantee_mode", "尾期冲抵"),
+    }
+    if params["method"] == "floating_rate":
+        params["rate_reset_schedule"] = data.get("rate_reset_schedule", [])
+    if "years" in data:
+        params["years"] = data["years"]
+    return params
+
+
+def result_identity(params):
+    """决定计算结果的参数：各方法忽略的参数不计入（用于结果ID与缓存键）"""
+    guarantee = params["guarantee"]
+    return {
+        "method": params["method"],
+        "pv": params["pv"],
+        "annual_rate": params["annual_rate"],
+        "periods": params["periods"],
+        "frequency": params["frequency"],
+        "guarantee": guarantee if guarantee > 0 else None,
+        "guarantee_mode": params["guarantee_mode"] if guarantee > 0 else None,
+        "rate_reset_schedule": params.get("rate_reset_schedule"),
+        "years": params.get("years") if params["method"] == "flat_rate" else None,
+    }
+
+
+def result_store_key(result_id):
+    """结果存储中的键：结果结构变化（CACHE_VERSION递增）后旧条目不再命中"""
+    return f"result:v{CACHE_VERSION}:{result_id}"
+
+
+def compute_result(params, summary_only=False, window=None, stream=False):
+    """
+    单笔租赁计算结果（/api/calculate 响应的data部分）
+
+    Args:
+        params: calculation_params 规范化的计算参数
+        summary_only: 只返回汇总指标
+        window: 还款计划窗口 (from_period, to_period)
+        stream: 流式响应；无需冲抵时还款计划不放入结果，另返回按需生成的分块迭代器
+
+    Returns:
+        Tuple: (结果, 还款计划分块迭代器或None)
+
+    Raises:
+        InvalidParameterError: 参数错误
+    """
+    method, pv, annual_rate, periods, frequency = (
+        params[name] for name in ("method", "pv", "annual_rate", "periods", "frequency")
+    )
+    guarantee, guarantee_mode = params["guarantee"], params["guarantee_mode"]
+    rate_reset_schedule = params.get("rate_reset_schedule")
+
+    # 仅需汇总指标时不生成还款计划；保证金冲抵依赖逐期租金，此时仍完整计算后只返回汇总
+    summary_kwargs = {"summary_only": True} if summary_only and guarantee <= 0 else {}
+
+    # 无需冲抵时只算汇总：窗口内各期直接计算；流式返回时还款计划在写出响应时按需逐块生成，内存占用与期数无关
+    direct_schedule = not summary_only and guarantee <= 0 and "years" not in params
+    if direct_schedule and (window or stream):
+        summary_kwargs = {"summary_only": True}
+
+    schedule_chunks = None
+    try:
+        if micro_batcher is not None and summary_kwargs and method in MICROBATCH_METHODS:
+            result = micro_batcher.submit((method, pv, annual_rate, periods, frequency))
+        elif method == "equal_annuity":
+            result = calculator.equal_annuity_method(pv, annual_rate, periods, frequency, **summary_kwargs)
+        elif method == "equal_principal":
+            result = calculator.equal_principal_method(pv, annual_rate, periods, frequency, **summary_kwargs)
+        elif method == "flat_rate":
+            years = float(params.get("years", periods / frequency))
+            result = calculator.flat_rate_method(pv, annual_rate, years, frequency, **summary_kwargs)
+        elif method == "floating_rate":
+            result = calculator.floating_rate_method(
+                pv, annual_rate, periods, rate_reset_schedule, frequency, **summary_kwargs
+            )
+        else:
+            raise ValueError(f"不支持的计算方法: {method}")
+
+        if direct_schedule and window:
+            result["schedule"] = calculator.schedule_window(
+                method,
+                pv,
+                annual_rate,
+                periods,
+                *window,
+                frequency=frequency,
+                rate_reset_schedule=rate_reset_schedule,
+            )
+        elif direct_schedule and stream:
+            schedule_chunks = calculator.iter_schedule(
+                method,
+                pv,
+                annual_rate,
+                periods,
+                frequency,
+                rate_reset_schedule,
+                chunk_size=SCHEDULE_STREAM_CHUNK,
+            )
+    except (ValueError, TypeError) as e:
+        raise InvalidParameterError(f"参数错误: {str(e)}")
+
+    # 处理保证金冲抵
+    if guarantee > 0:
+        offset_result = calculator.apply_guarantee_offset(result["schedule"], guarantee, guarantee_mode)
+        result["guarantee_offset"] = offset_result
+
+    # 计算IRR（只算汇总时结果中已含按全部租金计算的IRR）
+    if "schedule" in result and "irr" not in result:
+        cash_flows = [-pv] + result["schedule"].payment.tolist()
+        result["irr"] = calculator.calculate_irr(cash_flows, frequency, guess=annual_rate / frequency)
+
+    if summary_only and "schedule" in result:
+        del result["schedule"]
+        offset_result = result.get("guarantee_offset")
+        if offset_result:
+            result["guarantee_offset"] = {
+                "unused_guarantee": offset_result["unused_guarantee"],
+                "total_offset": offset_result["total_offset"],
+            }
+
+    if window:
+        from_period, to_period = window
+        if not direct_schedule:
+            # 需冲抵时已完整计算（IRR按冲抵后的全部租金），此处截取窗口
+            result["schedule"] = result["schedule"][from_period - 1 : to_period]
+        offset_result = result.get("guarantee_offset")
+        if offset_result:
+            result["guarantee_offset"] = {
+                "unused_guarantee": offset_result["unused_guarantee"],
+                "total_offset": offset_result["total_offset"],
+                "offset_details": [
+                    item for item in offset_result["offset_details"] if from_period <= item["period"] <= to_period
+                ],
+            }
+        result["schedule_window"] = {"from_period": from_period, "to_period": to_period, "total_periods": periods}
+
+    # 添加原始数据到结果中，用于导出；结果ID供导出、图表接口引用完整结果
+    result["export_data"] = dict(params)
+    result["result_id"] = params_digest(result_identity(params))
+    return result, schedule_chunks
+
+
+def store_full_result(params):
+    """计算完整结果（含还款计划）并存入结果存储，返回序列化后的结果"""
+    result, _ = compute_result(params)
+    serialized = current_app.json.dumps(result, separators=(",", ":")).encode("utf-8")
+    if result_store is not None:
+        result_store.set(result_store_key(result["result_id"]), serialized)
+    return serialized
+
+
+def load_result(result_id, export_data=None):
+    """
+    按结果ID取完整结果
+
+    条目已被淘汰（或由其他worker进程计算、未共享存储）时，按请求附带的 export_data 确定性地重新计算；
+    export_data 与结果ID不一致时视为参数错误
+
+    Raises:
+        ResultNotFoundError: 结果不存在且未附带 export_data
+        InvalidParameterError: export_data 无效或与结果ID不一致
+    """
+    if not isinstance(result_id, str) or len(result_id) != 64:
+        raise InvalidParameterError("结果ID无效")
+    serialized = result_store.get(result_store_key(result_id)) if result_store is not None else None
+    if serialized is None:
+        if not export_data:
+            raise ResultNotFoundError(f"结果不存在或已过期: {result_id}")
+        try:
+            params = calculation_params(export_data)
+        except (KeyError, ValueError, TypeError) as e:
+            raise InvalidParameterError(f"export_data 无效: {str(e)}")
+        if params_digest(result_identity(params)) != result_id:
+            raise InvalidParameterError("export_data 与结果ID不一致")
+        serialized = run_single_flight(result_store_key(result_id), partial(store_full_result, params))
+    return json.loads(serialized)
+
+
+def resolve_result(data):
+    """
+    导出、图表接口的结果数据
+
+    请求含 result_id 时取完整结果，请求中的其他字段（如 initial_payment）覆盖在结果之上；
+    否则即为请求提交的完整结果
+    """
+    if not isinstance(data, dict) or "result_id" not in data:
+        return data
+    result = load_result(data["result_id"], data.get("export_data"))
+    result.update((name, value) for name, value in data.items() if name not in ("result_id", "export_data"))
+    return result
+
+
+def result_reference_error(e):
+    """按结果ID引用结果失败：结果不存在返回404，结果ID或 export_data 无效返回400"""
+    status = 404 if isinstance(e, ResultNotFoundError) else 400
+    return jsonify({"status": "error", "message": str(e), "timestamp": datetime.now().isoformat()}), status
 
 
-@app.route("/api/calculate", methods=["POST"])
+@core.route("/api/calculate", methods=["POST"])
 def calculate_lease():
     """
     核心计算接口
     支持多种计算方法：等额年金法、等额本金法、平息法、浮动利率法
+    请求NDJSON（Accept: application/x-ndjson 或 ?stream=1）时先返回汇总header，再逐期流式返回还款计划
+    结果中的 result_id 可代替完整结果提交给导出、图表接口
     """
     try:
         # 检查JSON格式并捕获BadRequest
@@ -225,61 +663,358 @@ def calculate_lease():
             if param not in data:
                 return jsonify({"error": f"缺少必要参数: {param}"}), 400
 
-        method = data["method"]
         try:
-            pv = float(data["pv"])
-            annual_rate = float(data["annual_rate"])
-            periods = int(data["periods"])
-            frequency = int(data.get("frequency", 12))  # 默认月付
+            params = calculation_params(data)
         except (ValueError, TypeError, KeyError) as e:
             return jsonify({"error": f"参数类型错误: {str(e)}"}), 400
+        periods = params["periods"]
 
-        result = None
+        if params["method"] not in LeaseCalculator.METHODS:
+            return jsonify({"error": f"不支持的计算方法: {params['method']}"}), 400
 
-        try:
-            if method == "equal_annuity":
-                result = calculator.equal_annuity_method(pv, annual_rate, periods, frequency)
-            elif method == "equal_principal":
-                result = calculator.equal_principal_method(pv, annual_rate, periods, frequency)
-            elif method == "flat_rate":
-                years = float(data.get("years", periods / frequency))
-                result = calculator.flat_rate_method(pv, annual_rate, years, frequency)
-            elif method == "floating_rate":
-                rate_reset_schedule = data.get("rate_reset_schedule", [])
-                result = calculator.floating_rate_method(pv, annual_rate, periods, rate_reset_schedule, frequency)
+        summary_only = bool(data.get("summary_only", False))
+
+        # 还款计划窗口（分页查询）：只返回第 from_period 至 to_period 期
+        window = None
+        if not summary_only and ("from_period" in data or "to_period" in data):
+            try:
+                from_period = int(data.get("from_period", 1))
+                to_period = min(int(data.get("to_period", periods)), periods)
+            except (ValueError, TypeError) as e:
+                return jsonify({"error": f"参数类型错误: {str(e)}"}), 400
+            if not 1 <= from_period <= to_period:
+                return jsonify({"error": "还款计划窗口无效，应满足 1 ≤ from_period ≤ to_period 且起始期不超过总期数"}), 400
+            window = (from_period, to_period)
+
+        if wants_ndjson():
+            try:
+                result, schedule_chunks = compute_result(params, summary_only, window, stream=True)
+            except InvalidParameterError as e:
+                return jsonify({"error": str(e)}), 400
+            return ndjson_response(iter_calculation_records(result, schedule_chunks))
+
+        # 相同参数的结果直接取自缓存（流式响应不缓存）
+        result_key = cache_key({**result_identity(params), "summary_only": summary_only, "window": window})
+        if result_cache is not None:
+            cached = result_cache.get(result_key)
+            if cached is not None:
+                response = serialized_success_response(cached)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+        def compute_serialized():
+            if not summary_only and window is None:
+                serialized = store_full_result(params)
             else:
-                return jsonify({"error": f"不支持的计算方法: {method}"}), 400
-        except (ValueError, TypeError) as e:
-            return jsonify({"error": f"参数错误: {str(e)}"}), 400
+                serialized = current_app.json.dumps(compute_result(params, summary_only, window)[0], separators=(",", ":"))
+                serialized = serialized.encode("utf-8")
+            if result_cache is not None:
+                result_cache.set(result_key, serialized)
+            return serialized
 
-        # 处理保证金冲抵
-        guarantee = float(data.get("guarantee", 0))
-        guarantee_mode = data.get("guarantee_mode", "尾期冲抵")
+        # 键相同的并发请求（含同一主机其他worker进程的请求）只计算一次，共享序列化后的结果
+        try:
+            serialized = run_single_flight(result_key, compute_serialized)
+        except InvalidParameterError as e:
+            return jsonify({"error": str(e)}), 400
+
+        response = serialized_success_response(serialized)
+        if result_cache is not None:
+            response.headers["X-Cache"] = "MISS"
+        return response
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": str(e),
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            500,
+        )
 
-        if guarantee > 0:
-            offset_result = calculator.apply_guarantee_offset(result["schedule"], guarantee, guarantee_mode)
-            result["guarantee_offset"] = offset_result
-
-        # 计算IRR
-        if "schedule" in result:
-            cash_flows = [-pv] + [item["payment"] for item in result["schedule"]]
-            result["irr"] = calculator.calculate_irr(cash_flows, frequency)
-
-        # 添加原始数据到结果中，用于导出
-        result["export_data"] = {
-            "method": method,
-            "pv": pv,
-            "annual_rate": annual_rate,
-            "periods": periods,
-            "frequency": frequency,
-            "guarantee": guarantee,
-            "guarantee_mode": guarantee_mode,
-        }
 
+@core.route("/api/cache/stats", methods=["GET"])
+def cache_stats():
+    """结果缓存统计：命中/未命中计数、条目数（共享后端为各worker进程合计）"""
+    stats = result_cache.stats() if result_cache is not None else {"backend": "none"}
+    return jsonify({"status": "success", "data": stats, "timestamp": datetime.now().isoformat()})
+
+
+@core.route("/api/single_flight/stats", methods=["GET"])
+def single_flight_stats():
+    """重复请求合并统计：本worker进程执行的计算次数，共享同进程、其他进程结果的请求数"""
+    stats = single_flight.stats() if single_flight is not None else {"scope": "none"}
+    return jsonify({"status": "success", "data": stats, "timestamp": datetime.now().isoformat()})
+
+
+@core.route("/api/microbatch/stats", methods=["GET"])
+def microbatch_stats():
+    """请求微批处理统计：批次大小分布、平均批次大小、排队等待时间（处理该请求的worker进程）"""
+    stats = {"enabled": True, **micro_batcher.stats()} if micro_batcher is not None else {"enabled": False}
+    return jsonify({"status": "success", "data": stats, "timestamp": datetime.now().isoformat()})
+
+
+# 单次批量计算的最大租赁笔数
+BATCH_MAX_ROWS = 100000
+
+# 批量计算中期数、年付次数的上限：超出的租赁记为参数错误，不影响同批其他租赁
+BATCH_MAX_PERIODS = 10**6
+
+# 流式批量计算每块的租赁笔数（返回还款计划时取较小的块以限制内存）
+BATCH_STREAM_CHUNK = 1024
+BATCH_STREAM_SCHEDULE_CHUNK = 64
+
+# 上传的CSV转存时保留在内存中的上限（字节），超出后写入临时文件
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
+BATCH_RESULT_FIELDS = ("pmt", "total_interest", "total_payment", "irr", "unused_guarantee", "total_offset")
+
+# 批量计算的进程数（环境变量 LEASE_BATCH_WORKERS）；大于1时超过一块的批量请求分发到进程池
+BATCH_WORKERS = int(os.environ.get("LEASE_BATCH_WORKERS") or 0)
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def get_batch_executor():
+    """按需创建批量计算进程池（每个服务进程一个）"""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            from parallel_engine import ParallelExecutor
+
+            _batch_executor = ParallelExecutor(workers=BATCH_WORKERS)
+        return _batch_executor
+
+
+def parse_batch_row(row):
+    """
+    解析批量计算中的一笔租赁参数（JSON对象或CSV行），CSV中的空值按未填写处理
+
+    Returns:
+        tuple: (method, pv, annual_rate, periods, frequency, guarantee, guarantee_mode, rate_reset_schedule)
+
+    Raises:
+        ValueError: 缺少必要参数或参数类型错误
+    """
+    if not isinstance(row, dict):
+        raise ValueError("租赁参数必须为对象")
+    row = {key: value for key, value in row.items() if value not in (None, "")}
+
+    for param in ("method", "pv", "annual_rate", "periods"):
+        if param not in row:
+            raise ValueError(f"缺少必要参数: {param}")
+
+    rate_reset_schedule = row.get("rate_reset_schedule")
+    if isinstance(rate_reset_schedule, str):
+        # CSV中的利率重置计划以JSON字符串填写
+        try:
+            rate_reset_schedule = json.loads(rate_reset_schedule)
+        except json.JSONDecodeError:
+            raise ValueError("利率重置计划不是有效的JSON格式") from None
+
+    try:
+        parsed = (
+            str(row["method"]).strip(),
+            float(row["pv"]),
+            float(row["annual_rate"]),
+            int(float(row["periods"])),
+            int(float(row.get("frequency", 12))),
+            float(row.get("guarantee", 0)),
+            str(row.get("guarantee_mode", "尾期冲抵")).strip(),
+            rate_reset_schedule,
+        )
+    except (ValueError, TypeError, OverflowError) as e:
+        raise ValueError(f"参数类型错误: {str(e)}") from None
+
+    # 期数、年付次数需能存入int64列，过大的值按参数错误处理（不大于0的由计算方法给出错误信息）
+    for label, value in (("期数", parsed[3]), ("年付次数", parsed[4])):
+        if value > BATCH_MAX_PERIODS:
+            raise ValueError(f"{label}超出范围: {value}，至多 {BATCH_MAX_PERIODS}")
+    return parsed
+
+
+def read_batch_leases():
+    """
+    读取批量计算请求中的租赁参数：JSON数组（或 {"leases": [...]}），CSV上传或text/csv请求体
+
+    Returns:
+        tuple: (租赁参数的可迭代对象, include_schedule)；CSV按行惰性解码、解析
+
+    Raises:
+        ValueError: 请求体格式错误
+    """
+    include_schedule = request.args.get("include_schedule", "").lower() in ("1", "true")
+
+    upload = request.files.get("file")
+    if upload is not None:
+        # 上传文件在视图返回时即被关闭，先转存到自有的临时文件，供流式响应逐行读取
+        stream = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+        shutil.copyfileobj(upload.stream, stream)
+        stream.seek(0)
+        return csv.DictReader(codecs.iterdecode(stream, "utf-8-sig")), include_schedule
+    if request.mimetype == "text/csv":
+        return csv.DictReader(codecs.iterdecode(request.stream, "utf-8-sig")), include_schedule
+
+    try:
+        data = request.get_json()
+    except BadRequest:
+        raise ValueError("请求体不是有效的JSON格式") from None
+    if isinstance(data, dict):
+        include_schedule = include_schedule or bool(data.get("include_schedule", False))
+        data = data.get("leases")
+    if not isinstance(data, list):
+        raise ValueError("请求体必须为租赁参数数组")
+    return data, include_schedule
+
+
+def run_calculate_batch(parsed, include_schedule):
+    """
+    计算已解析的一块批量租赁；启用进程池且超过一个分片时分发到进程池
+
+    Args:
+        parsed: parse_batch_row 的结果列表
+        include_schedule: 是否返回还款计划
+
+    Returns:
+        Dict: calculate_batch 的结果数组
+    """
+    columns = list(zip(*parsed))
+    executor = get_batch_executor() if BATCH_WORKERS > 1 and not include_schedule else None
+    if executor is not None and len(parsed) > executor.chunk_size:
+        batch_function = executor.calculate_batch
+    else:
+        batch_function = partial(calculator.calculate_batch, include_schedule=include_schedule)
+    batch_kwargs = {
+        "pv": columns[1],
+        "annual_rate": columns[2],
+        "periods": columns[3],
+        "frequency": columns[4],
+        "method": columns[0],
+        "guarantee": columns[5],
+        "guarantee_mode": columns[6],
+        "rate_reset_schedule": list(columns[7]),
+    }
+    try:
+        return batch_function(**batch_kwargs)
+    except BrokenProcessPool:
+        logger.warning("批量计算进程池异常，改为在当前进程计算")
+        return calculator.calculate_batch(**batch_kwargs)
+
+
+def calculate_batch_slots(slots, include_schedule):
+    """
+    计算一块批量租赁，按输入顺序逐笔产出结果
+
+    Args:
+        slots: [(序号, parse_batch_row的结果或解析错误信息)]
+        include_schedule: 是否返回还款计划
+    """
+    parsed = [params for _, params in slots if not isinstance(params, str)]
+    if parsed:
+        batch = run_calculate_batch(parsed, include_schedule)
+        values = {name: batch[name].tolist() for name in BATCH_RESULT_FIELDS}
+
+    k = 0
+    for index, params in slots:
+        if isinstance(params, str):
+            yield {"index": index, "status": "error", "message": params}
+            continue
+        error = batch["error"][k]
+        if error is not None:
+            yield {"index": index, "status": "error", "message": error}
+        else:
+            item = {"index": index, "status": "success", "method": params[0]}
+            item.update((name, values[name][k]) for name in BATCH_RESULT_FIELDS)
+            if include_schedule:
+                item["schedule"] = batch["schedule"][k]
+            yield item
+        k += 1
+
+
+def iter_batch_slots(leases, chunk_size):
+    """逐块解析批量租赁，每次产出至多 chunk_size 笔的 [(序号, parse_batch_row的结果或解析错误信息)]"""
+    slots = []
+    for index, lease in enumerate(leases):
+        if index >= BATCH_MAX_ROWS:
+            raise ValueError(f"单次批量计算最多支持{BATCH_MAX_ROWS}笔租赁")
+        try:
+            slots.append((index, parse_batch_row(lease)))
+        except ValueError as e:
+            slots.append((index, str(e)))
+        if len(slots) >= chunk_size:
+            yield slots
+            slots = []
+    if slots:
+        yield slots
+
+
+def iter_batch_results(leases, include_schedule, chunk_size):
+    """逐块解析、计算批量租赁，按输入顺序逐笔产出结果；同时在内存中的只有一块"""
+    for slots in iter_batch_slots(leases, chunk_size):
+        yield from calculate_batch_slots(slots, include_schedule)
+
+
+def batch_stream_chunk_size(include_schedule):
+    """流式批量计算每块的租赁笔数：启用进程池时每块恰好分满各进程"""
+    if include_schedule:
+        return BATCH_STREAM_SCHEDULE_CHUNK
+    if BATCH_WORKERS > 1:
+        executor = get_batch_executor()
+        return executor.chunk_size * executor.workers + 1
+    return BATCH_STREAM_CHUNK
+
+
+def iter_batch_records(leases, include_schedule):
+    """批量计算的NDJSON记录：首行header，逐笔result，末行summary"""
+    yield {"type": "header", "status": "success", "timestamp": datetime.now().isoformat()}
+
+    count = failed = 0
+    for item in iter_batch_results(leases, include_schedule, batch_stream_chunk_size(include_schedule)):
+        count += 1
+        failed += item["status"] == "error"
+        yield {"type": "result", **item}
+
+    yield {"type": "summary", "count": count, "succeeded": count - failed, "failed": failed}
+
+
+@core.route("/api/batch/calculate", methods=["POST"])
+def batch_calculate():
+    """
+    组合批量计算接口
+    请求体为租赁参数的JSON数组（或 {"leases": [...], "include_schedule": false}），
+    也可上传CSV文件（file字段）或直接提交text/csv，CSV表头与JSON字段名相同；
+    单笔参数错误只在该笔结果中报告，不影响整批计算。
+    请求NDJSON（Accept: application/x-ndjson 或 ?stream=1）时逐块计算并流式返回逐笔结果
+    """
+    try:
+        try:
+            leases, include_schedule = read_batch_leases()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if wants_ndjson():
+            return ndjson_response(iter_batch_records(leases, include_schedule))
+
+        try:
+            leases = list(leases)
+        except UnicodeDecodeError:
+            return jsonify({"error": "CSV文件必须为UTF-8编码"}), 400
+        if len(leases) > BATCH_MAX_ROWS:
+            return jsonify({"error": f"单次批量计算最多支持{BATCH_MAX_ROWS}笔租赁"}), 400
+
+        results = list(iter_batch_results(leases, include_schedule, max(len(leases), 1)))
+        failed = sum(item["status"] == "error" for item in results)
         return jsonify(
             {
                 "status": "success",
-                "data": result,
+                "data": {
+                    "count": len(results),
+                    "succeeded": len(results) - failed,
+                    "failed": failed,
+                    "results": results,
+                },
                 "timestamp": datetime.now().isoformat(),
             }
         )
@@ -296,7 +1031,7 @@ def calculate_lease():
         )
 
 
-@app.route("/api/sensitivity_analysis", methods=["POST"])
+@core.route("/api/sensitivity_analysis", methods=["POST"])
 def sensitivity_analysis_compat():
     """敏感性分析接口 - 重新设计的完整实现"""
     try:
@@ -314,26 +1049,10 @@ def sensitivity_analysis_compat():
         period_variation = int(data.get("period_variation", 6))  # 期限变动幅度
         pv_variation = float(data.get("pv_variation", 100000))  # 本金变动幅度
 
-        # 计算基准值
-        base_result = None
-        if method == "equal_annuity":
-            base_result = calculator.equal_annuity_method(pv, annual_rate, periods, frequency)
-        elif method == "equal_principal":
-            base_result = calculator.equal_principal_method(pv, annual_rate, periods, frequency)
-        else:
-            # 默认使用等额年金法
-            base_result = calculator.equal_annuity_method(pv, annual_rate, periods, frequency)
+        # 等额本金法取平均租金，其余方法按等额年金法计算
+        grid_method = "equal_principal" if method == "equal_principal" else "equal_annuity"
 
-        base_pmt = base_result["pmt"]
-
-        # 计算IRR
-        cash_flows = [-pv] + [base_pmt] * periods
-        base_irr = calculator.calculate_irr(cash_flows, frequency)
-
-        # 敏感性分析结果
-        sensitivity_analysis = []
-
-        # 1. 利率敏感性分析
+        # 敏感性情景：利率（仅保留正利率）、期限、本金各五档
         rate_scenarios = [
             annual_rate - rate_variation,  # -变动幅度
             annual_rate - rate_variation / 2,  # -变动幅度/2
@@ -341,38 +1060,7 @@ def sensitivity_analysis_compat():
             annual_rate + rate_variation / 2,  # +变动幅度/2
             annual_rate + rate_variation,  # +变动幅度
         ]
-
-        for rate in rate_scenarios:
-            if rate > 0:  # 确保利率为正
-                try:
-                    if method == "equal_annuity":
-                        result = calculator.equal_annuity_method(pv, rate, periods, frequency)
-                    else:
-                        result = calculator.equal_principal_method(pv, rate, periods, frequency)
-
-                    pmt = result["pmt"]
-                    change = rate - annual_rate
-                    payment_change = pmt - base_pmt
-                    change_rate = (payment_change / base_pmt) * 100 if base_pmt != 0 else 0
-
-                    # 计算敏感度系数：租金变动率 / 利率变动率
-                    rate_change_pct = (change / annual_rate) * 100 if annual_rate != 0 else 0
-                    sensitivity = change_rate / rate_change_pct if rate_change_pct != 0 else 0
-
-                    sensitivity_analysis.append(
-                        {
-                            "parameter": "年利率",
-                            "change": change,
-                            "payment": pmt,
-                            "payment_change": payment_change,
-                            "change_rate": change_rate,
-                            "sensitivity": sensitivity,
-                        }
-                    )
-                except Exception as e:
-                    continue
-
-        # 2. 期限敏感性分析
+        rate_scenarios = [rate for rate in rate_scenarios if rate > 0]  # 确保利率为正
         period_scenarios = [
             max(1, periods - period_variation),  # -变动期数
             max(1, periods - period_variation // 2),  # -变动期数/2
@@ -380,37 +1068,6 @@ def sensitivity_analysis_compat():
             periods + period_variation // 2,  # +变动期数/2
             periods + period_variation,  # +变动期数
         ]
-
-        for period in period_scenarios:
-            try:
-                if method == "equal_annuity":
-                    result = calculator.equal_annuity_method(pv, annual_rate, period, frequency)
-                else:
-                    result = calculator.equal_principal_method(pv, annual_rate, period, frequency)
-
-                pmt = result["pmt"]
-                change = period - periods
-                payment_change = pmt - base_pmt
-                change_rate = (payment_change / base_pmt) * 100 if base_pmt != 0 else 0
-
-                # 计算敏感度系数
-                period_change_pct = (change / periods) * 100 if periods != 0 else 0
-                sensitivity = change_rate / period_change_pct if period_change_pct != 0 else 0
-
-                sensitivity_analysis.append(
-                    {
-                        "parameter": "租赁期数",
-                        "change": change,
-                        "payment": pmt,
-                        "payment_change": payment_change,
-                        "change_rate": change_rate,
-                        "sensitivity": sensitivity,
-                    }
-                )
-            except Exception as e:
-                continue
-
-        # 3. 本金敏感性分析
         pv_scenarios = [
             max(1000, pv - pv_variation),  # -变动金额
             max(1000, pv - pv_variation / 2),  # -变动金额/2
@@ -419,38 +1076,71 @@ def sensitivity_analysis_compat():
             pv + pv_variation,  # +变动金额
         ]
 
-        for pv_test in pv_scenarios:
-            try:
-                if method == "equal_annuity":
-                    result = calculator.equal_annuity_method(pv_test, annual_rate, periods, frequency)
-                else:
-                    result = calculator.equal_principal_method(pv_test, annual_rate, periods, frequency)
+        # 基准与全部情景拼成一组参数向量，一次网格计算
+        scenarios = (
+            [("基准", pv, annual_rate, periods)]
+            + [("年利率", pv, rate, periods) for rate in rate_scenarios]
+            + [("租赁期数", pv, annual_rate, period) for period in period_scenarios]
+            + [("租赁本金", pv_test, annual_rate, periods) for pv_test in pv_scenarios]
+        )
+        grid = calculator.sensitivity_grid(
+            [item[1] for item in scenarios],
+            [item[2] for item in scenarios],
+            [item[3] for item in scenarios],
+            frequency,
+            method=grid_method,
+        )
+        valid = grid["valid"].tolist()
+        payments = grid["pmt"].tolist()
 
-                pmt = result["pmt"]
-                change = pv_test - pv
-                payment_change = pmt - base_pmt
-                change_rate = (payment_change / base_pmt) * 100 if base_pmt != 0 else 0
-
-                # 计算敏感度系数
-                pv_change_pct = (change / pv) * 100 if pv != 0 else 0
-                sensitivity = change_rate / pv_change_pct if pv_change_pct != 0 else 0
-
-                sensitivity_analysis.append(
-                    {
-                        "parameter": "租赁本金",
-                        "change": change,
-                        "payment": pmt,
-                        "payment_change": payment_change,
-                        "change_rate": change_rate,
-                        "sensitivity": sensitivity,
-                    }
-                )
-            except Exception as e:
+        if not valid[0]:
+            # 基准参数不合法时按原方法抛出相应异常
+            calculator.equal_annuity_method(pv, annual_rate, periods, frequency, summary_only=True)
+
+        base_pmt = payments[0]
+        base_irr = grid["irr"].tolist()[0]
+
+        # 敏感性分析结果
+        sensitivity_analysis = []
+        base_values = {"年利率": annual_rate, "租赁期数": periods, "租赁本金": pv}
+
+        for (parameter, pv_test, rate, period), pmt, ok in zip(scenarios[1:], payments[1:], valid[1:]):
+            if not ok:
                 continue
 
+            if parameter == "年利率":
+                change = rate - annual_rate
+            elif parameter == "租赁期数":
+                change = period - periods
+            else:
+                change = pv_test - pv
+            payment_change = pmt - base_pmt
+            change_rate = (payment_change / base_pmt) * 100 if base_pmt != 0 else 0
+
+            # 计算敏感度系数：租金变动率 / 参数变动率
+            base_value = base_values[parameter]
+            param_change_pct = (change / base_value) * 100 if base_value != 0 else 0
+            sensitivity = change_rate / param_change_pct if param_change_pct != 0 else 0
+
+            sensitivity_analysis.append(
+                {
+                    "parameter": parameter,
+                    "change": change,
+                    "payment": pmt,
+                    "payment_change": payment_change,
+                    "change_rate": change_rate,
+                    "sensitivity": sensitivity,
+                }
+            )
+
         # 计算基础信息
         total_interest = base_pmt * periods - pv
 
+        # 基准方案的解析敏感性（导数、久期、凸性），目前仅支持等额年金法
+        analytic = None
+        if grid_method == "equal_annuity":
+            analytic = calculator.analytic_sensitivities(pv, annual_rate, periods, frequency)
+
         return jsonify(
             {
                 "status": "success",
@@ -465,13 +1155,14 @@ def sensitivity_analysis_compat():
                         "total_interest": total_interest,
                     },
                     "sensitivity_results": sensitivity_analysis,
+                    "analytic_sensitivities": analytic,
                 },
                 "timestamp": datetime.now().isoformat(),
             }
         )
 
     except Exception as e:
-        app.logger.error(f"敏感性分析错误: {str(e)}")
+        logger.error(f"敏感性分析错误: {str(e)}")
         return (
             jsonify(
                 {
@@ -484,7 +1175,7 @@ def sensitivity_analysis_compat():
         )
 
 
-@app.route("/api/compare", methods=["POST"])
+@core.route("/api/compare", methods=["POST"])
 def compare_schemes():
     """多方案对比接口"""
     try:
@@ -539,9 +1230,11 @@ def compare_schemes():
                 cash_flows = [-base_params["pv"]] + [result["pmt"]] * base_params["periods"]
             else:
                 # 等额本金法需要从schedule中提取每期payment
-                cash_flows = [-base_params["pv"]] + [item["payment"] for item in result["schedule"]]
+                cash_flows = [-base_params["pv"]] + result["schedule"].payment.tolist()
 
-            result["irr"] = calculator.calculate_irr(cash_flows, base_params["frequency"])
+            result["irr"] = calculator.calculate_irr(
+                cash_flows, base_params["frequency"], guess=base_params["annual_rate"] / base_params["frequency"]
+            )
             result["scheme_name"] = scheme.get("name", f"方案{i+1}")
             result["method"] = method
 
@@ -568,35 +1261,44 @@ def compare_schemes():
         )
 
 
-@app.route("/api/charts/payment_structure", methods=["POST"])
-def generate_payment_structure_chart():
-    """生成租金构成图表"""
-    try:
-        data = request.get_json()
-        schedule = data["schedule"]
+def build_payment_structure_chart(data):
+    """租金构成图表（Plotly JSON）"""
+    import plotly.graph_objects as go
+    from plotly.utils import PlotlyJSONEncoder
 
-        periods = [item["period"] for item in schedule]
-        principals = [item["principal"] for item in schedule]
-        interests = [item["interest"] for item in schedule]
+    schedule = Schedule.from_records(data["schedule"])
 
-        # 使用Plotly生成交互式图表
-        fig = go.Figure(
-            data=[
-                go.Bar(name="本金", x=periods, y=principals),
-                go.Bar(name="利息", x=periods, y=interests),
-            ]
-        )
+    periods = schedule.period.tolist()
 
-        fig.update_layout(
-            title="租金构成分析",
-            xaxis_title="期数",
-            yaxis_title="金额（元）",
-            barmode="stack",
-            template="plotly_white",
-        )
+    # 使用Plotly生成交互式图表
+    fig = go.Figure(
+        data=[
+            go.Bar(name="本金", x=periods, y=schedule.principal.tolist()),
+            go.Bar(name="利息", x=periods, y=schedule.interest.tolist()),
+        ]
+    )
+
+    fig.update_layout(
+        title="租金构成分析",
+        xaxis_title="期数",
+        yaxis_title="金额（元）",
+        barmode="stack",
+        template="plotly_white",
+    )
+
+    # 转换为JSON
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
 
-        # 转换为JSON
-        chart_json = json.dumps(fig, cls=PlotlyJSONEncoder)
+
+@charts.route("/api/charts/payment_structure", methods=["POST"])
+def generate_payment_structure_chart():
+    """生成租金构成图表（相同参数的并发请求只生成一次）"""
+    try:
+        data = request.get_json()
+        chart_json = run_single_flight(
+            cache_key(data, namespace="charts/payment_structure"),
+            lambda: build_payment_structure_chart(resolve_result(data)),
+        )
 
         return jsonify(
             {
@@ -606,6 +1308,8 @@ def generate_payment_structure_chart():
             }
         )
 
+    except (ResultNotFoundError, InvalidParameterError) as e:
+        return result_reference_error(e)
     except Exception as e:
         return (
             jsonify(
@@ -619,57 +1323,64 @@ def generate_payment_structure_chart():
         )
 
 
-@app.route("/api/charts/cash_flow", methods=["POST"])
-def generate_cash_flow_chart():
-    """生成现金流图表"""
-    try:
-        data = request.get_json()
-        schedule = data["schedule"]
-        initial_payment = float(data.get("initial_payment", 0))
-
-        periods = [0] + [item["period"] for item in schedule]
-        cash_flows = [-initial_payment] + [item["payment"] for item in schedule]
-
-        # 累计现金流
-        cumulative_cf = []
-        running_total = 0
-        for cf in cash_flows:
-            running_total += cf
-            cumulative_cf.append(running_total)
-
-        fig = go.Figure()
-
-        # 每期现金流
-        fig.add_trace(
-            go.Scatter(
-                x=periods,
-                y=cash_flows,
-                mode="lines+markers",
-                name="每期现金流",
-                line=dict(color="blue"),
-            )
-        )
+def build_cash_flow_chart(data):
+    """现金流图表（Plotly JSON）"""
+    import plotly.graph_objects as go
+    from plotly.utils import PlotlyJSONEncoder
 
-        # 累计现金流
-        fig.add_trace(
-            go.Scatter(
-                x=periods,
-                y=cumulative_cf,
-                mode="lines+markers",
-                name="累计现金流",
-                line=dict(color="red", dash="dash"),
-            )
+    schedule = Schedule.from_records(data["schedule"])
+    initial_payment = float(data.get("initial_payment", 0))
+
+    periods = [0] + schedule.period.tolist()
+    cash_flows = np.concatenate(([-initial_payment], schedule.payment))
+
+    # 累计现金流
+    cumulative_cf = (np.cumsum(cash_flows) + 0.0).tolist()  # +0.0 将首期的-0.0归一为0.0
+    cash_flows = cash_flows.tolist()
+
+    fig = go.Figure()
+
+    # 每期现金流
+    fig.add_trace(
+        go.Scatter(
+            x=periods,
+            y=cash_flows,
+            mode="lines+markers",
+            name="每期现金流",
+            line=dict(color="blue"),
         )
+    )
 
-        fig.update_layout(
-            title="现金流分析",
-            xaxis_title="期数",
-            yaxis_title="现金流（元）",
-            template="plotly_white",
-            hovermode="x unified",
+    # 累计现金流
+    fig.add_trace(
+        go.Scatter(
+            x=periods,
+            y=cumulative_cf,
+            mode="lines+markers",
+            name="累计现金流",
+            line=dict(color="red", dash="dash"),
         )
+    )
 
-        chart_json = json.dumps(fig, cls=PlotlyJSONEncoder)
+    fig.update_layout(
+        title="现金流分析",
+        xaxis_title="期数",
+        yaxis_title="现金流（元）",
+        template="plotly_white",
+        hovermode="x unified",
+    )
+
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+
+@charts.route("/api/charts/cash_flow", methods=["POST"])
+def generate_cash_flow_chart():
+    """生成现金流图表（相同参数的并发请求只生成一次）"""
+    try:
+        data = request.get_json()
+        chart_json = run_single_flight(
+            cache_key(data, namespace="charts/cash_flow"), lambda: build_cash_flow_chart(resolve_result(data))
+        )
 
         return jsonify(
             {
@@ -679,6 +1390,8 @@ def generate_cash_flow_chart():
             }
         )
 
+    except (ResultNotFoundError, InvalidParameterError) as e:
+        return result_reference_error(e)
     except Exception as e:
         return (
             jsonify(
@@ -692,131 +1405,351 @@ def generate_cash_flow_chart():
         )
 
 
-@app.route("/api/export/excel", methods=["POST"])
-def export_to_excel():
-    """导出Excel报告"""
+def build_excel_report(data):
+    """单笔租赁的Excel报告（xlsx字节串）：基本信息、还款计划表，有保证金冲抵时另含冲抵详情与汇总"""
+    output = io.BytesIO()
+    with ExcelWriter(output) as writer:
+        write_lease_report(writer, data)
+    return output.getvalue()
+
+
+def write_lease_report(writer, data):
+    """写出单笔租赁报告的各工作表；金额、利率为数值单元格，以Excel数字格式显示"""
+    # 提取缺失的参数
+    missing_params = extract_missing_params(data)
+    complete_data = {**data, **missing_params}
+
+    # 基本信息sheet
+    basic_info = []
+
+    # 计算方法
+    if "method" in complete_data:
+        method_cn = FIELD_MAPPING.get(complete_data["method"], complete_data["method"])
+        basic_info.append(["计算方法", method_cn])
+
+    # 基本参数
+    if "pv" in complete_data:
+        basic_info.append(["租赁本金", currency_cell(complete_data["pv"])])
+    if "annual_rate" in complete_data:
+        basic_info.append(["年利率", percent_cell(complete_data["annual_rate"])])
+    if "periods" in complete_data:
+        basic_info.append(["租赁期限", f"{complete_data['periods']}期"])
+    if "frequency" in complete_data:
+        freq_map = {12: "月付", 4: "季付", 2: "半年付", 1: "年付"}
+        freq_text = freq_map.get(complete_data["frequency"], f"{complete_data['frequency']}次/年")
+        basic_info.append(["支付频率", freq_text])
+
+    # 计算结果
+    if "pmt" in complete_data:
+        basic_info.append(["每期租金", currency_cell(complete_data["pmt"])])
+    if "total_interest" in complete_data:
+        basic_info.append(["总利息", currency_cell(complete_data["total_interest"])])
+    if "total_payment" in complete_data:
+        basic_info.append(["总支付额", currency_cell(complete_data["total_payment"])])
+    if "irr" in complete_data:
+        basic_info.append(["内部收益率(IRR)", percent_cell(complete_data["irr"])])
+
+    # 保证金信息
+    if "guarantee" in complete_data and complete_data["guarantee"] > 0:
+        basic_info.append(["保证金", currency_cell(complete_data["guarantee"])])
+    if "guarantee_mode" in complete_data:
+        basic_info.append(["保证金处理方式", complete_data.get("guarantee_mode", "尾期冲抵")])
+    elif "guarantee_offset" in complete_data:
+        # 从保证金冲抵信息推导处理方式
+        offset_details = complete_data["guarantee_offset"].get("offset_details", [])
+        if offset_details:
+            # 检查冲抵模式：如果最后一期先冲抵，则是尾期冲抵
+            periods = [item["period"] for item in offset_details]
+            if periods and max(periods) in periods[:2]:  # 最大期数在前两个冲抵中
+                basic_info.append(["保证金处理方式", "尾期冲抵"])
+
+    basic_info.append(["生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+    writer.write_rows("基本信息", ["项目", "数值"], basic_info)
+
+    # 还款计划sheet - 使用中文列名，直接写出各列数组
+    if "schedule" in complete_data and complete_data["schedule"]:
+        schedule = Schedule.from_records(complete_data["schedule"])
+        header = ["期数", "租金(元)", "本金(元)", "利息(元)", "剩余本金(元)"]
+        columns = [schedule.period, schedule.payment, schedule.principal, schedule.interest, schedule.remaining_balance]
+        # 如果有利率信息（浮动利率法）
+        if schedule.has_rate:
+            header.append("当期利率")
+            columns.append(schedule.rate)
+        writer.write_columns("还款计划表", header, [columns], SCHEDULE_SHEET_FORMATS)
+
+    # 保证金冲抵详情sheet - 使用中文列名
+    if "guarantee_offset" in complete_data and "offset_details" in complete_data["guarantee_offset"]:
+        offset_data = [
+            [
+                item.get("period", ""),
+                currency_cell(item.get("offset_amount", 0)),
+                currency_cell(item.get("remaining_payment", 0)),
+            ]
+            for item in complete_data["guarantee_offset"]["offset_details"]
+        ]
+
+        if offset_data:
+            writer.write_rows("保证金冲抵详情", ["期数", "冲抵金额(元)", "冲抵后租金(元)"], offset_data)
+
+            # 保证金汇总信息
+            guarantee_summary = [
+                ["保证金总额", currency_cell(complete_data.get("guarantee", 0))],
+                ["总冲抵金额", currency_cell(complete_data["guarantee_offset"].get("total_offset", 0))],
+                ["未用保证金", currency_cell(complete_data["guarantee_offset"].get("unused_guarantee", 0))],
+                ["处理方式", complete_data.get("guarantee_mode", "尾期冲抵")],
+            ]
+            writer.write_rows("保证金汇总", ["项目", "数值"], guarantee_summary)
+
+
+# 还款计划表各列的数字格式：期数、租金、本金、利息、剩余本金、当期利率
+SCHEDULE_SHEET_FORMATS = (None, CURRENCY_FORMAT, CURRENCY_FORMAT, CURRENCY_FORMAT, CURRENCY_FORMAT, PERCENT_FORMAT)
+
+# 多笔租赁的Excel报告及列式导出文件超过该大小时写入临时文件
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+# 多笔租赁导出时每次向量化计算汇总指标的笔数
+EXPORT_SUMMARY_BLOCK = 1024
+
+PORTFOLIO_SUMMARY_HEADER = [
+    "租赁序号",
+    "计算方法",
+    "租赁本金(元)",
+    "年利率",
+    "期数",
+    "支付频率(次/年)",
+    "每期租金(元)",
+    "总利息(元)",
+    "总支付额(元)",
+    "内部收益率(IRR)",
+    "保证金(元)",
+    "总冲抵金额(元)",
+    "未用保证金(元)",
+]
+PORTFOLIO_SCHEDULE_HEADER = ["租赁序号", "期数", "租金(元)", "本金(元)", "利息(元)", "剩余本金(元)", "当期利率"]
+
+
+def export_lease(index, item):
+    """
+    多笔租赁导出的一笔
+
+    各笔为 /api/calculate 的结果、{"result_id", "export_data"} 引用或计算参数
+
+    Returns:
+        Tuple: (计算参数, None)，或引用、提交完整结果时为 (None, 结果)
+
+    Raises:
+        InvalidParameterError: 参数错误（消息中含租赁序号）
+        ResultNotFoundError: 引用的结果不存在
+    """
     try:
-        data = request.get_json()
+        if not isinstance(item, dict):
+            raise ValueError("须为对象")
+        if "result_id" in item or "export_data" in item or "schedule" in item:
+            return None, resolve_result(item)
+        return calculation_params(item), None
+    except InvalidParameterError as e:
+        raise InvalidParameterError(f"第{index}笔租赁{e}")
+    except (KeyError, ValueError, TypeError) as e:
+        raise InvalidParameterError(f"第{index}笔租赁参数错误: {e}")
+
+
+def iter_export_summaries(leases):
+    """
+    多笔租赁的汇总结果 (租赁序号, 结果)
 
-        # 提取缺失的参数
-        missing_params = extract_missing_params(data)
-        complete_data = {**data, **missing_params}
+    无保证金的等额年金法、等额本金法租赁按块由 calculate_summaries 向量化计算，其余逐笔计算
+    """
+    for offset in range(0, len(leases), EXPORT_SUMMARY_BLOCK):
+        block = []
+        for index, item in enumerate(leases[offset : offset + EXPORT_SUMMARY_BLOCK], offset + 1):
+            params, result = export_lease(index, item)
+            block.append((index, params, result))
+
+        grid = [
+            (index, params)
+            for index, params, _ in block
+            if params is not None and params["method"] in GRID_METHODS and params["guarantee"] <= 0
+        ]
+        names = ("method", "pv", "annual_rate", "periods", "frequency")
+        summaries = calculator.calculate_summaries([tuple(params[name] for name in names) for _, params in grid])
+        summaries = dict(zip((index for index, _ in grid), summaries))
+
+        for index, params, result in block:
+            if index in summaries:
+                result = summaries[index]
+                if isinstance(result, Exception):
+                    raise InvalidParameterError(f"第{index}笔租赁参数错误: {result}")
+                result = {**result, "export_data": params}
+            elif params is not None:
+                try:
+                    result, _ = compute_result(params, summary_only=True)
+                except InvalidParameterError as e:
+                    raise InvalidParameterError(f"第{index}笔租赁{e}")
+            yield index, result
 
-        # 创建Excel文件
-        output = io.BytesIO()
 
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            # 基本信息sheet
-            basic_info = []
-
-            # 计算方法
-            if "method" in complete_data:
-                method_cn = FIELD_MAPPING.get(complete_data["method"], complete_data["method"])
-                basic_info.append(["计算方法", method_cn])
-
-            # 基本参数
-            if "pv" in complete_data:
-                basic_info.append(["租赁本金", format_currency(complete_data["pv"])])
-            if "annual_rate" in complete_data:
-                basic_info.append(["年利率", format_percentage(complete_data["annual_rate"])])
-            if "periods" in complete_data:
-                basic_info.append(["租赁期限", f"{complete_data['periods']}期"])
-            if "frequency" in complete_data:
-                freq_map = {12: "月付", 4: "季付", 2: "半年付", 1: "年付"}
-                freq_text = freq_map.get(complete_data["frequency"], f"{complete_data['frequency']}次/年")
-                basic_info.append(["支付频率", freq_text])
-
-            # 计算结果
-            if "pmt" in complete_data:
-                basic_info.append(["每期租金", format_currency(complete_data["pmt"])])
-            if "total_interest" in complete_data:
-                basic_info.append(["总利息", format_currency(complete_data["total_interest"])])
-            if "total_payment" in complete_data:
-                basic_info.append(["总支付额", format_currency(complete_data["total_payment"])])
-            if "irr" in complete_data:
-                basic_info.append(["内部收益率(IRR)", format_percentage(complete_data["irr"])])
-
-            # 保证金信息
-            if "guarantee" in complete_data and complete_data["guarantee"] > 0:
-                basic_info.append(["保证金", format_currency(complete_data["guarantee"])])
-            if "guarantee_mode" in complete_data:
-                basic_info.append(["保证金处理方式", complete_data.get("guarantee_mode", "尾期冲抵")])
-            elif "guarantee_offset" in complete_data:
-                # 从保证金冲抵信息推导处理方式
-                offset_details = complete_data["guarantee_offset"].get("offset_details", [])
-                if offset_details:
-                    # 检查冲抵模式：如果最后一期先冲抵，则是尾期冲抵
-                    periods = [item["period"] for item in offset_details]
-                    if periods and max(periods) in periods[:2]:  # 最大期数在前两个冲抵中
-                        basic_info.append(["保证金处理方式", "尾期冲抵"])
-
-            basic_info.append(["生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-
-            basic_info_df = pd.DataFrame(basic_info, columns=["项目", "数值"])
-            basic_info_df.to_excel(writer, sheet_name="基本信息", index=False)
-
-            # 还款计划sheet - 使用中文列名
-            if "schedule" in complete_data and complete_data["schedule"]:
-                schedule_data = []
-                for item in complete_data["schedule"]:
-                    schedule_row = {
-                        "期数": item.get("period", ""),
-                        "租金(元)": format_currency(item.get("payment", 0)),
-                        "本金(元)": format_currency(item.get("principal", 0)),
-                        "利息(元)": format_currency(item.get("interest", 0)),
-                        "剩余本金(元)": format_currency(item.get("remaining_balance", 0)),
-                    }
-                    # 如果有利率信息（浮动利率法）
-                    if "rate" in item:
-                        schedule_row["当期利率"] = format_percentage(item["rate"])
-                    schedule_data.append(schedule_row)
-
-                schedule_df = pd.DataFrame(schedule_data)
-                schedule_df.to_excel(writer, sheet_name="还款计划表", index=False)
-
-            # 保证金冲抵详情sheet - 使用中文列名
-            if "guarantee_offset" in complete_data and "offset_details" in complete_data["guarantee_offset"]:
-                offset_data = []
-                for item in complete_data["guarantee_offset"]["offset_details"]:
-                    offset_data.append(
-                        {
-                            "期数": item.get("period", ""),
-                            "冲抵金额(元)": format_currency(item.get("offset_amount", 0)),
-                            "冲抵后租金(元)": format_currency(item.get("remaining_payment", 0)),
-                        }
-                    )
+def iter_export_schedules(leases):
+    """
+    多笔租赁的还款计划 (租赁序号, 完整还款计划或分块迭代器)
+
+    无需冲抵时由 iter_schedule 按需逐块生成，不再计算汇总指标
+
+    Raises:
+        InvalidParameterError: 参数错误（消息中含租赁序号）
+    """
+    for index, item in enumerate(leases, 1):
+        params, result = export_lease(index, item)
+        try:
+            if result is not None:
+                schedule = result.get("schedule")
+            elif params["guarantee"] <= 0 and "years" not in params:
+                schedule = calculator.iter_schedule(
+                    params["method"],
+                    params["pv"],
+                    params["annual_rate"],
+                    params["periods"],
+                    params["frequency"],
+                    params.get("rate_reset_schedule"),
+                    chunk_size=BATCH_STREAM_CHUNK,
+                )
+            else:
+                schedule = compute_result(params)[0]["schedule"]
+        except InvalidParameterError as e:
+            raise InvalidParameterError(f"第{index}笔租赁{e}")
+        except ValueError as e:
+            raise InvalidParameterError(f"第{index}笔租赁参数错误: {e}")
+        if schedule is not None:
+            yield index, schedule
+
+
+def portfolio_summary_row(index, result):
+    """多笔租赁汇总表的一行"""
+    info = {**result, **extract_missing_params(result), **result.get("export_data", {})}
+    offset_result = result.get("guarantee_offset") or {}
+    return [
+        index,
+        FIELD_MAPPING.get(info.get("method"), info.get("method")),
+        currency_cell(info.get("pv")),
+        percent_cell(info.get("annual_rate")),
+        info.get("periods"),
+        info.get("frequency"),
+        currency_cell(result.get("pmt")),
+        currency_cell(result.get("total_interest")),
+        currency_cell(result.get("total_payment")),
+        percent_cell(result.get("irr")),
+        currency_cell(info.get("guarantee") or None),
+        currency_cell(offset_result.get("total_offset")),
+        currency_cell(offset_result.get("unused_guarantee")),
+    ]
+
+
+def iter_portfolio_schedule_chunks(leases):
+    """多笔租赁还款计划表的各块列数组：首列为租赁序号，非浮动利率的租赁省略末列当期利率"""
+    for index, schedule in iter_export_schedules(leases):
+        chunks = [Schedule.from_records(schedule)] if isinstance(schedule, (Schedule, list)) else schedule
+        for chunk in chunks:
+            columns = [
+                np.full(len(chunk), index, dtype=np.int64),
+                chunk.period,
+                chunk.payment,
+                chunk.principal,
+                chunk.interest,
+                chunk.remaining_balance,
+            ]
+            if chunk.has_rate:
+                columns.append(chunk.rate)
+            yield columns
+
+
+def write_portfolio_report(fileobj, leases):
+    """
+    多笔租赁的Excel报告：租赁汇总表（每笔一行）和合并的还款计划表（按租赁序号区分）
+
+    汇总与还款计划分两遍逐笔计算、逐块写出，内存占用与租赁笔数和期数无关
+    """
+    with ExcelWriter(fileobj) as writer:
+        writer.write_rows(
+            "租赁汇总",
+            PORTFOLIO_SUMMARY_HEADER,
+            (portfolio_summary_row(index, result) for index, result in iter_export_summaries(leases)),
+            width=16,
+        )
+        writer.write_columns(
+            "还款计划表",
+            PORTFOLIO_SCHEDULE_HEADER,
+            iter_portfolio_schedule_chunks(leases),
+            (None,) + SCHEDULE_SHEET_FORMATS,
+        )
+
 
-                if offset_data:
-                    offset_df = pd.DataFrame(offset_data)
-                    offset_df.to_excel(writer, sheet_name="保证金冲抵详情", index=False)
-
-                    # 保证金汇总信息
-                    guarantee_summary = [
-                        ["保证金总额", format_currency(complete_data.get("guarantee", 0))],
-                        [
-                            "总冲抵金额",
-                            format_currency(complete_data["guarantee_offset"].get("total_offset", 0)),
-                        ],
-                        [
-                            "未用保证金",
-                            format_currency(complete_data["guarantee_offset"].get("unused_guarantee", 0)),
-                        ],
-                        ["处理方式", complete_data.get("guarantee_mode", "尾期冲抵")],
-                    ]
-                    guarantee_summary_df = pd.DataFrame(guarantee_summary, columns=["项目", "数值"])
-                    guarantee_summary_df.to_excel(writer, sheet_name="保证金汇总", index=False)
+def check_export_leases(leases):
+    """多笔租赁导出的 leases 须为非空列表，且不超过 BATCH_MAX_ROWS 笔"""
+    if not isinstance(leases, list) or not leases:
+        raise InvalidParameterError("leases 须为非空列表")
+    if len(leases) > BATCH_MAX_ROWS:
+        raise InvalidParameterError(f"单次最多导出{BATCH_MAX_ROWS}笔租赁")
+
+
+def spooled_file_response(write, mimetype, download_name):
+    """
+    先完整写出导出文件再返回：超过 EXPORT_SPOOL_SIZE 时写入临时文件，随后流式返回；
+    写出过程中的参数错误因此能在响应开始前以400报告
 
+    Args:
+        write: 以可写文件对象为参数的写出函数
+        mimetype: 响应类型
+        download_name: 下载文件名
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    try:
+        write(output)
+        size = output.tell()
         output.seek(0)
+    except BaseException:
+        output.close()
+        raise
+
+    response = send_file(output, mimetype=mimetype, as_attachment=True, download_name=download_name)
+    response.content_length = size
+    return response
+
+
+def export_portfolio_excel(leases):
+    """多笔租赁导出：报告超过 EXPORT_SPOOL_SIZE 时写入临时文件，随后流式返回"""
+    check_export_leases(leases)
+    return spooled_file_response(
+        partial(write_portfolio_report, leases=leases),
+        XLSX_MIMETYPE,
+        f'融资租赁组合报告_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
+    )
+
+
+@exports.route("/api/export/excel", methods=["POST"])
+def export_to_excel():
+    """
+    导出Excel报告
+
+    单笔结果：相同参数的并发请求只生成一次；{"leases": [...]} 为多笔租赁报告，写入临时文件后流式返回
+    """
+    try:
+        data = request.get_json()
+        if isinstance(data, dict) and "leases" in data:
+            return export_portfolio_excel(data["leases"])
+
+        content = run_single_flight(
+            cache_key(data, namespace="export/excel"), lambda: build_excel_report(resolve_result(data))
+        )
 
         return send_file(
-            output,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            io.BytesIO(content),
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
             download_name=f'融资租赁计算报告_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
         )
 
+    except (ResultNotFoundError, InvalidParameterError) as e:
+        return result_reference_error(e)
     except Exception as e:
-        app.logger.error(f"Excel导出错误: {str(e)}")
+        logger.error(f"Excel导出错误: {str(e)}")
         return (
             jsonify(
                 {
@@ -829,11 +1762,11 @@ def export_to_excel():
         )
 
 
-@app.route("/api/export/json", methods=["POST"])
+@core.route("/api/export/json", methods=["POST"])
 def export_to_json():
     """导出JSON数据"""
     try:
-        data = request.get_json()
+        data = resolve_result(request.get_json())
 
         # 提取缺失的参数
         missing_params = extract_missing_params(data)
@@ -895,19 +1828,20 @@ def export_to_json():
 
         # 还款计划表 - 使用中文字段名
         if "schedule" in complete_data and complete_data["schedule"]:
-            schedule_list = []
-            for item in complete_data["schedule"]:
-                schedule_item = {
-                    "期数": item.get("period", ""),
-                    "租金": format_currency(item.get("payment", 0)),
-                    "本金": format_currency(item.get("principal", 0)),
-                    "利息": format_currency(item.get("interest", 0)),
-                    "剩余本金": format_currency(item.get("remaining_balance", 0)),
-                }
-                # 如果有利率信息（浮动利率法）
-                if "rate" in item:
-                    schedule_item["当期利率"] = format_percentage(item["rate"])
-                schedule_list.append(schedule_item)
+            schedule = Schedule.from_records(complete_data["schedule"])
+            columns = [
+                ("期数", schedule.period.tolist()),
+                ("租金", [format_currency(v) for v in schedule.payment.tolist()]),
+                ("本金", [format_currency(v) for v in schedule.principal.tolist()]),
+                ("利息", [format_currency(v) for v in schedule.interest.tolist()]),
+                ("剩余本金", [format_currency(v) for v in schedule.remaining_balance.tolist()]),
+            ]
+            # 如果有利率信息（浮动利率法）
+            if schedule.has_rate:
+                columns.append(("当期利率", [format_percentage(v) for v in schedule.rate.tolist()]))
+
+            names = [name for name, _ in columns]
+            schedule_list = [dict(zip(names, values)) for values in zip(*(values for _, values in columns))]
 
             export_data["详细数据"]["还款计划表"] = schedule_list
 
@@ -950,8 +1884,10 @@ def export_to_json():
             download_name=f'融资租赁计算数据_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
         )
 
+    except (ResultNotFoundError, InvalidParameterError) as e:
+        return result_reference_error(e)
     except Exception as e:
-        app.logger.error(f"JSON导出错误: {str(e)}")
+        logger.error(f"JSON导出错误: {str(e)}")
         return (
             jsonify(
                 {
@@ -964,7 +1900,165 @@ def export_to_json():
         )
 
 
-@app.route("/api/reverse_calculate", methods=["POST"])
+def batch_result_columns(slots):
+    """
+    一块批量租赁的逐笔结果列（BATCH_EXPORT_FIELDS）：calculate_batch 的结果数组直接作为导出列，
+    不逐笔转换为字典；解析失败的租赁只有序号和失败原因
+    """
+    size = len(slots)
+    rows = [k for k, (_, params) in enumerate(slots) if not isinstance(params, str)]
+    columns = {
+        "index": np.array([index for index, _ in slots], dtype=np.int64),
+        "error": [params if isinstance(params, str) else None for _, params in slots],
+    }
+    if not rows:
+        return columns
+
+    def spread(values, dtype):
+        values = np.asarray(values, dtype=dtype)
+        if len(rows) == size:
+            return values
+        spread_values = np.ma.masked_all(size, dtype=dtype)
+        spread_values[rows] = values
+        return spread_values
+
+    parsed = [slots[k][1] for k in rows]
+    batch = run_calculate_batch(parsed, include_schedule=False)
+    inputs = list(zip(*parsed))
+    columns["method"] = [None] * size
+    for k, method, error in zip(rows, inputs[0], batch["error"]):
+        columns["method"][k] = method
+        if error is not None:
+            columns["error"][k] = error
+    for name, position, dtype in (
+        ("pv", 1, np.float64),
+        ("annual_rate", 2, np.float64),
+        ("periods", 3, np.int64),
+        ("frequency", 4, np.int64),
+        ("guarantee", 5, np.float64),
+    ):
+        columns[name] = spread(inputs[position], dtype)
+    for name in BATCH_RESULT_FIELDS:
+        columns[name] = spread(batch[name], np.float64)
+    return columns
+
+
+def iter_batch_result_columns(leases):
+    """
+    批量计算逐块产出结果列
+
+    Raises:
+        InvalidParameterError: 超出笔数上限或CSV不是UTF-8编码
+    """
+    try:
+        for slots in iter_batch_slots(leases, batch_stream_chunk_size(False)):
+            yield batch_result_columns(slots)
+    except UnicodeDecodeError:
+        raise InvalidParameterError("CSV文件必须为UTF-8编码") from None
+    except ValueError as e:
+        raise InvalidParameterError(str(e)) from None
+
+
+def iter_portfolio_schedule_columns(leases):
+    """多笔租赁还款计划的各块导出列，index 列为租赁在请求中的序号（从0开始）"""
+    for index, schedule in iter_export_schedules(leases):
+        chunks = [Schedule.from_records(schedule)] if isinstance(schedule, (Schedule, list)) else schedule
+        for chunk in chunks:
+            yield schedule_columns(chunk, index - 1)
+
+
+def export_table(fmt):
+    """
+    列式导出：英文列名、原始数值，由列数组逐块写出
+
+    查询参数 table 为 schedule（默认）时导出还款计划：请求体同 /api/export/excel，
+    单笔结果（或结果ID引用）导出其还款计划，{"leases": [...]} 导出各笔合并的还款计划；
+    为 results 时导出批量计算的逐笔结果，请求体同 /api/batch/calculate（JSON或CSV）
+
+    Args:
+        fmt: 导出格式（csv、parquet、arrow）
+    """
+    try:
+        table = request.args.get("table", "schedule")
+        if table == "results":
+            try:
+                leases, _ = read_batch_leases()
+            except ValueError as e:
+                raise InvalidParameterError(str(e))
+            fields, chunks, title = BATCH_EXPORT_FIELDS, iter_batch_result_columns(leases), "批量计算结果"
+        elif table == "schedule":
+            data = request.get_json()
+            if isinstance(data, dict) and "leases" in data:
+                check_export_leases(data["leases"])
+                fields, chunks = PORTFOLIO_SCHEDULE_FIELDS, iter_portfolio_schedule_columns(data["leases"])
+            else:
+                result = resolve_result(data)
+                schedule = result.get("schedule") if isinstance(result, dict) else None
+                if not schedule:
+                    raise InvalidParameterError("结果中没有还款计划")
+                fields, chunks = SCHEDULE_FIELDS, [schedule_columns(Schedule.from_records(schedule))]
+            title = "还款计划"
+        else:
+            raise InvalidParameterError(f"不支持的导出内容: {table}，可选 schedule、results")
+
+        return spooled_file_response(
+            partial(write_table, fmt=fmt, fields=fields, chunks=chunks),
+            MIMETYPES[fmt],
+            f'融资租赁{title}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{EXTENSIONS[fmt]}',
+        )
+
+    except (ResultNotFoundError, InvalidParameterError) as e:
+        return result_reference_error(e)
+    except Exception as e:
+        logger.error(f"{fmt}导出错误: {str(e)}")
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": f"导出{fmt}文件失败: {str(e)}",
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            500,
+        )
+
+
+@exports.route("/api/export/csv", methods=["POST"])
+def export_to_csv():
+    """导出CSV（UTF-8，无BOM）"""
+    return export_table("csv")
+
+
+@arrow.route("/api/export/parquet", methods=["POST"])
+def export_to_parquet():
+    """导出Parquet"""
+    return export_table("parquet")
+
+
+@arrow.route("/api/export/arrow", methods=["POST"])
+def export_to_arrow():
+    """导出Arrow IPC流"""
+    return export_table("arrow")
+
+
+def parse_extra_cash_flows(value):
+    """
+    反向计算的附加现金流：未填写为None，否则须为有限数值的列表
+
+    Raises:
+        ValueError: 不是列表或含非数值、nan、inf
+    """
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise ValueError("extra_cash_flows 须为数值列表")
+    for item in value:
+        if isinstance(item, bool) or not isinstance(item, (int, float)) or not math.isfinite(item):
+            raise ValueError("extra_cash_flows 须为有限数值的列表")
+    return [float(item) for item in value]
+
+
+@core.route("/api/reverse_calculate", methods=["POST"])
 def reverse_calculate():
     """反向计算接口 - 根据目标值推算利率或租金"""
     try:
@@ -994,7 +2088,17 @@ def reverse_calculate():
         elif calculation_type == "find_irr":
             # 根据目标IRR推算租金
             target_irr = float(data["target_irr"])
-            result = calculator.reverse_calculate_pmt(pv, target_irr, periods, frequency, method)
+            # 保证金冲抵及附加现金流一并纳入求解
+            result = calculator.reverse_calculate_pmt(
+                pv,
+                target_irr,
+                periods,
+                frequency,
+                method,
+                guarantee=guarantee,
+                guarantee_mode=guarantee_mode,
+                extra_cash_flows=parse_extra_cash_flows(data.get("extra_cash_flows")),
+            )
 
         else:
             return jsonify({"error": f"不支持的计算类型: {calculation_type}"}), 400
@@ -1036,10 +2140,7 @@ def reverse_calculate():
         )
 
 
-# 全局JSON解析错误处理
-
-
-@app.route("/health", methods=["GET"])
+@core.route("/health", methods=["GET"])
 def health_status():
     """健康检查端点"""
     return jsonify(
@@ -1053,7 +2154,7 @@ def health_status():
 
 
 # 前端页面路由
-@app.route("/")
+@frontend.route("/")
 def serve_index():
     """提供前端主页"""
     # 读取index.html内容，确保DOCTYPE为大写
@@ -1070,7 +2171,7 @@ def serve_index():
 
 
 # 处理所有其他路由（SPA路由支持）
-@app.route("/<path:path>")
+@frontend.route("/<path:path>")
 def serve_spa_routes(path):
     """处理SPA路由和其他文件"""
     # API路径返回404
@@ -1115,36 +2216,120 @@ def serve_spa_routes(path):
     return send_file(os.path.join(FRONTEND_BUILD_DIR, "index.html"))
 
 
-# 捕获无效JSON等BadRequest异常，返回400
-@app.errorhandler(BadRequest)
-def handle_bad_request(e):
-    return jsonify({"error": "Invalid JSON or bad request"}), 400
-
-
 # 捕获所有其他异常，优先处理HTTPException
-@app.errorhandler(Exception)
 def handle_exception(e):
     if isinstance(e, HTTPException):
         return jsonify({"error": e.description}), e.code
-    app.logger.error("Server Error: %s", (e))
+    logger.error("Server Error: %s", (e))
     return jsonify({"error": "Internal server error"}), 500
 
 
-@app.errorhandler(404)
 def not_found(error):
     # 对于静态文件404，不要覆盖路由处理
     return jsonify({"error": "Resource not found"}), 404
 
 
 # 捕获无效JSON等BadRequest异常，返回400
-@app.errorhandler(BadRequest)
 def handle_bad_request(e):
     return jsonify({"error": "请求体不是有效的JSON格式", "message": str(e)}), 400
 
 
+def create_app(features=None):
+    """
+    应用工厂：注册核心计算接口、前端页面，以及依赖已安装的可选功能
+
+    同一进程内创建的各应用共享计算器、结果缓存、结果存储等模块级状态
+
+    Args:
+        features: 注册的可选功能（charts、exports、arrow），默认为全部；依赖未安装的功能不注册
+
+    Returns:
+        Flask应用
+
+    Raises:
+        ValueError: 不支持的功能名
+    """
+    flask_app = Flask(__name__, static_folder=FRONTEND_BUILD_DIR, static_url_path="")
+    flask_app.json = LeaseJSONProvider(flask_app)
+    CORS(flask_app)  # 允许跨域请求
+    configure_file_logging(flask_app)
+
+    flask_app.register_blueprint(core)
+    enabled = []
+    for name in OPTIONAL_FEATURES if features is None else features:
+        if name not in OPTIONAL_FEATURES:
+            raise ValueError(f"不支持的功能: {name}")
+        if feature_available(name):
+            flask_app.register_blueprint(OPTIONAL_FEATURES[name][0])
+            enabled.append(name)
+        else:
+            logger.info(f"{name} 的依赖未安装，相关接口未注册")
+    flask_app.register_blueprint(frontend)
+
+    flask_app.register_error_handler(BadRequest, handle_bad_request)
+    flask_app.register_error_handler(Exception, handle_exception)
+    flask_app.register_error_handler(404, not_found)
+
+    # LEASE_WARMUP=1 时在创建应用（即worker启动）时预先导入可选功能的依赖
+    if os.environ.get("LEASE_WARMUP") == "1":
+        warm_up(enabled)
+    return flask_app
+
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+
+def get_app():
+    """
+    本模块的默认应用（注册全部可选功能），首次调用时创建；
+    只导入 create_app 等（如 app_lite）时不创建
+    """
+    global _default_app
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+
+
+def __getattr__(name):
+    # gunicorn app:app、from app import app 首次访问 app 时才创建默认应用
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+PRELOAD_SAMPLE = {"pv": 1000000, "annual_rate": 0.08, "periods": 12, "guarantee": 10000}
+
+
+def preload(flask_app=None):
+    """
+    预加载模式下由master进程在fork worker前调用：导入已注册可选功能的依赖，并以示例租赁执行各计算方法、
+    响应序列化和导出、图表生成，首次使用时才建立的状态（plotly的属性校验器等）由各worker共享
+
+    Args:
+        flask_app: 预加载的应用，默认为本模块的默认应用
+    """
+    flask_app = flask_app or get_app()
+    features = [name for name in OPTIONAL_FEATURES if name in flask_app.blueprints]
+    warm_up(features)
+    with flask_app.app_context():
+        for method in ("equal_annuity", "equal_principal", "flat_rate", "floating_rate"):
+            result, _ = compute_result(calculation_params(dict(PRELOAD_SAMPLE, method=method)))
+            flask_app.json.dumps(result)
+    if "charts" in features:
+        build_payment_structure_chart(result)
+        build_cash_flow_chart(result)
+    if "exports" in features:
+        build_excel_report(result)
+    if "arrow" in features:
+        for fmt in ("parquet", "arrow"):
+            write_table(io.BytesIO(), fmt, SCHEDULE_FIELDS, [schedule_columns(Schedule.from_records(result["schedule"]))])
+
+
 if __name__ == "__main__":
     import os
 
     port = int(os.environ.get("PORT", 5002))
     debug = os.environ.get("FLASK_ENV") != "production"
-    app.run(debug=debug, host="0.0.0.0", port=port)
+    get_app().run(debug=debug, host="0.0.0.0", port=port)
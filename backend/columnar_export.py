@@ -0,0 +1,272 @@
+"""
+列式数据导出
+还款计划、批量计算结果由列数组逐块写出为CSV、Parquet或Arrow IPC流，供数据仓库等下游系统读取：
+列名为英文字段名，数值保持原始精度，不做货币、百分比格式化，不经过逐行字典。
+CSV只依赖标准库；Parquet、Arrow由pyarrow写出，在首次使用时导入，
+Arrow的数值列直接引用列数组的内存（零拷贝）
+"""
+
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+
+MIMETYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+# Parquet每个行组的行数：各块先在内存中累积，满一个行组再写出
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
+# CSV写出前累积的字节数
+CSV_BUFFER_SIZE = 256 * 1024
+
+_CSV_SPECIAL = (",", '"', "\n", "\r")
+
+
+class Field(NamedTuple):
+    """导出的一列：列名和类型（int64、float64或string）"""
+
+    name: str
+    dtype: str
+
+
+# 还款计划（固定利率的计算方法当期利率为空）
+SCHEDULE_FIELDS = (
+    Field("period", "int64"),
+    Field("payment", "float64"),
+    Field("principal", "float64"),
+    Field("interest", "float64"),
+    Field("remaining_balance", "float64"),
+    Field("rate", "float64"),
+)
+# 多笔租赁的还款计划：index 为租赁在请求中的序号（从0开始）
+PORTFOLIO_SCHEDULE_FIELDS = (Field("index", "int64"),) + SCHEDULE_FIELDS
+# 批量计算的逐笔结果：输入参数、汇总指标和失败原因（失败的租赁各指标为空）
+BATCH_EXPORT_FIELDS = (
+    Field("index", "int64"),
+    Field("method", "string"),
+    Field("pv", "float64"),
+    Field("annual_rate", "float64"),
+    Field("periods", "int64"),
+    Field("frequency", "int64"),
+    Field("guarantee", "float64"),
+    Field("pmt", "float64"),
+    Field("total_interest", "float64"),
+    Field("total_payment", "float64"),
+    Field("irr", "float64"),
+    Field("unused_guarantee", "float64"),
+    Field("total_offset", "float64"),
+    Field("error", "string"),
+)
+
+
+def schedule_columns(schedule, index: Optional[int] = None) -> Dict:
+    """
+    Schedule 的导出列（引用列数组本身，不复制）
+
+    Args:
+        schedule: 还款计划或其分块
+        index: 租赁序号，指定时另含 index 列
+    """
+    columns = {
+        "period": schedule.period,
+        "payment": schedule.payment,
+        "principal": schedule.principal,
+        "interest": schedule.interest,
+        "remaining_balance": schedule.remaining_balance,
+        "rate": schedule.rate,
+    }
+    if index is not None:
+        columns["index"] = np.full(len(schedule), index, dtype=np.int64)
+    return columns
+
+
+def _column(values, dtype: str, length: int):
+    """
+    规范化一列的值
+
+    Args:
+        values: 列数组、掩码数组（掩码为空值）、Python列表（None为空值），None表示整列为空
+        dtype: 列类型
+        length: 行数
+
+    Returns:
+        Tuple: (数据数组, 空值掩码或None)；float64列的nan视为空值
+    """
+    if values is None:
+        data = np.empty(length, dtype=object) if dtype == "string" else np.zeros(length, dtype=dtype)
+        return data, np.ones(length, dtype=bool)
+    if dtype == "string":
+        data = np.asarray(values, dtype=object)
+        mask = np.fromiter((value is None for value in data), dtype=bool, count=len(data))
+        return data, mask if mask.any() else None
+    mask = np.ma.getmaskarray(values) if np.ma.isMaskedArray(values) else None
+    data = np.asarray(np.ma.getdata(values), dtype=dtype)
+    if dtype == "float64":
+        nan = np.isnan(data)
+        mask = nan if mask is None else nan | mask
+    if mask is None or not mask.any():
+        return data, None
+    return data, mask
+
+
+def _chunk_length(fields: Sequence[Field], chunk: Dict) -> int:
+    lengths = {len(chunk[field.name]) for field in fields if chunk.get(field.name) is not None}
+    if len(lengths) > 1:
+        raise ValueError("导出列长度不一致")
+    return lengths.pop() if lengths else 0
+
+
+def _csv_text(data: np.ndarray, mask: Optional[np.ndarray], dtype: str) -> list:
+    """一列的CSV文本：浮点数取最短的精确表示，空值为空字段"""
+    if dtype == "string":
+        return ["" if value is None else _csv_quote(str(value)) for value in data.tolist()]
+    text = list(map(repr if dtype == "float64" else str, data.tolist()))
+    if mask is not None:
+        for k in np.flatnonzero(mask).tolist():
+            text[k] = ""
+    return text
+
+
+def _csv_quote(value: str) -> str:
+    if any(char in value for char in _CSV_SPECIAL):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_csv(fileobj: BinaryIO, fields: Sequence[Field], chunks: Iterable[Dict]) -> int:
+    """
+    逐块写出UTF-8 CSV（无BOM，首行为列名）
+
+    各列整列转换为文本后按行拼接，不逐行格式化
+
+    Returns:
+        int: 写出的数据行数
+    """
+    fileobj.write((",".join(field.name for field in fields) + "\n").encode("utf-8"))
+    rows = 0
+    buffer, size = [], 0
+    for chunk in chunks:
+        length = _chunk_length(fields, chunk)
+        if not length:
+            continue
+        columns = [_csv_text(*_column(chunk.get(field.name), field.dtype, length), field.dtype) for field in fields]
+        text = "\n".join(map(",".join, zip(*columns))) + "\n"
+        buffer.append(text)
+        size += len(text)
+        rows += length
+        if size >= CSV_BUFFER_SIZE:
+            fileobj.write("".join(buffer).encode("utf-8"))
+            buffer, size = [], 0
+    if buffer:
+        fileobj.write("".join(buffer).encode("utf-8"))
+    return rows
+
+
+def arrow_schema(fields: Sequence[Field]):
+    """导出列对应的Arrow schema"""
+    import pyarrow as pa
+
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string()}
+    return pa.schema([pa.field(field.name, types[field.dtype]) for field in fields])
+
+
+def record_batch(fields: Sequence[Field], chunk: Dict, schema=None):
+    """
+    一块列数组对应的Arrow RecordBatch
+
+    连续的int64、float64列数组直接作为Arrow数据缓冲区（零拷贝），空值只另建有效位图
+    """
+    import pyarrow as pa
+
+    schema = schema or arrow_schema(fields)
+    length = _chunk_length(fields, chunk)
+    arrays = []
+    for field, arrow_field in zip(fields, schema):
+        data, mask = _column(chunk.get(field.name), field.dtype, length)
+        if field.dtype == "string":
+            arrays.append(pa.array(data, type=arrow_field.type, mask=mask))
+        else:
+            arrays.append(pa.array(np.ascontiguousarray(data), type=arrow_field.type, mask=mask))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_arrow(fileobj: BinaryIO, fields: Sequence[Field], chunks: Iterable[Dict]) -> int:
+    """
+    逐块写出Arrow IPC流格式（每块一个RecordBatch，可由 pyarrow.ipc.open_stream 逐块读取）
+
+    Returns:
+        int: 写出的数据行数
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(fields)
+    rows = 0
+    with pa.ipc.new_stream(fileobj, schema) as writer:
+        for chunk in chunks:
+            batch = record_batch(fields, chunk, schema)
+            if batch.num_rows:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def write_parquet(
+    fileobj: BinaryIO, fields: Sequence[Field], chunks: Iterable[Dict], row_group_rows: Optional[int] = None
+) -> int:
+    """
+    逐块写出Parquet：各块累积到 row_group_rows 行写出一个行组，内存占用至多一个行组
+
+    Returns:
+        int: 写出的数据行数
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_group_rows = row_group_rows or PARQUET_ROW_GROUP_ROWS
+    schema = arrow_schema(fields)
+    rows = 0
+    pending, pending_rows = [], 0
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for chunk in chunks:
+            batch = record_batch(fields, chunk, schema)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= row_group_rows:
+                table = pa.Table.from_batches(pending, schema)
+                writer.write_table(table, row_group_size=row_group_rows)
+                rows += pending_rows
+                pending, pending_rows = [], 0
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_rows)
+            rows += pending_rows
+    return rows
+
+
+_WRITERS = {"csv": write_csv, "parquet": write_parquet, "arrow": write_arrow}
+
+
+def write_table(fileobj: BinaryIO, fmt: str, fields: Sequence[Field], chunks: Iterable[Dict]) -> int:
+    """
+    按格式逐块写出列数组
+
+    Args:
+        fileobj: 可写的二进制文件对象（由调用方打开和关闭）
+        fmt: 导出格式（csv、parquet、arrow）
+        fields: 导出的列
+        chunks: 各块的 {列名: 列数组}，缺少的列为空值
+
+    Returns:
+        int: 写出的数据行数
+
+    Raises:
+        ValueError: 不支持的导出格式
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选 {', '.join(EXPORT_FORMATS)}")
+    return _WRITERS[fmt](fileobj, fields, chunks)
+
@@ -0,0 +1,353 @@
+"""
+流式Excel导出
+直接写出xlsx（SpreadsheetML）：工作表XML按块生成并写入zip流，写完一个工作表再写下一个，
+数值单元格保存原始数值并以Excel数字格式显示。不依赖pandas、openpyxl，内存占用与行数无关
+"""
+
+import functools
+import math
+import re
+import zipfile
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+CURRENCY_FORMAT = '"¥"#,##0.00'
+PERCENT_FORMAT = "0.0000%"
+
+# Excel单个工作表的行数上限（含表头）；超出时续写到同名加序号的工作表
+MAX_SHEET_ROWS = 1048576
+# 列数组每次转换为XML的行数
+BLOCK_ROWS = 4096
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# 工作表名不允许的字符
+_ILLEGAL_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+_HEADER_STYLE = 1  # cellXfs中表头（粗体）的样式序号
+
+
+class Number(NamedTuple):
+    """带数字格式的数值单元格（用于各行格式不同的键值表）"""
+
+    value: float
+    number_format: str
+
+
+def currency_cell(value):
+    """金额单元格：数值以货币格式显示，其他值原样写出"""
+    return Number(value, CURRENCY_FORMAT) if _is_number(value) else value
+
+
+def percent_cell(value):
+    """百分比单元格：数值以百分比格式显示，其他值原样写出"""
+    return Number(value, PERCENT_FORMAT) if _is_number(value) else value
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+
+
+@functools.lru_cache(maxsize=None)
+def column_letter(index: int) -> str:
+    """列序号（从0开始）对应的列字母：0 -> A，26 -> AA"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class ExcelWriter:
+    """
+    流式xlsx写出器
+
+    工作表依次写出：write_rows 逐行写出Python值（小表），write_columns 逐块写出列数组（还款计划等大表）。
+    close 时写出工作簿结构与样式；fileobj 由调用方打开和关闭
+    """
+
+    def __init__(self, fileobj: BinaryIO, compresslevel: int = 1):
+        """
+        Args:
+            fileobj: 可写的二进制文件对象
+            compresslevel: zlib压缩级别（1最快）
+        """
+        self._zip = zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._sheets: List[str] = []
+        self._formats: Dict[str, int] = {}  # 数字格式 -> cellXfs中的样式序号
+        self._sheet: Optional["_TextStream"] = None  # 正在写出的工作表
+
+    def __enter__(self) -> "ExcelWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_rows(self, name: str, header: Sequence[str], rows: Iterable[Sequence], width: float = 20) -> None:
+        """
+        逐行写出工作表
+
+        Args:
+            name: 工作表名
+            header: 表头
+            rows: 各行单元格值：str为文本，int/float为数值，Number为带格式的数值，None为空单元格
+            width: 列宽
+        """
+        sheet = self._open_sheet(name, len(header), width)
+        sheet.write(self._row_xml(1, header, header=True))
+        for number, row in enumerate(rows, 2):
+            sheet.write(self._row_xml(number, row))
+        self._close_sheet(sheet)
+
+    def write_columns(
+        self,
+        name: str,
+        header: Sequence[str],
+        chunks: Iterable[Sequence[np.ndarray]],
+        formats: Sequence[Optional[str]],
+        width: float = 16,
+    ) -> int:
+        """
+        逐块写出数值列，每块先转换为XML再写入，不逐行构造字典
+
+        Args:
+            name: 工作表名；超出行数上限时续写到“名称(2)”等工作表
+            header: 表头
+            chunks: 各块的列数组（长度相同，块的大小不限）；可省略末尾的列，省略的单元格留空
+            formats: 各列的数字格式，None为常规格式
+            width: 列宽
+
+        Returns:
+            写出的数据行数
+        """
+        templates: Dict[int, str] = {}
+        written, part = 0, 1
+        sheet = self._open_sheet(name, len(header), width)
+        sheet.write(self._row_xml(1, header, header=True))
+        row_number = 2
+
+        for columns in chunks:
+            count = len(columns[0]) if len(columns) else 0
+            start = 0
+            while start < count:
+                if row_number > MAX_SHEET_ROWS:
+                    self._close_sheet(sheet)
+                    part += 1
+                    sheet = self._open_sheet(f"{name}({part})", len(header), width)
+                    sheet.write(self._row_xml(1, header, header=True))
+                    row_number = 2
+                stop = min(count, start + BLOCK_ROWS, start + MAX_SHEET_ROWS - row_number + 1)
+                block = [np.asarray(column[start:stop]) for column in columns]
+                sheet.write(self._block_xml(row_number, block, formats, templates))
+                row_number += stop - start
+                written += stop - start
+                start = stop
+
+        self._close_sheet(sheet)
+        return written
+
+    def close(self) -> None:
+        """写出工作簿、关系与样式部件并结束zip"""
+        if self._zip is None:
+            return
+        sheets = "".join(
+            f'<sheet name={quoteattr(name)} sheetId="{k}" r:id="rId{k}"/>' for k, name in enumerate(self._sheets, 1)
+        )
+        self._write_part(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>',
+        )
+        relations = "".join(
+            f'<Relationship Id="rId{k}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{k}.xml"/>'
+            for k in range(1, len(self._sheets) + 1)
+        )
+        relations += f'<Relationship Id="rId{len(self._sheets) + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        self._write_part(
+            "xl/_rels/workbook.xml.rels", f'<Relationships xmlns="{_PACKAGE_REL_NS}">{relations}</Relationships>'
+        )
+        self._write_part("xl/styles.xml", self._styles_xml())
+        self._write_part(
+            "_rels/.rels",
+            f'<Relationships xmlns="{_PACKAGE_REL_NS}"><Relationship Id="rId1" '
+            f'Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>',
+        )
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{k}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for k in range(1, len(self._sheets) + 1)
+        )
+        self._write_part(
+            "[Content_Types].xml",
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{overrides}</Types>",
+        )
+        self._zip.close()
+        self._zip = None
+
+    def abort(self) -> None:
+        """写出出错时结束zip（文件内容不完整，由调用方丢弃）"""
+        if self._zip is None:
+            return
+        try:
+            if self._sheet is not None:
+                self._sheet.close()
+            self._zip.close()
+        except (OSError, ValueError):
+            pass
+        self._sheet = self._zip = None
+
+    def _open_sheet(self, name: str, columns: int, width: float):
+        """开始写出工作表，返回zip内的写出流"""
+        name = _ILLEGAL_SHEET_CHARS.sub("_", name)[:31]
+        if name in self._sheets:
+            raise ValueError(f"工作表名重复: {name}")
+        self._sheets.append(name)
+        stream = self._zip.open(f"xl/worksheets/sheet{len(self._sheets)}.xml", "w")
+        stream.write(
+            (
+                f'{_XML_DECLARATION}<worksheet xmlns="{_MAIN_NS}"><sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                f'<cols><col min="1" max="{max(columns, 1)}" width="{width}" customWidth="1"/></cols><sheetData>'
+            ).encode("utf-8")
+        )
+        self._sheet = _TextStream(stream)
+        return self._sheet
+
+    def _close_sheet(self, sheet: "_TextStream") -> None:
+        sheet.write("</sheetData></worksheet>")
+        sheet.close()
+        self._sheet = None
+
+    def _write_part(self, path: str, xml: str) -> None:
+        self._zip.writestr(path, _XML_DECLARATION + xml)
+
+    def _style(self, number_format: Optional[str]) -> int:
+        """数字格式对应的样式序号（0为常规格式）"""
+        if number_format is None:
+            return 0
+        if number_format not in self._formats:
+            self._formats[number_format] = _HEADER_STYLE + 1 + len(self._formats)
+        return self._formats[number_format]
+
+    def _cell_xml(self, ref: str, value) -> str:
+        style = 0
+        if isinstance(value, Number):
+            value, style = value.value, self._style(value.number_format)
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            text = escape(_ILLEGAL_XML_CHARS.sub("", value))
+            return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+        if isinstance(value, (bool, np.bool_)):
+            return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return ""
+        attr = f' s="{style}"' if style else ""
+        return f'<c r="{ref}"{attr}><v>{value!r}</v></c>'
+
+    def _row_xml(self, number: int, values: Sequence, header: bool = False) -> str:
+        cells = []
+        for k, value in enumerate(values):
+            ref = f"{column_letter(k)}{number}"
+            if header:
+                text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+                cells.append(f'<c r="{ref}" s="{_HEADER_STYLE}" t="inlineStr"><is><t>{text}</t></is></c>')
+            else:
+                cells.append(self._cell_xml(ref, value))
+        return f'<row r="{number}">{"".join(cells)}</row>'
+
+    def _block_xml(self, first_row: int, block: List[np.ndarray], formats, templates: Dict[int, str]) -> str:
+        """一块数值列转换为行XML：各列整体转为Python数值后按预先生成的行模板格式化"""
+        if not all(column.dtype.kind in "iu" or np.isfinite(column).all() for column in block):
+            # 含非有限数值时逐格写出（留空）
+            rows = zip(*(column.tolist() for column in block))
+            return "".join(
+                self._row_xml(number, [Number(v, f) if f else v for v, f in zip(row, formats)])
+                for number, row in enumerate(rows, first_row)
+            )
+
+        width = len(block)
+        template = templates.get(width)
+        if template is None:
+            cells = []
+            for k in range(width):
+                style = self._style(formats[k])
+                attr = f' s="{style}"' if style else ""
+                cells.append(f'<c r="{column_letter(k)}{{0}}"{attr}><v>{{{k + 1}!r}}</v></c>')
+            template = templates[width] = f'<row r="{{0}}">{"".join(cells)}</row>'
+        rows = zip(range(first_row, first_row + len(block[0])), *(column.tolist() for column in block))
+        return "".join([template.format(*row) for row in rows])
+
+    def _styles_xml(self) -> str:
+        """样式部件：0为常规，1为表头粗体，其后为各数字格式（自定义格式编号从164开始）"""
+        num_fmts = "".join(
+            f'<numFmt numFmtId="{164 + k}" formatCode={quoteattr(number_format)}/>'
+            for k, number_format in enumerate(self._formats)
+        )
+        xfs = "".join(
+            f'<xf numFmtId="{164 + k}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+            for k in range(len(self._formats))
+        )
+        return (
+            f'<styleSheet xmlns="{_MAIN_NS}">'
+            + (f'<numFmts count="{len(self._formats)}">{num_fmts}</numFmts>' if self._formats else "")
+            + '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{2 + len(self._formats)}">'
+            '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+            f"{xfs}</cellXfs>"
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            "</styleSheet>"
+        )
+
+
+class _TextStream:
+    """zip写出流的文本包装：累积到一定大小再编码写入，减少zlib调用次数"""
+
+    BUFFER_SIZE = 256 * 1024
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer: List[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._stream.write("".join(self._buffer).encode("utf-8"))
+            self._buffer, self._size = [], 0
+
+    def close(self) -> None:
+        self.flush()
+        self._stream.close()
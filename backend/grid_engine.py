@@ -0,0 +1,363 @@
+"""
+敏感性网格引擎
+对 利率 × 期数 × 本金 × 年付次数 的任意维组合按NumPy广播一次性计算
+每期租金、总利息、总租金及IRR，各格结果与逐笔调用LeaseCalculator的结果逐分一致
+"""
+
+from decimal import Decimal
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
+
+from irr_engine import solve_level_irr_batch, solve_period_irr_batch
+from schedule_engine import (
+    CENT,
+    MAX_EXACT_AMOUNT,
+    annuity_payment,
+    money_context,
+    round_interest_cents_array,
+    to_cents,
+    to_decimal,
+)
+
+ArrayLike = Union[float, int, Sequence, np.ndarray]
+
+GRID_METHODS = ("equal_annuity", "equal_principal")
+
+# 浮点租金距离0.5分舍入边界的相对安全距离；落在该范围内的格回退到Decimal公式
+_PMT_TIE_GUARD = 1e-9
+
+_MAX_EXACT_CENTS = int(MAX_EXACT_AMOUNT.scaleb(2))
+
+
+def _broadcast(pv: ArrayLike, annual_rate: ArrayLike, periods: ArrayLike, frequency: ArrayLike) -> Dict:
+    """广播四个参数并展平为一维，同时给出参数合法性及整数分精确范围的掩码"""
+    pv, annual_rate, periods, frequency = np.broadcast_arrays(
+        np.asarray(pv, dtype=np.float64),
+        np.asarray(annual_rate, dtype=np.float64),
+        np.asarray(periods, dtype=np.int64),
+        np.asarray(frequency, dtype=np.int64),
+    )
+    shape = pv.shape
+    pv, annual_rate, periods, frequency = (value.ravel() for value in (pv, annual_rate, periods, frequency))
+
+    # 与 LeaseCalculator._validate_parameters 的规则一致
+    valid = (pv > 0) & (annual_rate >= 0) & (periods > 0) & (frequency > 0)
+
+    # 精确范围内的格走整数分路径；本金含分以下尾数的格首期按Decimal计算
+    pv_cents = np.rint(pv * 100)
+    exact = valid & (pv < float(MAX_EXACT_AMOUNT))
+    sub_cent = exact & (pv_cents / 100 != pv)
+
+    return {
+        "shape": shape,
+        "pv": pv,
+        "annual_rate": annual_rate,
+        "periods": periods,
+        "frequency": frequency,
+        "valid": valid,
+        "exact": exact,
+        "sub_cent": sub_cent,
+        "pv_cents": np.where(exact & ~sub_cent, pv_cents, 0).astype(np.int64),
+        "rate_float": annual_rate / np.where(frequency > 0, frequency, 1),
+    }
+
+
+def _decimal_period_rates(grid: Dict) -> np.ndarray:
+    """逐格的Decimal期利率（与各计算方法 to_decimal(年利率) / to_decimal(年付次数) 一致）"""
+    # 网格中的 (年利率, 年付次数) 组合通常远少于格数，只对不同组合各做一次Decimal除法
+    pairs, inverse = np.unique(
+        np.stack([grid["annual_rate"], grid["frequency"].astype(np.float64)], axis=1), axis=0, return_inverse=True
+    )
+    unique_rates = np.empty(len(pairs), dtype=object)
+    for k, (annual_rate, frequency) in enumerate(pairs):
+        if frequency > 0:
+            unique_rates[k] = to_decimal(float(annual_rate)) / to_decimal(int(frequency))
+    return unique_rates[inverse.ravel()]
+
+
+def _annual_irr(period_irr: np.ndarray, frequency: np.ndarray) -> np.ndarray:
+    """期IRR换算为年化IRR，保留6位小数，无解时为0（与calculate_irr一致）"""
+    with np.errstate(over="ignore", invalid="ignore"):
+        annual = np.power(1 + period_irr, frequency) - 1
+    return np.round(np.nan_to_num(annual, nan=0.0), 6)
+
+
+def _annuity_payment_cents(grid: Dict, period_rates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    逐格等额年金租金（分）：浮点公式批量求值，贴近半分边界的格回退到Decimal公式
+
+    Returns:
+        Tuple: (租金分数组, 掩码)；租金超出整数分精确范围（含溢出为inf、nan）及参数不合法的格不在掩码内，租金记为0
+    """
+    pv, n, i = grid["pv"], grid["periods"].astype(np.float64), grid["rate_float"]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        pmt = np.where(i == 0, pv / np.maximum(n, 1), pv * i / -np.expm1(-n * np.log1p(i)))
+        x = pmt * 100
+    in_range = grid["exact"] & (np.abs(x) < _MAX_EXACT_CENTS)
+    x = np.where(in_range, x, 0.0)
+    cents = np.rint(x)
+    frac = x - np.floor(x)
+    near_tie = in_range & (np.abs(frac - 0.5) <= _PMT_TIE_GUARD * np.maximum(1.0, np.abs(x)))
+    for k in np.flatnonzero(near_tie):
+        exact_pmt = annuity_payment(to_decimal(float(pv[k])), period_rates[k], int(grid["periods"][k]))
+        cents[k] = float(exact_pmt.scaleb(2))
+    return cents.astype(np.int64), in_range
+
+
+@money_context
+def annuity_grid(
+    pv: ArrayLike,
+    annual_rate: ArrayLike,
+    periods: ArrayLike,
+    frequency: ArrayLike = 12,
+) -> Dict[str, np.ndarray]:
+    """
+    等额年金法网格计算
+
+    各参数按NumPy广播规则组合（如 rates[:, None] 与 terms[None, :] 得到二维表）。
+    总利息按各格期数逐期递推整数分余额（所有格同步向量化推进），舍入规则与Decimal参考实现一致
+
+    Args:
+        pv: 租赁本金
+        annual_rate: 年利率
+        periods: 总期数
+        frequency: 年付次数
+
+    Returns:
+        Dict: pmt、total_interest、total_payment、irr 四个结果数组，
+        以及 valid（参数合法）与 fallback（需逐格按Decimal参考实现计算）两个掩码
+    """
+    grid = _broadcast(pv, annual_rate, periods, frequency)
+    period_rates = _decimal_period_rates(grid)
+    n = grid["periods"]
+
+    pmt_cents, in_range = _annuity_payment_cents(grid, period_rates)
+    exact = in_range & (np.abs(pmt_cents * n.astype(np.float64)) < _MAX_EXACT_CENTS)
+
+    balance = grid["pv_cents"].copy()
+    total_interest = np.zeros_like(balance)
+    start = np.zeros_like(balance)
+
+    # 本金含分以下尾数的格首期按Decimal计算，之后余额已精确到分（与整数分引擎相同）
+    for k in np.flatnonzero(grid["sub_cent"]):
+        pv_k = to_decimal(float(grid["pv"][k]))
+        pmt_k = Decimal(int(pmt_cents[k])).scaleb(-2)
+        first_interest = (pv_k * period_rates[k]).quantize(CENT)
+        first_principal = (pmt_k - first_interest).quantize(CENT)
+        balance[k] = to_cents((pv_k - first_principal).quantize(CENT))
+        total_interest[k] = to_cents(first_interest)
+        start[k] = 1
+
+    # 所有格同步逐期递推，期数较短的格提前冻结
+    rate_float = grid["rate_float"]
+    live = exact.copy()
+    for k in range(int(n[exact].max(initial=0))):
+        live &= k < n
+        if k == 0:
+            live &= start == 0
+        elif k == 1:
+            live |= exact & (start == 1) & (k < n)
+        rows = np.flatnonzero(live)
+        interest = round_interest_cents_array(balance[rows], period_rates[rows], rate_float[rows])
+        balance[rows] -= pmt_cents[rows] - interest
+        total_interest[rows] += interest
+        overflow = rows[np.abs(balance[rows]) >= _MAX_EXACT_CENTS]
+        exact[overflow] = False
+        live[overflow] = False
+
+    pmt = pmt_cents / 100
+    period_irr = solve_level_irr_batch(-grid["pv"], pmt, n, guess=rate_float)
+
+    shape = grid["shape"]
+    return {
+        "pmt": np.where(grid["valid"], pmt, np.nan).reshape(shape),
+        "total_interest": np.where(exact, total_interest / 100, np.nan).reshape(shape),
+        "total_payment": np.where(grid["valid"], pmt_cents * n / 100, np.nan).reshape(shape),
+        "irr": np.where(grid["valid"], _annual_irr(period_irr, grid["frequency"]), np.nan).reshape(shape),
+        "valid": grid["valid"].reshape(shape),
+        "fallback": (grid["valid"] & ~exact).reshape(shape),
+    }
+
+
+def _principal_per_period_cents(grid: Dict) -> np.ndarray:
+    """
+    逐格等额本金法每期本金（分）
+
+    整数运算得出 PV / n 的四舍六入五成双结果；Decimal 15位有效数字的中间舍入
+    只可能影响贴近半分边界的格，这些格回退到Decimal
+    """
+    pv_cents, n = grid["pv_cents"], np.maximum(grid["periods"], 1)
+    quotient, remainder = np.divmod(pv_cents, n)
+    twice = 2 * remainder
+    cents = quotient + (twice > n) + ((twice == n) & (quotient % 2 == 1))
+
+    near_tie = grid["exact"] & (twice != n) & (np.abs(twice - n) < 2 * n * 1e-2)
+    for k in np.flatnonzero(near_tie | grid["sub_cent"]):
+        exact_value = (to_decimal(float(grid["pv"][k])) / to_decimal(int(n[k]))).quantize(Decimal("0.01"))
+        cents[k] = int(exact_value.scaleb(2))
+    return cents
+
+
+@money_context
+def principal_grid(
+    pv: ArrayLike,
+    annual_rate: ArrayLike,
+    periods: ArrayLike,
+    frequency: ArrayLike = 12,
+) -> Dict[str, np.ndarray]:
+    """
+    等额本金法网格计算
+
+    各期期初余额为 PV - (k-1) × 每期本金，与利息无关，全部格、全部期的利息一次向量化舍入。
+    pmt 为平均每期租金（总租金 / 期数）
+
+    Args:
+        pv: 租赁本金
+        annual_rate: 年利率
+        periods: 总期数
+        frequency: 年付次数
+
+    Returns:
+        Dict: 结构同 annuity_grid
+    """
+    grid = _broadcast(pv, annual_rate, periods, frequency)
+    period_rates = _decimal_period_rates(grid)
+    n = grid["periods"]
+    exact = grid["exact"]
+
+    rows = np.flatnonzero(exact)
+    principal_cents = _principal_per_period_cents(grid)
+    max_n = int(n[rows].max(initial=0))
+
+    # 本金含分以下尾数的格：首期利息按Decimal计算，第2期起余额为 round(PV - 每期本金) - (k-2) × 每期本金
+    start_cents = grid["pv_cents"].copy()
+    first_interest = {}
+    for k in np.flatnonzero(grid["sub_cent"]):
+        pv_k = to_decimal(float(grid["pv"][k]))
+        principal_k = Decimal(int(principal_cents[k])).scaleb(-2)
+        first_interest[k] = to_cents((pv_k * period_rates[k]).quantize(CENT))
+        start_cents[k] = to_cents((pv_k - principal_k).quantize(CENT)) + int(principal_cents[k])
+
+    # 行为格、列为期的期初余额矩阵，超出各格期数的部分不参与
+    index = np.arange(max_n)
+    in_term = index < n[rows, None]
+    balances = start_cents[rows, None] - principal_cents[rows, None] * index
+    rates = np.broadcast_to(period_rates[rows, None], balances.shape)
+    interest = np.where(
+        in_term,
+        round_interest_cents_array(
+            np.where(in_term, balances, 0), rates, np.broadcast_to(grid["rate_float"][rows, None], balances.shape)
+        ),
+        0,
+    )
+    if first_interest:
+        position = np.searchsorted(rows, list(first_interest))
+        interest[position, 0] = list(first_interest.values())
+    payments = principal_cents[rows, None] + interest
+
+    total_interest = np.zeros(len(n), dtype=np.int64)
+    total_interest[rows] = interest.sum(axis=1)
+    total_payment = principal_cents * n + total_interest
+
+    # 非等额现金流按矩阵批量求IRR
+    period_irr = np.full(len(n), np.nan)
+    if len(rows):
+        cash_flows = np.empty((len(rows), max_n + 1))
+        cash_flows[:, 0] = -grid["pv"][rows]
+        cash_flows[:, 1:] = np.where(in_term, payments / 100, 0.0)
+        period_irr[rows] = solve_period_irr_batch(cash_flows, lengths=n[rows] + 1, guess=grid["rate_float"][rows])
+
+    shape = grid["shape"]
+    return {
+        "pmt": np.where(exact, total_payment / 100 / np.maximum(n, 1), np.nan).reshape(shape),
+        "total_interest": np.where(exact, total_interest / 100, np.nan).reshape(shape),
+        "total_payment": np.where(exact, total_payment / 100, np.nan).reshape(shape),
+        "irr": np.where(exact, _annual_irr(period_irr, grid["frequency"]), np.nan).reshape(shape),
+        "valid": grid["valid"].reshape(shape),
+        "fallback": (grid["valid"] & ~exact).reshape(shape),
+    }
+
+
+def _annuity_factor_derivatives(rate: np.ndarray, n: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    年金系数 a(i) = (1 - (1+i)^-n) / i 及其一、二阶导数（逐元素）
+
+    a' = (n(1+i)^(-n-1) - a) / i，a'' = -(n(n+1)(1+i)^(-n-2) + 2a') / i；零利率附近使用泰勒展开
+    """
+    small = np.abs(rate) < 1e-6
+    safe = np.where(small, 1.0, rate)
+    discount = np.power(1.0 + rate, -n)
+    s1 = n * (n + 1) / 2
+    s2 = s1 * (n + 2) / 3
+    s3 = s2 * (n + 3) / 4
+    annuity = np.where(small, n - s1 * rate + s2 * rate**2 - s3 * rate**3, (1 - discount) / safe)
+    first = np.where(small, -s1 + 2 * s2 * rate - 3 * s3 * rate**2, (n * discount / (1 + rate) - annuity) / safe)
+    second = np.where(
+        small, 2 * s2 - 6 * s3 * rate, -(n * (n + 1) * discount / (1 + rate) ** 2 + 2 * first) / safe
+    )
+    return annuity, first, second
+
+
+def annuity_sensitivities(
+    pv: ArrayLike,
+    annual_rate: ArrayLike,
+    periods: ArrayLike,
+    frequency: ArrayLike = 12,
+) -> Dict[str, np.ndarray]:
+    """
+    等额年金法的解析敏感性（按NumPy广播逐元素计算）
+
+    租金取未舍入的年金公式 PMT = PV / a(i)，i = 年利率 / 年付次数；久期与凸性按合同期利率
+    （即未舍入租金的期IRR）对租金现金流折现，以年为单位，对应名义年利率的变动
+
+    Args:
+        pv: 租赁本金
+        annual_rate: 年利率
+        periods: 总期数（可为非整数，用于期限导数）
+        frequency: 年付次数
+
+    Returns:
+        Dict: 各项敏感性数组，参数不合法的元素为nan
+            pmt: 每期租金（未舍入）
+            dpmt_drate: 租金对年利率的导数
+            dpmt_dperiods: 租金对期数的导数（期数视为连续变量）
+            dpmt_dpv: 租金对本金的导数
+            dirr_dpmt: 年化IRR对每期租金的导数
+            dirr_dpv: 年化IRR对本金的导数
+            macaulay_duration: 麦考利久期（年）
+            modified_duration: 修正久期（年）
+            convexity: 凸性（年²）
+    """
+    pv, annual_rate, periods, frequency = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (pv, annual_rate, periods, frequency))
+    )
+    valid = (pv > 0) & (annual_rate >= 0) & (periods > 0) & (frequency > 0)
+    frequency = np.where(valid, frequency, 1.0)
+    n = np.where(valid, periods, 1.0)
+    i = np.where(valid, annual_rate, 0.0) / frequency
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        annuity, d_annuity, d2_annuity = _annuity_factor_derivatives(i, n)
+        pmt = pv / annuity
+
+        # d(1/a)/dn = -(da/dn)/a²，da/dn = ln(1+i)(1+i)^-n / i，零利率时为1
+        log_growth = np.log1p(i)
+        da_dn = np.where(i == 0, 1.0, np.power(1.0 + i, -n) * log_growth / np.where(i == 0, 1.0, i))
+
+        # 期IRR r 满足 a(r) × PMT = PV：dr/dPMT = -a / (PMT a')，dr/dPV = 1 / (PMT a')；年化IRR = (1+r)^f - 1
+        annualize = frequency * np.power(1.0 + i, frequency - 1)
+
+        modified = -d_annuity / annuity
+        result = {
+            "pmt": pmt,
+            "dpmt_drate": -pv * d_annuity / annuity**2 / frequency,
+            "dpmt_dperiods": -pv * da_dn / annuity**2,
+            "dpmt_dpv": 1 / annuity,
+            "dirr_dpmt": -annuity / (pmt * d_annuity) * annualize,
+            "dirr_dpv": 1 / (pmt * d_annuity) * annualize,
+            "macaulay_duration": modified * (1 + i) / frequency,
+            "modified_duration": modified / frequency,
+            "convexity": d2_annuity / annuity / frequency**2,
+        }
+    return {name: np.where(valid, values, np.nan) for name, values in result.items()}
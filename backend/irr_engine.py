@@ -0,0 +1,483 @@
+"""
+内部收益率(IRR)求解引擎
+对NPV函数使用带区间保护的牛顿法（解析导数），等额现金流使用年金公式在O(1)内求值，
+替代numpy_financial.irr基于伴随矩阵特征值的多项式求根
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# 导入numpy_financial（仅用于多次变号的非常规现金流）
+try:
+    import numpy_financial as npf
+except ImportError:
+    npf = None
+
+DEFAULT_GUESS = 0.01
+TOLERANCE = 1e-13
+MAX_ITERATIONS = 100
+
+# 括区间扩展上限：期利率超过该值时视为无解
+_MAX_RATE = 1e6
+
+
+def count_sign_changes(values: np.ndarray) -> int:
+    """统计非零现金流的符号变化次数"""
+    signs = np.sign(values[values != 0])
+    return int(np.count_nonzero(signs[1:] != signs[:-1]))
+
+
+def level_payment(values: np.ndarray) -> Optional[Tuple[float, float, int]]:
+    """
+    识别 [c0, p, p, ..., p] 形式的等额现金流
+
+    Returns:
+        Optional[Tuple]: (c0, p, n)，不是等额现金流时返回None
+    """
+    if len(values) < 2:
+        return None
+    payments = values[1:]
+    if np.all(payments == payments[0]):
+        return float(values[0]), float(payments[0]), len(payments)
+    return None
+
+
+def _annuity_npv(rate: float, c0: float, pmt: float, n: int) -> Tuple[float, float]:
+    """等额现金流的NPV及其对期利率的导数（年金公式闭式求值）"""
+    if abs(rate) < 1e-6:
+        # 零利率附近使用泰勒展开，避免年金公式的 0/0 抵消误差
+        s1 = n * (n + 1) / 2
+        s2 = s1 * (n + 2) / 3
+        s3 = s2 * (n + 3) / 4
+        annuity = n - s1 * rate + s2 * rate**2 - s3 * rate**3
+        derivative = -s1 + 2 * s2 * rate - 3 * s3 * rate**2
+    else:
+        discount = np.power(1.0 + rate, -n)
+        annuity = (1 - discount) / rate
+        derivative = (n * discount / (1 + rate) - annuity) / rate
+    return float(c0 + pmt * annuity), float(pmt * derivative)
+
+
+class _NPV:
+    """NPV及其解析导数的求值器"""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self.level = level_payment(values)
+        self.index = np.arange(len(values), dtype=np.float64)
+        self.weighted = self.index * values
+
+    def __call__(self, rate: float) -> Tuple[float, float]:
+        if self.level is not None:
+            return _annuity_npv(rate, *self.level)
+        discount = np.power(1.0 + rate, -self.index)
+        npv = float(self.values @ discount)
+        derivative = -float(self.weighted @ discount) / (1.0 + rate)
+        return npv, derivative
+
+
+def _bracket(npv: _NPV, guess: float) -> Optional[Tuple[float, float, float, float]]:
+    """
+    从初值出发找到NPV变号的区间
+
+    单次变号的现金流在利率趋于+inf时NPV与首个非零现金流同号，趋于-1时与末个非零现金流同号，
+    据此判断根位于初值的哪一侧，只向该侧扩展
+    """
+    f_guess, _ = npv(guess)
+    if f_guess == 0:
+        return guess, guess, f_guess, f_guess
+    if math.isnan(f_guess):
+        return None
+
+    sign = np.sign(f_guess)
+    first_sign = np.sign(npv.values[np.flatnonzero(npv.values)[0]])
+
+    if sign != first_sign:
+        # 根在右侧：步长倍增向右扩展
+        lo, f_lo = guess, f_guess
+        step = max(abs(guess), DEFAULT_GUESS)
+        while lo < _MAX_RATE:
+            hi = lo + step
+            f_hi, _ = npv(hi)
+            if math.isnan(f_hi):
+                return None
+            if np.sign(f_hi) != sign:
+                return lo, hi, f_lo, f_hi
+            lo, f_lo, step = hi, f_hi, step * 2
+        return None
+
+    # 根在左侧：步长倍增向左扩展，每步至多走到与-1距离的一半
+    hi, f_hi = guess, f_guess
+    step = max(abs(guess), DEFAULT_GUESS)
+    for _ in range(200):
+        lo = max(hi - step, -1 + (1 + hi) / 2)
+        f_lo, _ = npv(lo)
+        if math.isnan(f_lo):
+            return None
+        if np.sign(f_lo) != sign:
+            return lo, hi, f_lo, f_hi
+        hi, f_hi, step = lo, f_lo, step * 2
+    return None
+
+
+def solve_period_irr(
+    cash_flows: Sequence[float],
+    guess: Optional[float] = None,
+    tolerance: float = TOLERANCE,
+    max_iterations: int = MAX_ITERATIONS,
+) -> float:
+    """
+    求解期IRR
+
+    仅一次变号的常规现金流在 (-1, +inf) 内有唯一解，使用带括区间保护的牛顿法：
+    牛顿步落在区间外或收敛过慢时改用二分；多次变号的现金流交由numpy_financial处理，
+    以保持原有的根选择规则
+
+    Args:
+        cash_flows: 现金流序列
+        guess: 期利率初值（通常为名义期利率）
+        tolerance: 收敛容差
+        max_iterations: 最大迭代次数
+
+    Returns:
+        float: 期IRR，无解时返回nan
+    """
+    # 末尾的零现金流不影响NPV，去掉以免贴近-1时出现 0 * inf
+    values = np.trim_zeros(np.asarray(cash_flows, dtype=np.float64), "b")
+    sign_changes = count_sign_changes(values)
+    if sign_changes == 0:
+        return float("nan")
+    if sign_changes > 1 and npf is not None:
+        return float(npf.irr(values))
+
+    npv = _NPV(values)
+    rate = DEFAULT_GUESS if guess is None or not guess > -1 else float(guess)
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        bracket = _bracket(npv, rate)
+        if bracket is None:
+            return float("nan")
+        lo, hi, f_lo, f_hi = bracket
+        if lo == hi:
+            return lo
+        rate = min(max(rate, lo), hi)
+
+        # 牛顿步越出区间或收缩不足一半时改用二分（rtsafe策略）
+        dx_old = dx = hi - lo
+        for _ in range(max_iterations):
+            f, derivative = npv(rate)
+            if f == 0:
+                return rate
+
+            # 收紧区间
+            if np.sign(f) == np.sign(f_lo):
+                lo, f_lo = rate, f
+            else:
+                hi, f_hi = rate, f
+
+            newton_ok = (
+                derivative != 0 and lo < rate - f / derivative < hi and abs(2 * f) <= abs(dx_old * derivative)
+            )
+            dx_old = dx
+            dx = -f / derivative if newton_ok else (lo + hi) / 2 - rate
+            rate += dx
+            if abs(dx) <= tolerance * (1 + abs(rate)):
+                return rate
+
+    return rate
+
+
+def pad_cash_flows(cash_flows: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    将长度不一的现金流序列补零为矩阵
+
+    Returns:
+        Tuple: (现金流矩阵, 每行有效长度)
+    """
+    lengths = np.fromiter((len(row) for row in cash_flows), dtype=np.int64, count=len(cash_flows))
+    matrix = np.zeros((len(cash_flows), int(lengths.max(initial=0))), dtype=np.float64)
+    for i, row in enumerate(cash_flows):
+        matrix[i, : lengths[i]] = row
+    return matrix, lengths
+
+
+def _annuity_factor(rate: np.ndarray, n: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """年金系数 (1 - (1+r)^-n) / r 及其对r的导数（逐元素），零利率附近使用泰勒展开"""
+    small = np.abs(rate) < 1e-6
+    safe = np.where(small, 1.0, rate)
+    discount = np.power(1.0 + rate, -n)
+    s1 = n * (n + 1) / 2
+    s2 = s1 * (n + 2) / 3
+    s3 = s2 * (n + 3) / 4
+    annuity = np.where(small, n - s1 * rate + s2 * rate**2 - s3 * rate**3, (1 - discount) / safe)
+    derivative = np.where(
+        small, -s1 + 2 * s2 * rate - 3 * s3 * rate**2, (n * discount / (1 + rate) - annuity) / safe
+    )
+    return annuity, derivative
+
+
+class _BatchNPV:
+    """
+    现金流矩阵逐行的NPV及导数求值器
+
+    等额现金流行使用年金公式，其余行在 x = 1/(1+r) 上用Horner法同时求多项式值及导数，
+    临时内存只与行数成正比
+    """
+
+    def __init__(self, values: np.ndarray, lengths: np.ndarray):
+        self.values = values
+        rows = np.arange(len(values))
+        self.first_sign = np.sign(values[rows, np.argmax(values != 0, axis=1)])
+
+        payments = values[:, 1:]
+        in_term = np.arange(1, values.shape[1]) < lengths[:, None]
+        self.level = (lengths >= 2) & np.all((payments == payments[:, :1]) | ~in_term, axis=1)
+        self.level_rows = np.flatnonzero(self.level)
+        self.level_c0 = values[self.level_rows, 0]
+        self.level_pmt = values[self.level_rows, 1] if values.shape[1] > 1 else np.zeros(0)
+        self.level_n = (lengths[self.level_rows] - 1).astype(np.float64)
+
+        self.other_rows = np.flatnonzero(~self.level)
+        # Horner只需遍历到非等额行中最后一个非零现金流
+        other = values[self.other_rows]
+        nonzero = other != 0
+        last = other.shape[1] - np.argmax(nonzero[:, ::-1], axis=1) if other.size else np.zeros(0, dtype=np.int64)
+        self.other_values = other[:, : int(last.max(initial=1))]
+
+    def __call__(self, rate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        npv = np.empty_like(rate)
+        derivative = np.empty_like(rate)
+
+        if len(self.level_rows):
+            annuity, d_annuity = _annuity_factor(rate[self.level_rows], self.level_n)
+            npv[self.level_rows] = self.level_c0 + self.level_pmt * annuity
+            derivative[self.level_rows] = self.level_pmt * d_annuity
+
+        if len(self.other_rows):
+            x = 1.0 / (1.0 + rate[self.other_rows])
+            values = self.other_values
+            p = values[:, -1].copy()
+            dp = np.zeros_like(p)
+            for t in range(values.shape[1] - 2, -1, -1):
+                dp = dp * x + p
+                p = p * x + values[:, t]
+            npv[self.other_rows] = p
+            derivative[self.other_rows] = -dp * x * x
+
+        return npv, derivative
+
+
+def _solve_chunk(
+    values: np.ndarray,
+    lengths: np.ndarray,
+    guess: np.ndarray,
+    tolerance: float,
+    max_iterations: int,
+) -> np.ndarray:
+    """对一块现金流矩阵逐行求期IRR，按行维护收敛掩码"""
+    result = np.full(len(values), np.nan)
+
+    # 逐行统计非零现金流的符号变化次数：零值沿用前一个非零值的符号
+    signs = np.sign(values)
+    filled_index = np.maximum.accumulate(np.where(signs != 0, np.arange(values.shape[1]), 0), axis=1)
+    filled = np.take_along_axis(signs, filled_index, axis=1)
+    changes = np.count_nonzero((filled[:, 1:] != filled[:, :-1]) & (filled[:, :-1] != 0), axis=1)
+
+    # 多次变号的行逐行处理，以保持原有的根选择规则
+    for i in np.flatnonzero(changes > 1):
+        result[i] = solve_period_irr(values[i, : lengths[i]], guess[i], tolerance, max_iterations)
+
+    rows = np.flatnonzero(changes == 1)
+    if len(rows):
+        result[rows] = _solve_rows(_BatchNPV(values[rows], lengths[rows]), guess[rows], tolerance, max_iterations)
+    return result
+
+
+def _solve_rows(npv, guess: np.ndarray, tolerance: float, max_iterations: int) -> np.ndarray:
+    """
+    逐行括区间保护牛顿法（各行现金流均只变号一次）
+
+    Args:
+        npv: 逐行NPV求值器，需提供 first_sign（各行首个非零现金流的符号）
+        guess: 逐行期利率初值
+
+    Returns:
+        np.ndarray: 每行的期IRR，无解时为nan
+    """
+    rate = np.where(guess > -1, guess, DEFAULT_GUESS)
+
+    # 1. 向根所在一侧扩展，找到变号区间
+    f_probe, _ = npv(rate)
+    sign = np.sign(f_probe)
+    right = sign != npv.first_sign
+    lo = rate.copy()
+    hi = rate.copy()
+    f_lo = f_probe.copy()
+    f_hi = f_probe.copy()
+    probe = rate.copy()
+    step = np.maximum(np.abs(rate), DEFAULT_GUESS)
+    pending = (f_probe != 0) & ~np.isnan(f_probe)
+    failed = np.isnan(f_probe)
+
+    for _ in range(200):
+        if not pending.any():
+            break
+        trial = np.where(right, probe + step, np.maximum(probe - step, -1 + (1 + probe) / 2))
+        f_trial, _ = npv(trial)
+        flipped = pending & (np.sign(f_trial) != sign)
+        lost = pending & (np.isnan(f_trial) | (trial >= _MAX_RATE))
+
+        set_right = flipped & right
+        set_left = flipped & ~right
+        lo = np.where(set_right, probe, np.where(set_left, trial, lo))
+        f_lo = np.where(set_right, f_probe, np.where(set_left, f_trial, f_lo))
+        hi = np.where(set_right, trial, np.where(set_left, probe, hi))
+        f_hi = np.where(set_right, f_trial, np.where(set_left, f_probe, f_hi))
+
+        moving = pending & ~flipped & ~lost
+        probe = np.where(moving, trial, probe)
+        f_probe = np.where(moving, f_trial, f_probe)
+        step = np.where(moving, step * 2, step)
+        failed |= lost & ~flipped
+        pending &= moving
+
+    failed |= pending
+
+    # 2. 区间保护牛顿迭代（rtsafe），每行独立判断收敛
+    rate = np.clip(rate, lo, hi)
+    active = ~failed & (lo != hi)
+    dx_old = dx = hi - lo
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        f, derivative = npv(rate)
+        zero = active & (f == 0)
+
+        same = np.sign(f) == np.sign(f_lo)
+        lo = np.where(active & same, rate, lo)
+        f_lo = np.where(active & same, f, f_lo)
+        hi = np.where(active & ~same, rate, hi)
+
+        newton = rate - f / derivative
+        newton_ok = (derivative != 0) & (lo < newton) & (newton < hi) & (np.abs(2 * f) <= np.abs(dx_old * derivative))
+        step = np.where(newton_ok, -f / derivative, (lo + hi) / 2 - rate)
+
+        update = active & ~zero
+        dx_old = np.where(update, dx, dx_old)
+        dx = np.where(update, step, dx)
+        rate = np.where(update, rate + step, rate)
+        active = update & ~(np.abs(step) <= tolerance * (1 + np.abs(rate)))
+
+    return np.where(failed, np.nan, rate)
+
+
+def solve_period_irr_batch(
+    cash_flows: Union[np.ndarray, Sequence[Sequence[float]]],
+    lengths: Optional[Sequence[int]] = None,
+    guess: Union[None, float, Sequence[float]] = None,
+    tolerance: float = TOLERANCE,
+    max_iterations: int = MAX_ITERATIONS,
+    chunk_size: int = 8192,
+) -> np.ndarray:
+    """
+    批量求解期IRR
+
+    Args:
+        cash_flows: 二维现金流矩阵，或长度不一的现金流序列（自动补零）
+        lengths: 每行有效长度，超出部分视为补齐值并忽略
+        guess: 期利率初值（标量或逐行数组）
+        tolerance: 收敛容差
+        max_iterations: 最大迭代次数
+        chunk_size: 每块行数，限制临时数组大小
+
+    Returns:
+        np.ndarray: 每行的期IRR，无解时为nan
+    """
+    if isinstance(cash_flows, np.ndarray):
+        matrix = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+        if lengths is None:
+            lengths = np.full(len(matrix), matrix.shape[1], dtype=np.int64)
+    else:
+        matrix, padded_lengths = pad_cash_flows(cash_flows)
+        if lengths is None:
+            lengths = padded_lengths
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if len(lengths) != len(matrix):
+        raise ValueError("现金流行数与长度向量不一致")
+    if np.any(lengths > matrix.shape[1]) or np.any(lengths < 0):
+        raise ValueError("现金流长度超出矩阵范围")
+
+    guesses = np.broadcast_to(
+        np.asarray(DEFAULT_GUESS if guess is None else guess, dtype=np.float64), (len(matrix),)
+    )
+
+    result = np.empty(len(matrix))
+    columns = np.arange(matrix.shape[1])
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        for start in range(0, len(matrix), chunk_size):
+            stop = min(start + chunk_size, len(matrix))
+            chunk_lengths = lengths[start:stop]
+            chunk = matrix[start:stop]
+            if np.any(chunk_lengths < matrix.shape[1]):
+                # 补齐部分置零，不参与NPV
+                chunk = np.where(columns < chunk_lengths[:, None], chunk, 0.0)
+            result[start:stop] = _solve_chunk(chunk, chunk_lengths, guesses[start:stop], tolerance, max_iterations)
+    return result
+
+
+class _LevelNPV:
+    """等额现金流 [c0, p, ..., p] 的逐行NPV求值器（年金公式，不展开现金流矩阵）"""
+
+    def __init__(self, c0: np.ndarray, pmt: np.ndarray, n: np.ndarray):
+        self.c0 = c0
+        self.pmt = pmt
+        self.n = n
+        self.first_sign = np.sign(np.where(c0 != 0, c0, pmt))
+
+    def __call__(self, rate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        annuity, derivative = _annuity_factor(rate, self.n)
+        return self.c0 + self.pmt * annuity, self.pmt * derivative
+
+
+def solve_level_irr_batch(
+    c0: Union[float, Sequence[float], np.ndarray],
+    pmt: Union[float, Sequence[float], np.ndarray],
+    periods: Union[int, Sequence[int], np.ndarray],
+    guess: Union[None, float, Sequence[float], np.ndarray] = None,
+    tolerance: float = TOLERANCE,
+    max_iterations: int = MAX_ITERATIONS,
+) -> np.ndarray:
+    """
+    批量求解等额现金流 [c0, pmt × periods] 的期IRR
+
+    各参数按NumPy规则广播，内存只与元素个数成正比，与期数无关
+
+    Args:
+        c0: 期初现金流
+        pmt: 每期等额现金流
+        periods: 期数
+        guess: 期利率初值
+        tolerance: 收敛容差
+        max_iterations: 最大迭代次数
+
+    Returns:
+        np.ndarray: 期IRR（形状为广播后的形状），无解时为nan
+    """
+    guess = DEFAULT_GUESS if guess is None else guess
+    c0, pmt, periods, guess = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (c0, pmt, periods, guess))
+    )
+    shape = c0.shape
+    c0, pmt, periods, guess = (value.ravel() for value in (c0, pmt, periods, guess))
+
+    result = np.full(c0.shape, np.nan)
+    # 仅一次变号（期初与每期现金流异号）时有唯一解
+    rows = np.flatnonzero((periods >= 1) & (np.sign(c0) * np.sign(pmt) < 0))
+    if len(rows):
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            npv = _LevelNPV(c0[rows], pmt[rows], periods[rows])
+            result[rows] = _solve_rows(npv, guess[rows], tolerance, max_iterations)
+    return result.reshape(shape)
@@ -5,11 +5,30 @@
 
 import math
 from datetime import datetime, timedelta
-from decimal import Decimal, DivisionByZero, getcontext
-from typing import Dict, List, Optional, Tuple
+from decimal import Decimal, DivisionByZero, Overflow
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-import pandas as pd
+
+from columnar_export import BATCH_EXPORT_FIELDS, SCHEDULE_FIELDS, schedule_columns, write_table
+from grid_engine import annuity_grid, annuity_sensitivities, principal_grid
+from irr_engine import solve_period_irr, solve_period_irr_batch
+from schedule import Schedule
+from schedule_engine import (
+    MAX_EXACT_AMOUNT,
+    annuity_payment,
+    annuity_schedule_cents,
+    annuity_total_interest_cents,
+    cents_to_float,
+    floating_schedule_cents,
+    is_cent_exact,
+    iter_annuity_schedule_cents,
+    iter_floating_schedule_cents,
+    money_context,
+    round_interest_cents_array,
+    to_cents,
+    to_decimal,
+)
 
 # 导入numpy_financial
 try:
@@ -17,15 +36,28 @@ try:
 except ImportError:
     npf = None
 
-# 设置高精度计算
-getcontext().prec = 15
-
 
 class LeaseCalculator:
     """融资租赁计算器核心类"""
 
-    def __init__(self):
+    ENGINES = ("decimal", "numpy")
+    METHODS = ("equal_annuity", "equal_principal", "flat_rate", "floating_rate")
+    ITER_CHUNK_SIZE = 256  # iter_schedule 逐行产出时内部按此期数分块计算
+    SUMMARY_GRID_MIN_SIZE = 32  # calculate_summaries 中同一方法达到此笔数时向量化计算
+    EXPORT_CHUNK_SIZE = 4096  # export_schedule 每块期数、export_batch 每块租赁笔数
+
+    def __init__(self, engine: str = "decimal"):
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支持的计算引擎: {engine}")
         self.precision = Decimal("0.01")  # 精度到分
+        self.engine = engine
+
+    def _resolve_engine(self, engine: Optional[str]) -> str:
+        """解析计算引擎：decimal为逐期Decimal参考实现，numpy为整数分数组引擎"""
+        engine = engine or self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支持的计算引擎: {engine}")
+        return engine
 
     def _validate_parameters(self, pv: float, annual_rate: float, periods: int, frequency: int):
         """验证输入参数"""
@@ -38,7 +70,16 @@ class LeaseCalculator:
         if frequency <= 0:
             raise ValueError("年付次数必须大于0")
 
-    def equal_annuity_method(self, pv: float, annual_rate: float, periods: int, frequency: int = 12) -> Dict:
+    @money_context
+    def equal_annuity_method(
+        self,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int = 12,
+        engine: Optional[str] = None,
+        summary_only: bool = False,
+    ) -> Dict:
         """
         等额年金法（等额本息法）
 
@@ -47,32 +88,88 @@ class LeaseCalculator:
             annual_rate: 年利率
             periods: 总期数
             frequency: 年付次数（默认12为月付）
+            engine: 计算引擎（decimal/numpy），默认使用实例设置
+            summary_only: 仅计算汇总指标（租金、总利息、总租金、IRR），不生成还款计划
 
         Returns:
             Dict: 包含每期租金、总利息、还款计划等
         """
         self._validate_parameters(pv, annual_rate, periods, frequency)
+        engine = self._resolve_engine(engine)
 
-        pv = Decimal(str(pv))
-        period_rate = Decimal(str(annual_rate)) / Decimal(str(frequency))
-        n = Decimal(str(periods))
+        pv = to_decimal(pv)
+        period_rate = to_decimal(annual_rate) / to_decimal(frequency)
+        n = to_decimal(periods)
 
-        # 处理0利率情况
-        if period_rate == 0:
-            pmt = pv / n
-        else:
-            # PMT = PV * [i * (1+i)^n] / [(1+i)^n - 1]
-            factor = (1 + period_rate) ** n
-            pmt = pv * (period_rate * factor) / (factor - 1)
+        # PMT = PV * [i * (1+i)^n] / [(1+i)^n - 1]，0利率时为 PV / n
+        pmt = annuity_payment(pv, period_rate, int(periods))
+        exact = abs(pv) < MAX_EXACT_AMOUNT and abs(pmt * n) < MAX_EXACT_AMOUNT
 
-        pmt = pmt.quantize(self.precision)
+        if summary_only and exact:
+            try:
+                total_interest = annuity_total_interest_cents(pv, period_rate, pmt, int(periods)) / 100
+            except OverflowError:
+                pass  # 超出精确范围时由完整计算得出汇总
+            else:
+                return self._summary(
+                    {
+                        "method": "等额年金法",
+                        "pmt": float(pmt),
+                        "total_interest": total_interest,
+                        "total_payment": float(pmt * n),
+                    },
+                    float(pv),
+                    np.full(int(periods), float(pmt)),
+                    frequency,
+                    guess=annual_rate / frequency,
+                )
+
+        if summary_only:
+            result = self.equal_annuity_method(float(pv), annual_rate, periods, frequency, engine)
+            return self._summary(
+                result, float(pv), result.pop("schedule").payment, frequency, guess=annual_rate / frequency
+            )
+
+        if engine == "numpy" and exact:
+            try:
+                return self._equal_annuity_numpy(pv, period_rate, pmt, n)
+            except OverflowError:
+                pass  # 超出精确范围时回退到Decimal参考实现
 
         # 生成还款计划
-        schedule = []
+        columns = next(self._iter_equal_annuity_decimal(pv, period_rate, pmt, int(periods), int(periods)))
+        total_interest = sum(columns["interest"], Decimal("0"))
+
+        schedule = Schedule(
+            period=np.arange(1, int(periods) + 1),
+            payment=np.full(int(periods), float(pmt)),
+            principal=_to_floats(columns["principal"]),
+            interest=_to_floats(columns["interest"]),
+            remaining_balance=_to_floats(columns["remaining_balance"]),
+        )
+
+        return {
+            "method": "等额年金法",
+            "pmt": float(pmt),
+            "total_interest": float(total_interest),
+            "total_payment": float(pmt * n),
+            "schedule": schedule,
+        }
+
+    @money_context
+    def _iter_equal_annuity_decimal(
+        self, pv: Decimal, period_rate: Decimal, pmt: Decimal, periods: int, chunk_size: int, start: int = 0
+    ) -> Iterator[Dict[str, List[Decimal]]]:
+        """
+        等额年金法的逐期Decimal参考实现，每次产出至多 chunk_size 期的本金、利息、剩余本金（Decimal列表）；
+        前 start 期只递推、不产出
+        """
+        principals = []
+        interests = []
+        balances = []
         remaining_balance = pv
-        total_interest = Decimal("0")
 
-        for period in range(1, int(periods) + 1):
+        for period in range(1, periods + 1):
             interest = remaining_balance * period_rate
             interest = interest.quantize(self.precision)
 
@@ -82,32 +179,56 @@ class LeaseCalculator:
             remaining_balance -= principal
 
             # 最后一期处理剩余余额精度问题
-            if period == int(periods):
+            if period == periods:
                 remaining_balance = Decimal("0")
             else:
                 remaining_balance = remaining_balance.quantize(self.precision)
 
-            total_interest += interest
+            if period <= start:
+                continue
 
-            schedule.append(
-                {
-                    "period": period,
-                    "payment": float(pmt),
-                    "principal": float(principal),
-                    "interest": float(interest),
-                    "remaining_balance": float(remaining_balance),
-                }
-            )
+            principals.append(principal)
+            interests.append(interest)
+            balances.append(remaining_balance)
+
+            if len(principals) == chunk_size:
+                yield {"principal": principals, "interest": interests, "remaining_balance": balances}
+                principals, interests, balances = [], [], []
+
+        if principals:
+            yield {"principal": principals, "interest": interests, "remaining_balance": balances}
+
+    def _equal_annuity_numpy(self, pv: Decimal, period_rate: Decimal, pmt: Decimal, n: Decimal) -> Dict:
+        """等额年金法的整数分数组引擎，结果与Decimal参考实现逐期一致"""
+        periods = int(n)
+        columns = annuity_schedule_cents(pv, period_rate, pmt, periods)
+        total_interest = int(columns["interest"].sum())
+
+        schedule = Schedule(
+            period=np.arange(1, periods + 1),
+            payment=np.full(periods, float(pmt)),
+            principal=cents_to_float(columns["principal"]),
+            interest=cents_to_float(columns["interest"]),
+            remaining_balance=cents_to_float(columns["remaining_balance"]),
+        )
 
         return {
             "method": "等额年金法",
             "pmt": float(pmt),
-            "total_interest": float(total_interest),
+            "total_interest": total_interest / 100,
             "total_payment": float(pmt * n),
             "schedule": schedule,
         }
 
-    def equal_principal_method(self, pv: float, annual_rate: float, periods: int, frequency: int = 12) -> Dict:
+    @money_context
+    def equal_principal_method(
+        self,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int = 12,
+        summary_only: bool = False,
+    ) -> Dict:
         """
         等额本金法
 
@@ -116,24 +237,67 @@ class LeaseCalculator:
             annual_rate: 年利率
             periods: 总期数
             frequency: 年付次数
+            summary_only: 仅计算汇总指标（总利息、总租金、IRR），不生成还款计划
 
         Returns:
             Dict: 包含每期租金、总利息、还款计划等
         """
-        pv = Decimal(str(pv))
-        period_rate = Decimal(str(annual_rate)) / Decimal(str(frequency))
+        pv = to_decimal(pv)
+        period_rate = to_decimal(annual_rate) / to_decimal(frequency)
         n = int(periods)
 
         # 每期本金
-        principal_per_period = pv / Decimal(str(n))
+        principal_per_period = pv / to_decimal(n)
         principal_per_period = principal_per_period.quantize(self.precision)
 
-        schedule = []
+        if summary_only:
+            return self._equal_principal_summary(pv, annual_rate, period_rate, principal_per_period, n, frequency)
+
+        columns = next(self._iter_equal_principal_decimal(pv, period_rate, principal_per_period, n, max(n, 1)), None)
+        columns = columns or {"payment": [], "interest": [], "remaining_balance": []}
+        total_interest = sum(columns["interest"], Decimal("0"))
+        total_payment = sum(columns["payment"], Decimal("0"))
+
+        schedule = Schedule(
+            period=np.arange(1, n + 1),
+            payment=_to_floats(columns["payment"]),
+            principal=np.full(n, float(principal_per_period)),
+            interest=_to_floats(columns["interest"]),
+            remaining_balance=_to_floats(columns["remaining_balance"]),
+        )
+
+        return {
+            "method": "等额本金法",
+            "total_interest": float(total_interest),
+            "total_payment": float(total_payment),
+            "schedule": schedule,
+        }
+
+    @money_context
+    def _iter_equal_principal_decimal(
+        self,
+        pv: Decimal,
+        period_rate: Decimal,
+        principal_per_period: Decimal,
+        periods: int,
+        chunk_size: int,
+        start: int = 0,
+    ) -> Iterator[Dict[str, List[Decimal]]]:
+        """
+        等额本金法的逐期Decimal参考实现，每次产出至多 chunk_size 期的租金、利息、剩余本金（Decimal列表）；
+        前 start 期只递推余额、不产出
+        """
+        payments = []
+        interests = []
+        balances = []
         remaining_balance = pv
-        total_interest = Decimal("0")
-        total_payment = Decimal("0")
 
-        for period in range(1, n + 1):
+        for period in range(1, periods + 1):
+            if period <= start:
+                remaining_balance -= principal_per_period
+                remaining_balance = remaining_balance.quantize(self.precision)
+                continue
+
             interest = remaining_balance * period_rate
             interest = interest.quantize(self.precision)
 
@@ -143,27 +307,64 @@ class LeaseCalculator:
             remaining_balance -= principal_per_period
             remaining_balance = remaining_balance.quantize(self.precision)
 
-            total_interest += interest
-            total_payment += pmt
+            payments.append(pmt)
+            interests.append(interest)
+            balances.append(remaining_balance)
 
-            schedule.append(
-                {
-                    "period": period,
-                    "payment": float(pmt),
-                    "principal": float(principal_per_period),
-                    "interest": float(interest),
-                    "remaining_balance": float(remaining_balance),
-                }
+            if len(payments) == chunk_size:
+                yield {"payment": payments, "interest": interests, "remaining_balance": balances}
+                payments, interests, balances = [], [], []
+
+        if payments:
+            yield {"payment": payments, "interest": interests, "remaining_balance": balances}
+
+    def _equal_principal_summary(
+        self,
+        pv: Decimal,
+        annual_rate: float,
+        period_rate: Decimal,
+        principal_per_period: Decimal,
+        n: int,
+        frequency: int,
+    ) -> Dict:
+        """
+        等额本金法汇总指标
+
+        各期期初余额为 PV - (k-1) × 每期本金，与利息无关，可一次性按整数分向量化舍入利息；
+        本金含分以下尾数或超出精确范围时由完整计算得出汇总
+        """
+        if not is_cent_exact(pv) or abs(pv) >= MAX_EXACT_AMOUNT:
+            result = self.equal_principal_method(float(pv), annual_rate, n, frequency)
+            return self._summary(
+                result, float(pv), result.pop("schedule").payment, frequency, guess=annual_rate / frequency
             )
 
-        return {
-            "method": "等额本金法",
-            "total_interest": float(total_interest),
-            "total_payment": float(total_payment),
-            "schedule": schedule,
-        }
+        principal_cents = to_cents(principal_per_period)
+        balances = to_cents(pv) - principal_cents * np.arange(n, dtype=np.int64)
+        interest_cents = round_interest_cents_array(balances, period_rate)
+        total_interest = int(interest_cents.sum())
+
+        return self._summary(
+            {
+                "method": "等额本金法",
+                "total_interest": total_interest / 100,
+                "total_payment": (principal_cents * n + total_interest) / 100,
+            },
+            float(pv),
+            cents_to_float(principal_cents + interest_cents),
+            frequency,
+            guess=annual_rate / frequency,
+        )
 
-    def flat_rate_method(self, pv: float, flat_rate: float, years: float, frequency: int = 12) -> Dict:
+    @money_context
+    def flat_rate_method(
+        self,
+        pv: float,
+        flat_rate: float,
+        years: float,
+        frequency: int = 12,
+        summary_only: bool = False,
+    ) -> Dict:
         """
         平息法计算
 
@@ -172,13 +373,14 @@ class LeaseCalculator:
             flat_rate: 平息年利率
             years: 年数
             frequency: 年付次数
+            summary_only: 仅计算汇总指标，不生成还款计划（汇总指标本身即为闭式解）
 
         Returns:
             Dict: 包含每期租金、总利息、实际IRR等
         """
-        pv = Decimal(str(pv))
-        flat_rate = Decimal(str(flat_rate))
-        years = Decimal(str(years))
+        pv = to_decimal(pv)
+        flat_rate = to_decimal(flat_rate)
+        years = to_decimal(years)
         n = int(years * frequency)
 
         # 总利息 = PV * 平息率 * 年数
@@ -186,64 +388,180 @@ class LeaseCalculator:
         total_interest = total_interest.quantize(self.precision)
 
         # 每期租金 = (本金 + 总利息) / 期数
-        pmt = (pv + total_interest) / Decimal(str(n))
+        pmt = (pv + total_interest) / to_decimal(n)
         pmt = pmt.quantize(self.precision)
 
         # 计算实际IRR
         cash_flows = [-float(pv)] + [float(pmt)] * n
-        irr = self.calculate_irr(cash_flows, frequency)
+        irr = self.calculate_irr(cash_flows, frequency, guess=float(flat_rate) / frequency)
 
-        schedule = []
-        for period in range(1, n + 1):
-            schedule.append(
-                {
-                    "period": period,
-                    "payment": float(pmt),
-                    "principal": float(pv / Decimal(str(n))),
-                    "interest": float(total_interest / Decimal(str(n))),
-                    "remaining_balance": float(pv * (n - period) / Decimal(str(n))),
-                }
-            )
-
-        return {
+        result = {
             "method": "平息法",
             "pmt": float(pmt),
             "total_interest": float(total_interest),
-            "total_payment": float(pmt * Decimal(str(n))),
+            "total_payment": float(pmt * to_decimal(n)),
             "flat_rate": float(flat_rate),
             "actual_irr": irr,
-            "schedule": schedule,
         }
+        if summary_only:
+            # 等额现金流的IRR即实际IRR
+            result["irr"] = irr
+            return result
+
+        result["schedule"] = next(self._iter_flat_rate(pv, total_interest, pmt, n, max(n, 1)))
+        return result
+
+    @staticmethod
+    @money_context
+    def _iter_flat_rate(
+        pv: Decimal, total_interest: Decimal, pmt: Decimal, periods: int, chunk_size: int, start: int = 0
+    ) -> Iterator[Schedule]:
+        """平息法还款计划（闭式解），从第 start + 1 期起每次产出至多 chunk_size 期"""
+        principal = float(pv / to_decimal(periods))
+        interest = float(total_interest / to_decimal(periods))
+
+        for start in range(start, periods, chunk_size):
+            stop = min(start + chunk_size, periods)
+            yield Schedule(
+                period=np.arange(start + 1, stop + 1),
+                payment=np.full(stop - start, float(pmt)),
+                principal=np.full(stop - start, principal),
+                interest=np.full(stop - start, interest),
+                remaining_balance=[
+                    float(pv * (periods - period) / to_decimal(periods)) for period in range(start + 1, stop + 1)
+                ],
+            )
 
+    @money_context
     def floating_rate_method(
         self,
         pv: float,
         initial_rate: float,
         periods: int,
-        rate_reset_schedule: List[Dict],
+        rate_reset_schedule: Union[List[Dict], Sequence[float], np.ndarray],
         frequency: int = 12,
+        summary_only: bool = False,
     ) -> Dict:
         """
         浮动利率法
 
+        每期按剩余本金、剩余期数重算等额租金；各剩余期数的租金系数只在利率重置时按段求一次，
+        整数分引擎逐期舍入，结果与逐期Decimal幂运算的参考实现一致
+
         Args:
             pv: 租赁本金
             initial_rate: 初始年利率
             periods: 总期数
-            rate_reset_schedule: 利率重置计划 [{'period': 6, 'new_rate': 0.065}, ...]
+            rate_reset_schedule: 利率重置计划 [{'period': 6, 'new_rate': 0.065}, ...]，
+                或逐期利率曲线（第k项为第k期适用的年利率）
             frequency: 年付次数
+            summary_only: 仅计算汇总指标，不生成还款计划（只保留求IRR所需的租金列）
 
         Returns:
             Dict: 包含每期租金、总利息、还款计划等
         """
-        schedule = []
-        remaining_balance = Decimal(str(pv))
-        current_rate = Decimal(str(initial_rate))
+        rate_changes = self._rate_changes(rate_reset_schedule, initial_rate)
+        pv_decimal = to_decimal(pv)
+        columns = None
+
+        # 单期且本金含分以下尾数时末期租金未舍入，交由参考实现处理
+        if abs(pv_decimal) < MAX_EXACT_AMOUNT and (int(periods) > 1 or is_cent_exact(pv_decimal)):
+            try:
+                cents = floating_schedule_cents(
+                    pv_decimal, to_decimal(initial_rate), int(periods), rate_changes, frequency
+                )
+            except OverflowError:
+                pass  # 超出精确范围时回退到Decimal参考实现
+            else:
+                total_interest = int(cents["interest"].sum()) / 100
+                total_payment = int(cents["payment"].sum()) / 100
+                columns = {
+                    name: cents_to_float(cents[name]) for name in ("payment", "principal", "interest", "remaining_balance")
+                }
+                columns["rate"] = cents["rate"]
+
+        if columns is None:
+            columns, total_interest, total_payment = self._floating_rate_decimal(
+                pv_decimal, to_decimal(initial_rate), int(periods), rate_changes, frequency
+            )
+
+        if summary_only:
+            return self._summary(
+                {
+                    "method": "浮动利率法",
+                    "total_interest": total_interest,
+                    "total_payment": total_payment,
+                },
+                float(pv),
+                np.asarray(columns["payment"], dtype=np.float64),
+                frequency,
+                guess=initial_rate / frequency,
+            )
+
+        schedule = Schedule(period=np.arange(1, len(columns["payment"]) + 1), **columns)
+
+        return {
+            "method": "浮动利率法",
+            "total_interest": total_interest,
+            "total_payment": total_payment,
+            "schedule": schedule,
+        }
+
+    @staticmethod
+    def _rate_changes(
+        rate_reset_schedule: Union[None, List[Dict], Sequence[float], np.ndarray], initial_rate: float
+    ) -> Dict:
+        """
+        利率重置计划转换为 {期数: 新年利率(Decimal)}
+
+        逐期利率曲线只在利率变化处生成重置点（第1期利率与初始利率不同时视为第1期重置）
+        """
+        if rate_reset_schedule is None:
+            return {}
+        if isinstance(rate_reset_schedule, np.ndarray) or (
+            len(rate_reset_schedule) and not isinstance(rate_reset_schedule[0], dict)
+        ):
+            curve = np.asarray(rate_reset_schedule, dtype=np.float64)
+            previous = np.concatenate(([initial_rate], curve[:-1]))
+            return {int(k) + 1: to_decimal(curve[k].item()) for k in np.flatnonzero(curve != previous)}
+        return {item["period"]: to_decimal(item["new_rate"]) for item in rate_reset_schedule}
+
+    @money_context
+    def _floating_rate_decimal(
+        self, pv: Decimal, initial_rate: Decimal, periods: int, rate_changes: Dict, frequency: int
+    ) -> Tuple[Dict[str, List[float]], float, float]:
+        """浮动利率法的逐期Decimal参考实现（每期做一次Decimal幂运算）"""
+        chunks = list(self._iter_floating_rate_decimal(pv, initial_rate, periods, rate_changes, frequency, max(periods, 1)))
+        columns = {name: [] for name in ("payment", "principal", "interest", "rate", "remaining_balance")}
         total_interest = Decimal("0")
         total_payment = Decimal("0")
 
-        # 创建利率变化映射
-        rate_changes = {item["period"]: Decimal(str(item["new_rate"])) for item in rate_reset_schedule}
+        for chunk in chunks:
+            total_interest = sum(chunk["interest"], total_interest)
+            total_payment = sum(chunk["payment"], total_payment)
+            for name, values in chunk.items():
+                columns[name].extend(_to_floats(values))
+
+        return columns, float(total_interest), float(total_payment)
+
+    @money_context
+    def _iter_floating_rate_decimal(
+        self,
+        pv: Decimal,
+        initial_rate: Decimal,
+        periods: int,
+        rate_changes: Dict,
+        frequency: int,
+        chunk_size: int,
+        start: int = 0,
+    ) -> Iterator[Dict[str, List[Decimal]]]:
+        """
+        浮动利率法逐期Decimal参考实现的分块生成器：每次产出至多 chunk_size 期的五列（Decimal列表）；
+        前 start 期只递推、不产出
+        """
+        columns = {"payment": [], "principal": [], "interest": [], "rate": [], "remaining_balance": []}
+        remaining_balance = pv
+        current_rate = initial_rate
 
         period = 1
         while period <= periods and remaining_balance > 0:
@@ -255,7 +573,7 @@ class LeaseCalculator:
             remaining_periods = periods - period + 1
 
             # 使用等额年金法计算当前利率下的租金
-            period_rate = current_rate / Decimal(str(frequency))
+            period_rate = current_rate / to_decimal(frequency)
 
             if remaining_periods == 1:
                 pmt = remaining_balance
@@ -275,46 +593,266 @@ class LeaseCalculator:
             remaining_balance -= principal
             remaining_balance = remaining_balance.quantize(self.precision)
 
-            total_interest += interest
-            total_payment += pmt
+            if period > start:
+                columns["payment"].append(pmt)
+                columns["principal"].append(principal)
+                columns["interest"].append(interest)
+                columns["rate"].append(current_rate)
+                columns["remaining_balance"].append(remaining_balance)
 
-            schedule.append(
-                {
-                    "period": period,
-                    "payment": float(pmt),
-                    "principal": float(principal),
-                    "interest": float(interest),
-                    "rate": float(current_rate),
-                    "remaining_balance": float(remaining_balance),
-                }
-            )
+                if len(columns["payment"]) == chunk_size:
+                    yield columns
+                    columns = {name: [] for name in columns}
 
             period += 1
 
-        return {
-            "method": "浮动利率法",
-            "total_interest": float(total_interest),
-            "total_payment": float(total_payment),
-            "schedule": schedule,
-        }
+        if columns["payment"]:
+            yield columns
+
+    def iter_schedule(
+        self,
+        method: str,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int = 12,
+        rate_reset_schedule: Optional[Union[List[Dict], Sequence[float]]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator:
+        """
+        惰性生成还款计划
+
+        按需逐块计算，内存占用与总期数无关，可随时停止迭代（如 itertools.islice 只取前若干期）。
+        各期数值与对应计算方法的完整还款计划逐位一致（不做保证金冲抵）；
+        平息法按 periods / frequency 年计算
+
+        Args:
+            method: 计算方法（equal_annuity/equal_principal/flat_rate/floating_rate）
+            pv: 租赁本金
+            annual_rate: 年利率（平息法为平息年利率，浮动利率法为初始年利率）
+            periods: 总期数
+            frequency: 年付次数
+            rate_reset_schedule: 浮动利率法的利率重置计划或逐期利率曲线
+            chunk_size: 为None时逐期产出字典（同 Schedule.to_dicts() 的行），
+                否则每次产出至多 chunk_size 期的 Schedule 分块
+
+        Returns:
+            Iterator: 逐期字典或 Schedule 分块的迭代器
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"不支持的计算方法: {method}")
+        self._validate_parameters(pv, annual_rate, periods, frequency)
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError("分块期数必须大于0")
+
+        chunks = self._iter_schedule_chunks(
+            method, pv, annual_rate, int(periods), frequency, rate_reset_schedule, chunk_size or self.ITER_CHUNK_SIZE
+        )
+        if chunk_size is not None:
+            return chunks
+        return (row for chunk in chunks for row in chunk.to_dicts())
+
+    def schedule_window(
+        self,
+        method: str,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        from_period: int,
+        to_period: Optional[int] = None,
+        frequency: int = 12,
+        rate_reset_schedule: Optional[Union[List[Dict], Sequence[float]]] = None,
+    ) -> Schedule:
+        """
+        还款计划中第 from_period 至 to_period 期（含两端），用于分页查询
+
+        等额本金法第k期期初余额为 PV - (k-1) × 每期本金，平息法各期均为闭式解，直接计算窗口内各期，
+        耗时只与窗口大小有关；等额年金法舍入后的余额没有闭式解（逐期舍入误差会累积），
+        窗口之前的各期只按整数分递推余额、不生成行，浮动利率法同样只递推不产出。
+        各行与完整还款计划的对应行逐位一致（不做保证金冲抵）
+
+        Args:
+            method: 计算方法（equal_annuity/equal_principal/flat_rate/floating_rate）
+            pv: 租赁本金
+            annual_rate: 年利率（平息法为平息年利率，浮动利率法为初始年利率）
+            periods: 总期数
+            from_period: 起始期（从1开始）
+            to_period: 截止期，默认或超出总期数时取总期数
+            frequency: 年付次数
+            rate_reset_schedule: 浮动利率法的利率重置计划或逐期利率曲线
+
+        Returns:
+            Schedule: 窗口内各期（浮动利率法余额提前还清时可能少于窗口期数）
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"不支持的计算方法: {method}")
+        self._validate_parameters(pv, annual_rate, periods, frequency)
+        periods = int(periods)
+        to_period = periods if to_period is None else min(int(to_period), periods)
+        if not 1 <= from_period <= to_period:
+            raise ValueError("还款计划窗口无效，应满足 1 ≤ from_period ≤ to_period 且起始期不超过总期数")
 
-    def calculate_irr(self, cash_flows: List[float], frequency: int = 12) -> float:
+        chunks = self._iter_schedule_chunks(
+            method, pv, annual_rate, periods, frequency, rate_reset_schedule, to_period - from_period + 1, from_period - 1
+        )
+        window = next(chunks, None)
+        chunks.close()
+        if window is None:
+            empty = np.empty(0)
+            return Schedule(empty, empty, empty, empty, empty, rate=empty if method == "floating_rate" else None)
+        return window
+
+    @money_context
+    def _iter_schedule_chunks(
+        self,
+        method: str,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int,
+        rate_reset_schedule: Optional[Union[List[Dict], Sequence[float]]],
+        chunk_size: int,
+        start: int = 0,
+    ) -> Iterator[Schedule]:
+        """
+        iter_schedule 的分块实现：与完整计算方法共用逐期递推，从第 start + 1 期起每次产出至多 chunk_size 期；
+        整数分引擎溢出时从下一未产出的期起回退到Decimal参考实现
+        """
+        pv_decimal = to_decimal(pv)
+        period_rate = to_decimal(annual_rate) / to_decimal(frequency)
+        emitted = start
+
+        if method == "flat_rate":
+            years = to_decimal(periods / frequency)
+            n = int(years * frequency)
+            total_interest = (pv_decimal * to_decimal(annual_rate) * years).quantize(self.precision)
+            pmt = ((pv_decimal + total_interest) / to_decimal(n)).quantize(self.precision)
+            yield from self._iter_flat_rate(pv_decimal, total_interest, pmt, n, chunk_size, start)
+
+        elif method == "equal_annuity":
+            pmt = annuity_payment(pv_decimal, period_rate, periods)
+            payment = float(pmt)
+            if abs(pv_decimal) < MAX_EXACT_AMOUNT and abs(pmt * periods) < MAX_EXACT_AMOUNT:
+                try:
+                    for cents in iter_annuity_schedule_cents(pv_decimal, period_rate, pmt, periods, chunk_size, start):
+                        size = len(cents["interest"])
+                        yield Schedule(
+                            period=np.arange(emitted + 1, emitted + size + 1),
+                            payment=np.full(size, payment),
+                            principal=cents_to_float(cents["principal"]),
+                            interest=cents_to_float(cents["interest"]),
+                            remaining_balance=cents_to_float(cents["remaining_balance"]),
+                        )
+                        emitted += size
+                    return
+                except OverflowError:
+                    pass  # 超出精确范围时回退到Decimal参考实现
+
+            for columns in self._iter_equal_annuity_decimal(pv_decimal, period_rate, pmt, periods, chunk_size, emitted):
+                size = len(columns["interest"])
+                yield Schedule(
+                    period=np.arange(emitted + 1, emitted + size + 1),
+                    payment=np.full(size, payment),
+                    principal=_to_floats(columns["principal"]),
+                    interest=_to_floats(columns["interest"]),
+                    remaining_balance=_to_floats(columns["remaining_balance"]),
+                )
+                emitted += size
+
+        elif method == "equal_principal":
+            principal_per_period = (pv_decimal / to_decimal(periods)).quantize(self.precision)
+            principal = float(principal_per_period)
+
+            if is_cent_exact(pv_decimal) and abs(pv_decimal) < MAX_EXACT_AMOUNT:
+                # 第k期期初余额为 PV - (k-1) × 每期本金（闭式解），每块按整数分向量化舍入利息
+                principal_cents = to_cents(principal_per_period)
+                pv_cents = to_cents(pv_decimal)
+                for chunk_start in range(start, periods, chunk_size):
+                    k = np.arange(chunk_start, min(chunk_start + chunk_size, periods), dtype=np.int64)
+                    balances = pv_cents - principal_cents * k
+                    interest_cents = round_interest_cents_array(balances, period_rate)
+                    yield Schedule(
+                        period=k + 1,
+                        payment=cents_to_float(principal_cents + interest_cents),
+                        principal=np.full(len(k), principal),
+                        interest=cents_to_float(interest_cents),
+                        remaining_balance=cents_to_float(balances - principal_cents),
+                    )
+                return
+
+            chunks = self._iter_equal_principal_decimal(
+                pv_decimal, period_rate, principal_per_period, periods, chunk_size, start
+            )
+            for columns in chunks:
+                size = len(columns["payment"])
+                yield Schedule(
+                    period=np.arange(emitted + 1, emitted + size + 1),
+                    payment=_to_floats(columns["payment"]),
+                    principal=np.full(size, principal),
+                    interest=_to_floats(columns["interest"]),
+                    remaining_balance=_to_floats(columns["remaining_balance"]),
+                )
+                emitted += size
+
+        else:
+            rate_changes = self._rate_changes(rate_reset_schedule or [], annual_rate)
+            initial_rate = to_decimal(annual_rate)
+
+            # 单期且本金含分以下尾数时末期租金未舍入，交由参考实现处理（同 floating_rate_method）
+            if abs(pv_decimal) < MAX_EXACT_AMOUNT and (periods > 1 or is_cent_exact(pv_decimal)):
+                try:
+                    cents_chunks = iter_floating_schedule_cents(
+                        pv_decimal, initial_rate, periods, rate_changes, frequency, chunk_size, start
+                    )
+                    for cents in cents_chunks:
+                        size = len(cents["payment"])
+                        yield Schedule(
+                            period=np.arange(emitted + 1, emitted + size + 1),
+                            rate=cents["rate"],
+                            **{
+                                name: cents_to_float(cents[name])
+                                for name in ("payment", "principal", "interest", "remaining_balance")
+                            },
+                        )
+                        emitted += size
+                    return
+                except OverflowError:
+                    pass  # 超出精确范围时回退到Decimal参考实现
+
+            chunks = self._iter_floating_rate_decimal(
+                pv_decimal, initial_rate, periods, rate_changes, frequency, chunk_size, emitted
+            )
+            for columns in chunks:
+                size = len(columns["payment"])
+                yield Schedule(
+                    period=np.arange(emitted + 1, emitted + size + 1),
+                    **{name: _to_floats(values) for name, values in columns.items()},
+                )
+                emitted += size
+
+    def _summary(self, result: Dict, pv: float, payments: np.ndarray, frequency: int, guess: float) -> Dict:
+        """汇总模式的结果：在汇总指标上补充按租金列计算的IRR，不含还款计划"""
+        cash_flows = np.empty(len(payments) + 1)
+        cash_flows[0] = -pv
+        cash_flows[1:] = payments
+        result["irr"] = self.calculate_irr(cash_flows, frequency, guess=guess)
+        return result
+
+    def calculate_irr(self, cash_flows: List[float], frequency: int = 12, guess: Optional[float] = None) -> float:
         """
         计算内部收益率(IRR)
 
         Args:
             cash_flows: 现金流序列
             frequency: 年付次数
+            guess: 期利率初值，通常取名义年利率 / 年付次数
 
         Returns:
             float: 年化IRR
         """
         try:
-            # 使用numpy_financial的IRR计算
-            if npf is not None:
-                period_irr = npf.irr(cash_flows)
-            else:
-                period_irr = np.irr(cash_flows)
+            # 区间保护牛顿法求期IRR，等额现金流按年金公式O(1)求值
+            period_irr = solve_period_irr(cash_flows, guess)
 
             if np.isnan(period_irr):
                 return 0.0
@@ -323,9 +861,33 @@ class LeaseCalculator:
             annual_irr = (1 + period_irr) ** frequency - 1
             return round(annual_irr, 6)
         except:
-            # 如果numpy.irr不可用，使用牛顿法求解
+            # 求解异常时退回简单牛顿法
             return self._newton_irr(cash_flows, frequency)
 
+    def calculate_irr_batch(
+        self,
+        cash_flows: Union[np.ndarray, List[List[float]]],
+        frequency: Union[int, List[int], np.ndarray] = 12,
+        lengths: Optional[Union[List[int], np.ndarray]] = None,
+        guess: Optional[Union[float, List[float], np.ndarray]] = None,
+    ) -> np.ndarray:
+        """
+        批量计算内部收益率(IRR)
+
+        Args:
+            cash_flows: 二维现金流矩阵（每行一笔租赁），或长度不一的现金流列表
+            frequency: 年付次数，标量或逐行数组
+            lengths: 每行有效长度，矩阵补齐部分不参与计算
+            guess: 期利率初值，标量或逐行数组
+
+        Returns:
+            np.ndarray: 每行的年化IRR（保留6位小数，无解时为0）
+        """
+        period_irr = solve_period_irr_batch(cash_flows, lengths=lengths, guess=guess)
+        frequency = np.asarray(frequency, dtype=np.float64)
+        annual_irr = np.power(1 + period_irr, frequency) - 1
+        return np.round(np.nan_to_num(annual_irr, nan=0.0), 6)
+
     def _newton_irr(
         self,
         cash_flows: List[float],
@@ -360,93 +922,80 @@ class LeaseCalculator:
         annual_irr = (1 + rate) ** frequency - 1
         return round(annual_irr, 6)
 
-    def apply_guarantee_offset(self, schedule: List[Dict], guarantee: float, mode: str = "尾期冲抵") -> Dict:
+    @money_context
+    def apply_guarantee_offset(
+        self, schedule: Union[Schedule, List[Dict]], guarantee: float, mode: str = "尾期冲抵"
+    ) -> Dict:
         """
         保证金冲抵处理
 
+        冲抵直接写入还款计划的租金列：传入Schedule时与原列表实现共享行对象的效果一致，
+        计划本身即反映冲抵后的租金
+
         Args:
-            schedule: 还款计划
+            schedule: 还款计划（Schedule或逐期字典列表）
             guarantee: 保证金金额
             mode: 冲抵模式（尾期冲抵、按比例分摊、首期冲抵）
 
         Returns:
             Dict: 处理后的还款计划和冲抵详情
         """
-        guarantee = Decimal(str(guarantee))
-        modified_schedule = schedule.copy()
+        guarantee = to_decimal(guarantee)
+        modified_schedule = Schedule.from_records(schedule)
+        payments = modified_schedule.payment
+        periods = modified_schedule.period
         offset_details = []
         remaining_guarantee = guarantee
 
-        if mode == "尾期冲抵":
-            # 从最后一期向前冲抵
-            for i in range(len(modified_schedule) - 1, -1, -1):
+        if mode in ("尾期冲抵", "首期冲抵"):
+            # 尾期冲抵从最后一期向前，首期冲抵从第一期向后；只访问被冲抵的若干期
+            if mode == "尾期冲抵":
+                order = range(len(payments) - 1, -1, -1)
+            else:
+                order = range(len(payments))
+
+            for i in order:
                 if remaining_guarantee <= 0:
                     break
 
-                original_payment = Decimal(str(modified_schedule[i]["payment"]))
+                original_payment = to_decimal(payments.item(i))
 
                 if remaining_guarantee >= original_payment:
                     offset_amount = original_payment
                     remaining_guarantee -= original_payment
-                    modified_schedule[i]["payment"] = 0.0
+                    payments[i] = 0.0
                 else:
                     offset_amount = remaining_guarantee
-                    modified_schedule[i]["payment"] = float(original_payment - remaining_guarantee)
+                    payments[i] = float(original_payment - remaining_guarantee)
                     remaining_guarantee = Decimal("0")
 
                 if offset_amount > 0:
                     offset_details.append(
                         {
-                            "period": modified_schedule[i]["period"],
+                            "period": periods.item(i),
                             "offset_amount": float(offset_amount),
-                            "remaining_payment": modified_schedule[i]["payment"],
+                            "remaining_payment": payments.item(i),
                         }
                     )
 
         elif mode == "按比例分摊":
             # 按比例平均冲抵各期
-            total_periods = len(modified_schedule)
-            avg_offset = guarantee / Decimal(str(total_periods))
+            total_periods = len(payments)
+            avg_offset = guarantee / to_decimal(total_periods)
 
-            for i, payment_info in enumerate(modified_schedule):
-                original_payment = Decimal(str(payment_info["payment"]))
+            for i in range(total_periods):
+                original_payment = to_decimal(payments.item(i))
                 offset_amount = min(avg_offset, original_payment)
 
-                modified_schedule[i]["payment"] = float(original_payment - offset_amount)
+                payments[i] = float(original_payment - offset_amount)
                 remaining_guarantee -= offset_amount
 
                 if offset_amount > 0:
                     offset_details.append(
                         {
-                            "period": payment_info["period"],
-                            "offset_amount": float(offset_amount),
-                            "remaining_payment": modified_schedule[i]["payment"],
-                        }
-                    )
-
-        elif mode == "首期冲抵":
-            # 从第一期开始冲抵
-            for i, payment_info in enumerate(modified_schedule):
-                if remaining_guarantee <= 0:
-                    break
-
-                original_payment = Decimal(str(payment_info["payment"]))
-
-                if remaining_guarantee >= original_payment:
-                    offset_amount = original_payment
-                    remaining_guarantee -= original_payment
-                    modified_schedule[i]["payment"] = 0.0
-                else:
-                    offset_amount = remaining_guarantee
-                    modified_schedule[i]["payment"] = float(original_payment - remaining_guarantee)
-                    remaining_guarantee = Decimal("0")
-
-                if offset_amount > 0:
-                    offset_details.append(
-                        {
-                            "period": payment_info["period"],
+                            "period": periods.item(i),
                             "offset_amount": float(offset_amount),
-                            "remaining_payment": modified_schedule[i]["payment"],
+                            "remaining_payment": payments.item(i),
                         }
                     )
 
@@ -457,10 +1006,416 @@ class LeaseCalculator:
             "total_offset": float(guarantee - remaining_guarantee),
         }
 
+    def calculate_batch(
+        self,
+        pv: Union[float, Sequence[float], np.ndarray],
+        annual_rate: Union[float, Sequence[float], np.ndarray],
+        periods: Union[int, Sequence[int], np.ndarray],
+        frequency: Union[int, Sequence[int], np.ndarray] = 12,
+        method: Union[str, Sequence[str], np.ndarray] = "equal_annuity",
+        guarantee: Union[float, Sequence[float], np.ndarray] = 0.0,
+        guarantee_mode: Union[str, Sequence[str], np.ndarray] = "尾期冲抵",
+        rate_reset_schedule: Optional[Sequence] = None,
+        include_schedule: bool = False,
+    ) -> Dict:
+        """
+        组合批量计算
+
+        各参数为等长的列（标量按广播补齐），逐笔结果与单笔调用 /api/calculate 的计算流程一致。
+        按计算方法分组：无保证金的等额年金法、等额本金法租赁由 sensitivity_grid 一次向量化求出汇总指标，
+        其余租赁（平息法、浮动利率法、有保证金冲抵或需要还款计划）逐笔计算。
+        单笔参数错误只记录在该笔的 error 中，不影响其他租赁
+
+        Args:
+            pv: 租赁本金
+            annual_rate: 年利率（平息法为平息年利率）
+            periods: 总期数（平息法年数 = 期数 / 年付次数）
+            frequency: 年付次数
+            method: 计算方法（equal_annuity、equal_principal、flat_rate、floating_rate）
+            guarantee: 保证金金额
+            guarantee_mode: 保证金冲抵模式
+            rate_reset_schedule: 浮动利率法逐笔的利率重置计划（列表，元素可为None）
+            include_schedule: 是否返回逐笔还款计划
+
+        Returns:
+            Dict: pmt（等额本金法、浮动利率法为平均租金）、total_interest、total_payment、irr、
+            unused_guarantee、total_offset 结果数组（失败的租赁为nan），error（失败原因，成功为None）；
+            include_schedule 时另含 schedule（Schedule列表，冲抵后的租金）
+        """
+        pv, annual_rate, guarantee = (
+            np.asarray(value, dtype=np.float64) for value in (pv, annual_rate, guarantee)
+        )
+        periods, frequency = (np.asarray(value, dtype=np.int64) for value in (periods, frequency))
+        method = np.asarray(method, dtype=object)
+        guarantee_mode = np.asarray(guarantee_mode, dtype=object)
+        pv, annual_rate, periods, frequency, guarantee, method, guarantee_mode = (
+            value.ravel() for value in np.broadcast_arrays(
+                pv, annual_rate, periods, frequency, guarantee, method, guarantee_mode
+            )
+        )
+        size = len(pv)
+        if rate_reset_schedule is None:
+            rate_reset_schedule = [None] * size
+        elif len(rate_reset_schedule) != size:
+            raise ValueError("利率重置计划数量与租赁笔数不一致")
+
+        results = {
+            name: np.full(size, np.nan)
+            for name in ("pmt", "total_interest", "total_payment", "irr", "unused_guarantee", "total_offset")
+        }
+        results["error"] = [None] * size
+        if include_schedule:
+            results["schedule"] = [None] * size
+
+        # 无保证金冲抵、只需汇总指标的等额年金法、等额本金法租赁按方法分组向量化计算
+        vectorized = np.zeros(size, dtype=bool)
+        if not include_schedule:
+            for grid_method in ("equal_annuity", "equal_principal"):
+                rows = np.flatnonzero((method == grid_method) & (guarantee <= 0))
+                if not len(rows):
+                    continue
+                grid = self.sensitivity_grid(pv[rows], annual_rate[rows], periods[rows], frequency[rows], grid_method)
+                valid = grid.pop("valid")
+                rows = rows[valid]
+                for name in ("pmt", "total_interest", "total_payment", "irr"):
+                    results[name][rows] = grid[name][valid]
+                results["unused_guarantee"][rows] = 0.0
+                results["total_offset"][rows] = 0.0
+                vectorized[rows] = True
+
+        # 其余租赁及参数不合法的租赁逐笔计算（后者由各方法给出错误信息）
+        for k in np.flatnonzero(~vectorized):
+            try:
+                result = self._calculate_lease(
+                    method[k],
+                    pv.item(k),
+                    annual_rate.item(k),
+                    periods.item(k),
+                    frequency.item(k),
+                    guarantee.item(k),
+                    guarantee_mode[k],
+                    rate_reset_schedule[k],
+                    include_schedule,
+                )
+            except (Overflow, OverflowError):
+                results["error"][k] = "计算结果超出数值范围"
+                continue
+            except Exception as e:
+                results["error"][k] = str(e)
+                continue
+
+            for name in ("total_interest", "total_payment", "irr", "unused_guarantee", "total_offset"):
+                results[name][k] = result[name]
+            results["pmt"][k] = result.get("pmt", result["total_payment"] / periods.item(k))
+            if include_schedule:
+                results["schedule"][k] = result["schedule"]
+
+        return results
+
+    def _calculate_lease(
+        self,
+        method: str,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int,
+        guarantee: float,
+        guarantee_mode: str,
+        rate_reset_schedule: Optional[Union[List[Dict], Sequence[float]]],
+        include_schedule: bool,
+    ) -> Dict:
+        """批量计算中的单笔租赁：按方法计算、保证金冲抵，并按（冲抵后的）租金列计算IRR"""
+        if not (math.isfinite(pv) and math.isfinite(annual_rate)):
+            raise ValueError("租赁本金和年利率必须为有限数值")
+        self._validate_parameters(pv, annual_rate, periods, frequency)
+
+        # 保证金冲抵依赖逐期租金，此时需要完整的还款计划
+        summary_only = guarantee <= 0 and not include_schedule
+        if method == "equal_annuity":
+            result = self.equal_annuity_method(pv, annual_rate, periods, frequency, summary_only=summary_only)
+        elif method == "equal_principal":
+            result = self.equal_principal_method(pv, annual_rate, periods, frequency, summary_only=summary_only)
+        elif method == "flat_rate":
+            result = self.flat_rate_method(pv, annual_rate, periods / frequency, frequency, summary_only=summary_only)
+        elif method == "floating_rate":
+            result = self.floating_rate_method(
+                pv, annual_rate, periods, rate_reset_schedule or [], frequency, summary_only=summary_only
+            )
+        else:
+            raise ValueError(f"不支持的计算方法: {method}")
+
+        result["unused_guarantee"] = 0.0
+        result["total_offset"] = 0.0
+        if guarantee > 0:
+            offset_result = self.apply_guarantee_offset(result["schedule"], guarantee, guarantee_mode)
+            result["unused_guarantee"] = offset_result["unused_guarantee"]
+            result["total_offset"] = offset_result["total_offset"]
+
+        if "schedule" in result:
+            cash_flows = np.concatenate(([-pv], result["schedule"].payment))
+            result["irr"] = self.calculate_irr(cash_flows, frequency, guess=annual_rate / frequency)
+        return result
+
+    def calculate_summaries(self, leases: Sequence[Tuple[str, float, float, int, int]]) -> List[Union[Dict, Exception]]:
+        """
+        多笔租赁的汇总指标（供请求微批处理一次计算）
+
+        逐笔结果与调用对应计算方法（summary_only=True）一致。同一方法的等额年金法、等额本金法租赁
+        不少于 SUMMARY_GRID_MIN_SIZE 笔时由 sensitivity_grid 一次向量化计算，笔数较少时逐笔计算更快。
+        单笔的参数错误作为该笔的结果返回，不影响其他租赁
+
+        Args:
+            leases: (method, pv, annual_rate, periods, frequency) 元组列表
+
+        Returns:
+            List: 逐笔的汇总结果字典，计算失败的租赁为对应的异常
+        """
+        results: List[Union[Dict, Exception, None]] = [None] * len(leases)
+        for method, label, names in (
+            ("equal_annuity", "等额年金法", ("pmt", "total_interest", "total_payment", "irr")),
+            ("equal_principal", "等额本金法", ("total_interest", "total_payment", "irr")),
+        ):
+            rows = [k for k, lease in enumerate(leases) if lease[0] == method]
+            if len(rows) < self.SUMMARY_GRID_MIN_SIZE:
+                continue
+            try:
+                columns = [np.array(column) for column in zip(*(leases[k][1:] for k in rows))]
+                grid = self.sensitivity_grid(*columns, method=method)
+            except OverflowError:
+                continue  # 期数超出int64范围时逐笔计算（由计算方法给出错误信息）
+            values = {name: grid[name].tolist() for name in names}
+            for i, k in enumerate(rows):
+                if grid["valid"][i]:
+                    results[k] = {"method": label, **{name: values[name][i] for name in names}}
+
+        # 其余租赁及参数不合法的租赁逐笔计算
+        methods = {"equal_annuity": self.equal_annuity_method, "equal_principal": self.equal_principal_method}
+        for k, (method, pv, annual_rate, periods, frequency) in enumerate(leases):
+            if results[k] is not None:
+                continue
+            try:
+                if method not in methods:
+                    raise ValueError(f"不支持的计算方法: {method}")
+                results[k] = methods[method](pv, annual_rate, periods, frequency, summary_only=True)
+            except Exception as e:
+                results[k] = e
+        return results
+
+    def export_schedule(
+        self,
+        fileobj: BinaryIO,
+        fmt: str,
+        method: str,
+        pv: float,
+        annual_rate: float,
+        periods: int,
+        frequency: int = 12,
+        rate_reset_schedule: Optional[Union[List[Dict], Sequence[float]]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        """
+        导出还款计划（不做保证金冲抵）
+
+        由 iter_schedule 逐块生成并直接写出列数组，内存占用与总期数无关；
+        列为 period、payment、principal、interest、remaining_balance、rate（固定利率的方法为空）
+
+        Args:
+            fileobj: 可写的二进制文件对象
+            fmt: 导出格式（csv、parquet、arrow；后两者需要pyarrow）
+            method: 计算方法
+            pv: 租赁本金
+            annual_rate: 年利率（平息法为平息年利率，浮动利率法为初始年利率）
+            periods: 总期数
+            frequency: 年付次数
+            rate_reset_schedule: 浮动利率法的利率重置计划或逐期利率曲线
+            chunk_size: 每块期数，默认 EXPORT_CHUNK_SIZE
+
+        Returns:
+            int: 写出的期数
+        """
+        chunks = self.iter_schedule(
+            method,
+            pv,
+            annual_rate,
+            periods,
+            frequency,
+            rate_reset_schedule,
+            chunk_size=chunk_size or self.EXPORT_CHUNK_SIZE,
+        )
+        return write_table(fileobj, fmt, SCHEDULE_FIELDS, (schedule_columns(chunk) for chunk in chunks))
+
+    def export_batch(
+        self,
+        fileobj: BinaryIO,
+        fmt: str,
+        pv: Union[float, Sequence[float], np.ndarray],
+        annual_rate: Union[float, Sequence[float], np.ndarray],
+        periods: Union[int, Sequence[int], np.ndarray],
+        frequency: Union[int, Sequence[int], np.ndarray] = 12,
+        method: Union[str, Sequence[str], np.ndarray] = "equal_annuity",
+        guarantee: Union[float, Sequence[float], np.ndarray] = 0.0,
+        guarantee_mode: Union[str, Sequence[str], np.ndarray] = "尾期冲抵",
+        rate_reset_schedule: Optional[Sequence] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        """
+        组合批量计算并导出逐笔结果
+
+        每块至多 chunk_size 笔由 calculate_batch 计算，结果数组与输入列一起直接写出，同时在内存中的只有一块；
+        列为 index（从0开始）、输入参数、各汇总指标和 error（失败原因），失败的租赁各指标为空
+
+        Args:
+            fileobj: 可写的二进制文件对象
+            fmt: 导出格式（csv、parquet、arrow；后两者需要pyarrow）
+            pv, annual_rate, periods, frequency, method, guarantee, guarantee_mode, rate_reset_schedule:
+                同 calculate_batch
+            chunk_size: 每块租赁笔数，默认 EXPORT_CHUNK_SIZE
+
+        Returns:
+            int: 写出的租赁笔数
+        """
+        pv, annual_rate, guarantee = (
+            np.asarray(value, dtype=np.float64) for value in (pv, annual_rate, guarantee)
+        )
+        periods, frequency = (np.asarray(value, dtype=np.int64) for value in (periods, frequency))
+        method = np.asarray(method, dtype=object)
+        guarantee_mode = np.asarray(guarantee_mode, dtype=object)
+        pv, annual_rate, periods, frequency, guarantee, method, guarantee_mode = (
+            value.ravel() for value in np.broadcast_arrays(
+                pv, annual_rate, periods, frequency, guarantee, method, guarantee_mode
+            )
+        )
+        size = len(pv)
+        if rate_reset_schedule is not None and len(rate_reset_schedule) != size:
+            raise ValueError("利率重置计划数量与租赁笔数不一致")
+        chunk_size = chunk_size or self.EXPORT_CHUNK_SIZE
+
+        def chunks():
+            for start in range(0, size, chunk_size):
+                rows = slice(start, min(start + chunk_size, size))
+                batch = self.calculate_batch(
+                    pv[rows],
+                    annual_rate[rows],
+                    periods[rows],
+                    frequency[rows],
+                    method[rows],
+                    guarantee[rows],
+                    guarantee_mode[rows],
+                    None if rate_reset_schedule is None else list(rate_reset_schedule[rows]),
+                )
+                yield {
+                    "index": np.arange(rows.start, rows.stop, dtype=np.int64),
+                    "method": method[rows],
+                    "pv": pv[rows],
+                    "annual_rate": annual_rate[rows],
+                    "periods": periods[rows],
+                    "frequency": frequency[rows],
+                    "guarantee": guarantee[rows],
+                    **batch,
+                }
+
+        return write_table(fileobj, fmt, BATCH_EXPORT_FIELDS, chunks())
+
+    def sensitivity_grid(
+        self,
+        pv: Union[float, np.ndarray],
+        annual_rate: Union[float, np.ndarray],
+        periods: Union[int, np.ndarray],
+        frequency: Union[int, np.ndarray] = 12,
+        method: str = "equal_annuity",
+    ) -> Dict[str, np.ndarray]:
+        """
+        敏感性网格计算
+
+        四个参数按NumPy广播规则组合成任意维网格（如 rates[:, None] 与 terms[None, :] 得到双因素表），
+        一次向量化求出全部格的租金、总利息、总租金和IRR，结果与逐格调用计算方法一致
+
+        Args:
+            pv: 租赁本金
+            annual_rate: 年利率
+            periods: 总期数
+            frequency: 年付次数
+            method: 计算方法（equal_annuity、equal_principal；等额本金法的pmt为平均租金）
+
+        Returns:
+            Dict: pmt、total_interest、total_payment、irr 结果数组及 valid 掩码（参数不合法的格为nan）
+        """
+        if method == "equal_annuity":
+            grid = annuity_grid(pv, annual_rate, periods, frequency)
+            func = self.equal_annuity_method
+        elif method == "equal_principal":
+            grid = principal_grid(pv, annual_rate, periods, frequency)
+            func = self.equal_principal_method
+        else:
+            raise ValueError(f"不支持的计算方法: {method}")
+
+        fallback = grid.pop("fallback")
+        if fallback.any():
+            # 超出整数分精确范围的格逐格按参考实现计算
+            params = [
+                value.ravel()
+                for value in np.broadcast_arrays(
+                    np.asarray(pv, dtype=np.float64),
+                    np.asarray(annual_rate, dtype=np.float64),
+                    np.asarray(periods, dtype=np.int64),
+                    np.asarray(frequency, dtype=np.int64),
+                )
+            ]
+            # 结果数组均为新建的连续数组，reshape(-1)得到可写视图
+            flat = {name: values.reshape(-1) for name, values in grid.items()}
+            for k in np.flatnonzero(fallback):
+                cell_pv, cell_rate, cell_periods, cell_frequency = (value[k].item() for value in params)
+                try:
+                    result = func(cell_pv, cell_rate, cell_periods, cell_frequency, summary_only=True)
+                except Exception:
+                    flat["valid"][k] = False
+                    continue
+                flat["pmt"][k] = result.get("pmt", result["total_payment"] / cell_periods)
+                flat["total_interest"][k] = result["total_interest"]
+                flat["total_payment"][k] = result["total_payment"]
+                flat["irr"][k] = result["irr"]
+
+        return grid
+
+    def analytic_sensitivities(self, pv: float, annual_rate: float, periods: int, frequency: int = 12) -> Dict:
+        """
+        等额年金法的解析敏感性：租金对利率、期数、本金的导数，IRR对租金、本金的导数，
+        以及租金现金流的麦考利久期、修正久期和凸性（以年为单位），一次求值无需重复计算
+
+        Args:
+            pv: 租赁本金
+            annual_rate: 年利率
+            periods: 总期数
+            frequency: 年付次数
+
+        Returns:
+            Dict: 各项敏感性指标（见 grid_engine.annuity_sensitivities）
+        """
+        self._validate_parameters(pv, annual_rate, periods, frequency)
+        result = annuity_sensitivities(pv, annual_rate, periods, frequency)
+        return {name: float(value) for name, value in result.items()}
+
+    def analytic_sensitivities_batch(
+        self,
+        pv: Union[float, np.ndarray],
+        annual_rate: Union[float, np.ndarray],
+        periods: Union[int, np.ndarray],
+        frequency: Union[int, np.ndarray] = 12,
+    ) -> Dict[str, np.ndarray]:
+        """
+        批量解析敏感性，参数按NumPy广播规则逐笔计算
+
+        Returns:
+            Dict: 各项敏感性数组，参数不合法的元素为nan
+        """
+        return annuity_sensitivities(pv, annual_rate, periods, frequency)
+
     def sensitivity_analysis(self, base_params: Dict, sensitivity_params: Dict) -> Dict:
         """
         敏感性分析
 
+        基准与全部变动情景拼成一组参数向量，由 sensitivity_grid 一次计算
+
         Args:
             base_params: 基准参数（必须包含pv, annual_rate, periods, frequency）
             sensitivity_params: 敏感性参数设置
@@ -468,16 +1423,9 @@ class LeaseCalculator:
         Returns:
             Dict: 敏感性分析结果
         """
-        results = {}
-        base_result = self.equal_annuity_method(**base_params)
-        base_irr = self.calculate_irr(
-            [-base_params["pv"]] + [base_result["pmt"]] * base_params["periods"],
-            base_params["frequency"],
-        )
-
+        scenarios = [base_params]
+        labels = []
         for param_name, variations in sensitivity_params.items():
-            results[param_name] = []
-
             for variation in variations:
                 modified_params = base_params.copy()
 
@@ -490,30 +1438,87 @@ class LeaseCalculator:
                 elif param_name == "frequency":
                     modified_params["frequency"] = int(variation)
 
-                try:
-                    result = self.equal_annuity_method(**modified_params)
-                    irr = self.calculate_irr(
-                        [-modified_params["pv"]] + [result["pmt"]] * modified_params["periods"],
-                        modified_params["frequency"],
-                    )
+                scenarios.append(modified_params)
+                labels.append((param_name, variation))
 
-                    results[param_name].append(
-                        {
-                            "param_value": variation,
-                            "pmt": result["pmt"],
-                            "irr": irr,
-                            "pmt_change_pct": (result["pmt"] - base_result["pmt"]) / base_result["pmt"] * 100,
-                            "irr_change_pct": (irr - base_irr) / base_irr * 100 if base_irr != 0 else 0,
-                        }
-                    )
+        grid = self.sensitivity_grid(
+            [params["pv"] for params in scenarios],
+            [params["annual_rate"] for params in scenarios],
+            [params["periods"] for params in scenarios],
+            [params.get("frequency", 12) for params in scenarios],
+        )
+        valid = grid["valid"].tolist()
+        pmts = grid["pmt"].tolist()
+        irrs = grid["irr"].tolist()
+
+        if not valid[0]:
+            # 基准参数不合法时按原方法抛出相应异常
+            self.equal_annuity_method(**base_params, summary_only=True)
+        base_pmt, base_irr = pmts[0], irrs[0]
+
+        results = {param_name: [] for param_name in sensitivity_params}
+        for k, (param_name, variation) in enumerate(labels, start=1):
+            if not valid[k]:
+                try:
+                    self.equal_annuity_method(**scenarios[k], summary_only=True)
+                    error = "计算失败"
                 except Exception as e:
-                    results[param_name].append({"param_value": variation, "error": str(e)})
+                    error = str(e)
+                results[param_name].append({"param_value": variation, "error": error})
+                continue
+
+            pmt, irr = pmts[k], irrs[k]
+            results[param_name].append(
+                {
+                    "param_value": variation,
+                    "pmt": pmt,
+                    "irr": irr,
+                    "pmt_change_pct": (pmt - base_pmt) / base_pmt * 100,
+                    "irr_change_pct": (irr - base_irr) / base_irr * 100 if base_irr != 0 else 0,
+                }
+            )
 
         return {
-            "base_result": {"pmt": base_result["pmt"], "irr": base_irr},
+            "base_result": {"pmt": base_pmt, "irr": base_irr},
             "sensitivity_results": results,
         }
 
+    def _payment_function(
+        self, method: str, pv: float, periods: int, frequency: int
+    ) -> Callable[[float], Tuple[float, float]]:
+        """
+        每期租金关于年利率的函数及其解析导数（等额本金法取平均租金）
+
+        等额本金法、平息法的租金是年利率的线性函数，牛顿法一步即得闭式解
+
+        Returns:
+            Callable: rate -> (租金, d租金/d年利率)
+        """
+        if method == "equal_annuity":
+
+            def payment(rate: float) -> Tuple[float, float]:
+                i = rate / frequency
+                if abs(i) < 1e-12:
+                    return pv / periods, pv * (periods + 1) / (2 * periods) / frequency
+                discount = (1 + i) ** -periods
+                value = pv * i / (1 - discount)
+                derivative = pv * ((1 - discount) - i * periods * discount / (1 + i)) / (1 - discount) ** 2
+                return value, derivative / frequency
+
+            return payment
+
+        if method == "equal_principal":
+            # 平均租金 = PV/n + 平均余额 × 期利率，平均余额为 PV(n+1)/(2n)
+            slope = pv * (periods + 1) / (2 * periods) / frequency
+        elif method == "flat_rate":
+            # 平息法租金 = PV(1 + 平息率 × 年数) / n
+            slope = pv * (periods / frequency) / periods
+        else:
+            raise ValueError(f"不支持的计算方法: {method}")
+
+        base = pv / periods
+        return lambda rate: (base + slope * rate, slope)
+
     def reverse_calculate_rate(
         self,
         pv: float,
@@ -527,62 +1532,73 @@ class LeaseCalculator:
         """
         反向计算年利率
 
+        直接对租金公式求根（解析导数牛顿法，越界时二分），只在最终利率上生成一次还款计划
+
         Args:
             pv: 租赁本金
             target_pmt: 目标每期租金
             periods: 总期数
             frequency: 年付次数
             method: 计算方法
-            tolerance: 误差容忍度
+            tolerance: 误差容忍度（最终租金与目标租金之差）
             max_iterations: 最大迭代次数
 
         Returns:
             Dict: 包含计算得出的年利率和相关信息
         """
-        # 使用二分法求解年利率
+        payment = self._payment_function(method, pv, periods, frequency)
+
         low_rate = 0.001  # 最低利率0.1%
         high_rate = 1.0  # 最高利率100%
         iterations = 0
 
-        for i in range(max_iterations):
-            iterations = i + 1
-            test_rate = (low_rate + high_rate) / 2
-
-            # 计算在当前利率下的租金
-            if method == "equal_annuity":
-                result = self.equal_annuity_method(pv, test_rate, periods, frequency)
-                calculated_pmt = result["pmt"]
-            elif method == "equal_principal":
-                result = self.equal_principal_method(pv, test_rate, periods, frequency)
-                # 等额本金法取平均租金
-                calculated_pmt = sum(item["payment"] for item in result["schedule"]) / periods
-            elif method == "flat_rate":
-                years = periods / frequency
-                result = self.flat_rate_method(pv, test_rate, years, frequency)
-                calculated_pmt = result["pmt"]
-            else:
-                raise ValueError(f"不支持的计算方法: {method}")
+        f_low = payment(low_rate)[0] - target_pmt
+        f_high = payment(high_rate)[0] - target_pmt
 
-            # 检查误差
-            error = calculated_pmt - target_pmt
-            if abs(error) <= tolerance:
-                break
+        if f_low >= 0:
+            # 目标租金低于搜索区间下限
+            test_rate = low_rate
+        elif f_high <= 0:
+            # 目标租金高于搜索区间上限
+            test_rate = high_rate
+        else:
+            # 以零利率处的线性近似为初值；租金关于利率单调且凸，牛顿迭代从右侧单调收敛
+            slope0 = payment(0.0)[1]
+            test_rate = min(max((target_pmt - pv / periods) / slope0, low_rate), high_rate)
 
-            # 调整搜索范围
-            if calculated_pmt > target_pmt:
-                high_rate = test_rate
-            else:
-                low_rate = test_rate
+            for i in range(max_iterations):
+                iterations = i + 1
+                value, derivative = payment(test_rate)
+                f = value - target_pmt
+
+                if f > 0:
+                    high_rate = test_rate
+                else:
+                    low_rate = test_rate
 
-        # 计算最终结果
-        final_result = None
+                next_rate = test_rate - f / derivative if derivative > 0 else low_rate - 1
+                if not low_rate <= next_rate <= high_rate:
+                    next_rate = (low_rate + high_rate) / 2
+
+                converged = abs(next_rate - test_rate) <= 1e-12 * (1 + test_rate)
+                test_rate = next_rate
+                if converged or f == 0:
+                    break
+
+        # 只在最终利率上生成一次还款计划
         if method == "equal_annuity":
             final_result = self.equal_annuity_method(pv, test_rate, periods, frequency)
+            calculated_pmt = final_result["pmt"]
         elif method == "equal_principal":
             final_result = self.equal_principal_method(pv, test_rate, periods, frequency)
-        elif method == "flat_rate":
+            # 等额本金法取平均租金
+            calculated_pmt = sum(final_result["schedule"].payment.tolist()) / periods
+        else:
             years = periods / frequency
             final_result = self.flat_rate_method(pv, test_rate, years, frequency)
+            calculated_pmt = final_result["pmt"]
+
+        error = calculated_pmt - target_pmt
 
         return {
             "calculated_rate": test_rate,
@@ -590,6 +1606,7 @@ class LeaseCalculator:
             "actual_pmt": calculated_pmt,
             "error": error,
             "iterations": iterations,
+            "converged": abs(error) <= tolerance,
             "method": method,
             "pv": pv,
             "periods": periods,
@@ -598,6 +1615,36 @@ class LeaseCalculator:
             "total_payment": final_result.get("total_payment", 0),
         }
 
+    def _offset_payment_vector(self, payments: np.ndarray, guarantee: float, mode: str) -> np.ndarray:
+        """
+        保证金冲抵后的租金（浮点向量化版本，供反向求解使用）
+
+        冲抵规则与 apply_guarantee_offset 相同：尾期冲抵、首期冲抵依次冲抵至保证金用完，
+        按比例分摊每期冲抵 保证金/期数（不超过当期租金）
+
+        Args:
+            payments: 每期租金
+            guarantee: 保证金金额
+            mode: 冲抵模式
+
+        Returns:
+            np.ndarray: 冲抵后的每期租金
+        """
+        if guarantee <= 0:
+            return payments
+        if mode == "按比例分摊":
+            return payments - np.minimum(guarantee / len(payments), payments)
+        if mode not in ("尾期冲抵", "首期冲抵"):
+            raise ValueError(f"不支持的冲抵模式: {mode}")
+
+        ordered = payments[::-1] if mode == "尾期冲抵" else payments
+        # 每期可冲抵额 = 扣除此前各期已冲抵部分后剩余的保证金，且不超过当期租金
+        used_before = np.cumsum(ordered) - ordered
+        offset = np.clip(guarantee - used_before, 0.0, ordered)
+        if mode == "尾期冲抵":
+            offset = offset[::-1]
+        return payments - offset
+
     def reverse_calculate_pmt(
         self,
         pv: float,
@@ -607,56 +1654,128 @@ class LeaseCalculator:
         method: str = "equal_annuity",
         tolerance: float = 0.0001,
         max_iterations: int = 100,
+        guarantee: float = 0.0,
+        guarantee_mode: str = "尾期冲抵",
+        extra_cash_flows: Optional[Sequence[float]] = None,
     ) -> Dict:
         """
         根据目标IRR反向计算租金
 
+        目标IRR换算为期利率 i = (1 + IRR)^(1/f) - 1 后，等额租金即年金闭式解
+        PMT = PV × i / (1 - (1 + i)^-n)，不再限制在 [PV/n, 2PV/n] 区间内；
+        含保证金冲抵或附加现金流时，在期利率i处对 NPV(PMT) = 0 做一次括区间求根
+
         Args:
             pv: 租赁本金
-            target_irr: 目标IRR
+            target_irr: 目标IRR（年化）
             periods: 总期数
             frequency: 年付次数
             method: 计算方法
-            tolerance: 误差容忍度
-            max_iterations: 最大迭代次数
+            tolerance: 误差容忍度（实际IRR与目标IRR之差）
+            max_iterations: 求根最大迭代次数
+            guarantee: 保证金金额（按guarantee_mode冲抵租金）
+            guarantee_mode: 冲抵模式（尾期冲抵、按比例分摊、首期冲抵）
+            extra_cash_flows: 按期对齐的附加现金流，第0项为起租日（如手续费收入、期末残值）
 
         Returns:
-            Dict: 包含计算得出的租金和相关信息
+            Dict: 包含计算得出的租金、实际IRR及收敛信息
         """
-        # 使用二分法求解租金
-        low_pmt = pv / periods  # 最低租金（不含利息）
-        high_pmt = pv * 2 / periods  # 最高租金（估算）
-        iterations = 0
+        if target_irr <= -1:
+            raise ValueError("目标IRR必须大于-100%")
+        if periods <= 0 or frequency <= 0:
+            raise ValueError("期数和年付次数必须大于0")
 
-        for i in range(max_iterations):
-            iterations = i + 1
-            test_pmt = (low_pmt + high_pmt) / 2
+        period_rate = math.expm1(math.log1p(target_irr) / frequency)
 
-            # 构建现金流
-            cash_flows = [-pv] + [test_pmt] * periods
-            calculated_irr = self.calculate_irr(cash_flows, frequency)
+        # 年金闭式解；期利率贴近0时 1 - (1 + i)^-n 用expm1保持精度
+        if period_rate == 0:
+            annuity_pmt = pv / periods
+        else:
+            annuity_pmt = pv * period_rate / -math.expm1(-periods * math.log1p(period_rate))
 
-            # 检查误差
-            irr_error = calculated_irr - target_irr
-            if abs(irr_error) <= tolerance:
-                break
+        extra = np.zeros(periods + 1)
+        if extra_cash_flows is not None:
+            if len(extra_cash_flows) > periods + 1:
+                raise ValueError("附加现金流长度不能超过期数+1")
+            extra[: len(extra_cash_flows)] = extra_cash_flows
 
-            # 调整搜索范围
-            if calculated_irr > target_irr:
-                high_pmt = test_pmt
-            else:
-                low_pmt = test_pmt
+        iterations = 0
+        converged = True
+        residual = 0.0
 
-        # 计算相关财务指标
-        total_payment = test_pmt * periods
+        if guarantee <= 0 and not extra.any():
+            calculated_pmt = annuity_pmt
+            solver = "closed_form"
+        else:
+            solver = "root"
+            discount = (1 + period_rate) ** -np.arange(1, periods + 1, dtype=np.float64)
+            base_npv = float(extra[0] - pv + extra[1:] @ discount)
+
+            def npv(pmt: float) -> float:
+                payments = self._offset_payment_vector(np.full(periods, pmt), guarantee, guarantee_mode)
+                return base_npv + float(payments @ discount)
+
+            # NPV关于租金单调不减：先向右扩展括区间，再用Illinois改进试位法求根
+            npv_tolerance = 1e-9 * max(abs(pv), 1.0)
+            low, f_low = 0.0, base_npv
+            high = max(annuity_pmt, abs(pv) / periods, 1e-9)
+            f_high = npv(high)
+            while f_high < 0 and high < 1e15:
+                low, f_low = high, f_high
+                high *= 2
+                f_high = npv(high)
+
+            if f_low >= 0:
+                # 附加现金流已覆盖本金，不需要租金
+                calculated_pmt, residual = 0.0, f_low
+            elif f_high < 0:
+                calculated_pmt, residual = high, f_high
+                converged = False
+            else:
+                calculated_pmt, residual = high, f_high
+                side = 0
+                converged = False
+                for k in range(max_iterations):
+                    iterations = k + 1
+                    if abs(residual) <= npv_tolerance or high - low <= 1e-12 * high:
+                        converged = True
+                        break
+                    calculated_pmt = (low * f_high - high * f_low) / (f_high - f_low)
+                    residual = npv(calculated_pmt)
+                    if residual > 0:
+                        high, f_high = calculated_pmt, residual
+                        if side > 0:
+                            f_low /= 2
+                        side = 1
+                    else:
+                        low, f_low = calculated_pmt, residual
+                        if side < 0:
+                            f_high /= 2
+                        side = -1
+                else:
+                    converged = abs(residual) <= npv_tolerance
+
+        # 以最终现金流求一次实际IRR作为校验
+        payments = self._offset_payment_vector(np.full(periods, calculated_pmt), guarantee, guarantee_mode)
+        cash_flows = extra.copy()
+        cash_flows[0] -= pv
+        cash_flows[1:] += payments
+        actual_irr = self.calculate_irr(cash_flows.tolist(), frequency, guess=period_rate)
+        irr_error = actual_irr - target_irr
+
+        # 计算相关财务指标：按冲抵后的租金列合计
+        total_payment = float(payments.sum())
         total_interest = total_payment - pv
 
         return {
-            "calculated_pmt": test_pmt,
+            "calculated_pmt": calculated_pmt,
             "target_irr": target_irr,
-            "actual_irr": calculated_irr,
+            "actual_irr": actual_irr,
             "irr_error": irr_error,
             "iterations": iterations,
+            "converged": converged and abs(irr_error) <= tolerance,
+            "solver": solver,
+            "npv_residual": residual,
             "method": method,
             "pv": pv,
             "periods": periods,
@@ -666,6 +1785,11 @@ class LeaseCalculator:
         }
 
 
+def _to_floats(values: List[Decimal]) -> List[float]:
+    """Decimal列表逐个转换为float"""
+    return [float(value) for value in values]
+
+
 # 增加numpy的金融函数兼容性
 def np_irr_fallback(values):
     """numpy.irr的替代实现"""
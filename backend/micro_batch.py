@@ -0,0 +1,152 @@
+"""
+请求微批处理
+在一个短时间窗口内到达的请求合并为一批，由一次批量计算得出全部结果后分发给各等待的请求。
+每批第一个到达的请求（领头请求）在窗口结束或批次满员时执行批量计算，不依赖后台线程，
+因此同一请求的等待时间不超过窗口；批次只在同一进程（worker）的线程之间合并
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class _Batch:
+    """一个批次：收集中的请求、计算结果及完成事件"""
+
+    __slots__ = ("deadline", "items", "arrivals", "results", "done")
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.items: List[Any] = []
+        self.arrivals: List[float] = []
+        self.results: Sequence[Any] = ()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    微批处理器
+
+    evaluate 接收一批请求的列表，返回等长的结果列表；某项结果为异常实例时在对应请求中抛出
+    """
+
+    def __init__(self, evaluate: Callable[[List[Any]], Sequence[Any]], window: float = 0.002, max_size: int = 256):
+        """
+        Args:
+            evaluate: 批量计算函数
+            window: 收集窗口（秒），请求最多等待这么久再开始计算
+            max_size: 每批最大请求数，满员时立即计算
+        """
+        if window <= 0:
+            raise ValueError("微批处理窗口必须大于0")
+        if max_size < 1:
+            raise ValueError("每批最大请求数必须大于0")
+        self.evaluate = evaluate
+        self.window = window
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        self._open = None  # 正在收集请求的批次
+
+        # 统计：批次数、请求数、批次大小分布（按 1、2、3-4、5-8…… 分桶）、排队等待时间
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._size_buckets: List[int] = []
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._errors = 0
+
+    def submit(self, item: Any) -> Any:
+        """
+        提交一个请求并等待其所在批次的计算结果
+
+        Args:
+            item: 请求（由 evaluate 解释）
+
+        Returns:
+            该请求的结果；结果为异常时抛出
+        """
+        now = time.monotonic()
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch(now + self.window)
+            index = len(batch.items)
+            batch.items.append(item)
+            batch.arrivals.append(now)
+            if len(batch.items) >= self.max_size:
+                # 满员即关闭批次，之后到达的请求进入新批次
+                self._open = None
+                self._full.notify_all()
+
+            if leader:
+                while self._open is batch:
+                    remaining = batch.deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._open = None
+                        break
+                    self._full.wait(remaining)
+
+        if leader:
+            self._run(batch)
+        else:
+            batch.done.wait()
+
+        result = batch.results[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _run(self, batch: _Batch) -> None:
+        """执行一批的计算并唤醒等待的请求；批量计算本身失败时该批全部请求得到同一异常"""
+        started = time.monotonic()
+        size = len(batch.items)
+        # 领头请求所在线程被中断时，等待的请求也不会永久阻塞
+        batch.results = [RuntimeError("批量计算中断")] * size
+        failed = False
+        try:
+            results = self.evaluate(batch.items)
+            if len(results) != size:
+                raise RuntimeError("批量计算结果数量与请求数量不一致")
+            batch.results = results
+        except Exception as e:
+            batch.results = [e] * size
+            failed = True
+        finally:
+            batch.done.set()
+
+        waits = [started - arrival for arrival in batch.arrivals]
+        with self._lock:
+            self._batches += 1
+            self._requests += size
+            self._max_batch = max(self._max_batch, size)
+            bucket = (size - 1).bit_length()
+            if bucket >= len(self._size_buckets):
+                self._size_buckets.extend([0] * (bucket + 1 - len(self._size_buckets)))
+            self._size_buckets[bucket] += 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._errors += failed
+
+    def stats(self) -> Dict:
+        """批次大小分布、平均批次大小及排队等待时间（本进程）"""
+        with self._lock:
+            buckets = {}
+            for bucket, count in enumerate(self._size_buckets):
+                low, high = (1 << (bucket - 1)) + 1 if bucket else 1, 1 << bucket
+                buckets[str(high) if low == high else f"{low}-{high}"] = count
+            return {
+                "window_ms": self.window * 1000,
+                "max_size": self.max_size,
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "batch_sizes": buckets,
+                "mean_wait_ms": self._wait_total / self._requests * 1000 if self._requests else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+                "errors": self._errors,
+            }
@@ -0,0 +1,413 @@
+"""
+进程池执行层
+将大批量组合计算、敏感性网格和反向求解任务按块分发到多个进程，
+输入与结果列放在共享内存中的NumPy数组里（不再序列化逐笔字典列表），
+每块只写回自身的行区间，合并结果与各块完成顺序无关
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from lease_calculator import LeaseCalculator
+
+ArrayLike = Union[float, int, str, Sequence, np.ndarray]
+
+# 各任务的结果列及dtype（出错的行浮点列为nan，整数、布尔列为0）
+BATCH_FIELDS = ("pmt", "total_interest", "total_payment", "irr", "unused_guarantee", "total_offset")
+_OUTPUTS = {
+    "batch": [(name, np.float64) for name in BATCH_FIELDS],
+    "sensitivity": [
+        ("pmt", np.float64),
+        ("total_interest", np.float64),
+        ("total_payment", np.float64),
+        ("irr", np.float64),
+        ("valid", np.bool_),
+    ],
+    "reverse_rate": [
+        ("calculated_rate", np.float64),
+        ("actual_pmt", np.float64),
+        ("error", np.float64),
+        ("iterations", np.int64),
+        ("converged", np.bool_),
+        ("total_interest", np.float64),
+        ("total_payment", np.float64),
+    ],
+    "reverse_pmt": [
+        ("calculated_pmt", np.float64),
+        ("actual_irr", np.float64),
+        ("irr_error", np.float64),
+        ("iterations", np.int64),
+        ("converged", np.bool_),
+        ("total_interest", np.float64),
+        ("total_payment", np.float64),
+    ],
+}
+
+# 共享内存中各列的起始偏移按缓存行对齐
+_ALIGNMENT = 64
+
+
+class _SharedColumns:
+    """
+    一组等长列在同一块共享内存中的副本
+
+    spec 可序列化后传给子进程，子进程按名称映射同一块内存，读写零拷贝
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        layout = []
+        offset = 0
+        for name, values in columns.items():
+            layout.append((name, values.dtype.str, values.shape, offset))
+            offset += -(-values.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        self._block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = (self._block.name, layout)
+        self.arrays = _views(self._block, layout)
+        for name, values in columns.items():
+            self.arrays[name][...] = values
+
+    def close(self) -> None:
+        """释放并删除共享内存（须先释放对 arrays 的引用）"""
+        self.arrays = None
+        self._block.close()
+        self._block.unlink()
+
+
+def _views(block: shared_memory.SharedMemory, layout: List[Tuple]) -> Dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+        for name, dtype, shape, offset in layout
+    }
+
+
+def _batch_chunk(calculator: LeaseCalculator, arrays: Dict, rows: slice, extra) -> List[Tuple[int, str]]:
+    """组合批量计算的一块：结果写回共享列，返回 (行号, 错误信息) 列表"""
+    result = calculator.calculate_batch(
+        arrays["pv"][rows],
+        arrays["annual_rate"][rows],
+        arrays["periods"][rows],
+        arrays["frequency"][rows],
+        arrays["method"][rows],
+        arrays["guarantee"][rows],
+        arrays["guarantee_mode"][rows],
+        rate_reset_schedule=extra,
+    )
+    for name in BATCH_FIELDS:
+        arrays[name][rows] = result[name]
+    return [(rows.start + k, error) for k, error in enumerate(result["error"]) if error is not None]
+
+
+def _sensitivity_chunk(calculator: LeaseCalculator, arrays: Dict, rows: slice, extra) -> List[Tuple[int, str]]:
+    """敏感性网格的一块（展平后的连续格）"""
+    grid = calculator.sensitivity_grid(
+        arrays["pv"][rows], arrays["annual_rate"][rows], arrays["periods"][rows], arrays["frequency"][rows], extra
+    )
+    for name, _ in _OUTPUTS["sensitivity"]:
+        arrays[name][rows] = grid[name]
+    return []
+
+
+def _reverse_chunk(task: str, calculator: LeaseCalculator, arrays: Dict, rows: slice) -> List[Tuple[int, str]]:
+    """反向求解的一块：逐笔调用 reverse_calculate_rate / reverse_calculate_pmt"""
+    errors = []
+    outputs = [name for name, _ in _OUTPUTS[task]]
+    for k in range(rows.start, rows.stop):
+        try:
+            if task == "reverse_rate":
+                result = calculator.reverse_calculate_rate(
+                    arrays["pv"].item(k),
+                    arrays["target"].item(k),
+                    arrays["periods"].item(k),
+                    arrays["frequency"].item(k),
+                    str(arrays["method"][k]),
+                )
+            else:
+                result = calculator.reverse_calculate_pmt(
+                    arrays["pv"].item(k),
+                    arrays["target"].item(k),
+                    arrays["periods"].item(k),
+                    arrays["frequency"].item(k),
+                    str(arrays["method"][k]),
+                    guarantee=arrays["guarantee"].item(k),
+                    guarantee_mode=str(arrays["guarantee_mode"][k]),
+                )
+        except Exception as e:
+            errors.append((k, str(e)))
+            continue
+        for name in outputs:
+            arrays[name][k] = result[name]
+    return errors
+
+
+def _run_task(task: str, calculator: LeaseCalculator, arrays: Dict, rows: slice, extra) -> List[Tuple[int, str]]:
+    if task == "batch":
+        return _batch_chunk(calculator, arrays, rows, extra)
+    if task == "sensitivity":
+        return _sensitivity_chunk(calculator, arrays, rows, extra)
+    return _reverse_chunk(task, calculator, arrays, rows)
+
+
+# 子进程内常驻的计算器实例
+_worker_calculator: Optional[LeaseCalculator] = None
+
+
+def _init_worker(engine: str) -> None:
+    global _worker_calculator
+    _worker_calculator = LeaseCalculator(engine=engine)
+
+
+def _run_chunk(task: str, spec: Tuple, start: int, stop: int, extra) -> List[Tuple[int, str]]:
+    """子进程入口：映射共享内存后计算 [start, stop) 行"""
+    block = shared_memory.SharedMemory(name=spec[0])
+    try:
+        arrays = _views(block, spec[1])
+        errors = _run_task(task, _worker_calculator, arrays, slice(start, stop), extra)
+        del arrays
+        return errors
+    finally:
+        block.close()
+
+
+def _default_start_method() -> str:
+    """默认用forkserver启动子进程，避免在多线程的服务进程中直接fork"""
+    methods = multiprocessing.get_all_start_methods()
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+class ParallelExecutor:
+    """
+    LeaseCalculator 的进程池执行层
+
+    大任务按 chunk_size 行切块并行计算，结果与在单进程中调用相应方法一致；
+    行数不超过一块或 workers 为1时直接在当前进程计算，不启动进程池。
+    进程池在首次使用时创建并在多次调用间复用，用完后调用 shutdown（或使用with语句）
+
+    Args:
+        workers: 进程数，默认为CPU核数
+        chunk_size: 每块的租赁笔数（敏感性网格为格数）
+        engine: 计算引擎（decimal/numpy）
+        start_method: 子进程启动方式（fork、spawn、forkserver），默认forkserver
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = 2048,
+        engine: str = "numpy",
+        start_method: Optional[str] = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("分块大小必须大于0")
+        self.workers = max(int(workers or os.cpu_count() or 1), 1)
+        self.chunk_size = int(chunk_size)
+        self.engine = engine
+        self.start_method = start_method or _default_start_method()
+        self.calculator = LeaseCalculator(engine=engine)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.engine,),
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "ParallelExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def _run(
+        self, task: str, inputs: Dict[str, np.ndarray], extra=None, per_row_extra: Optional[list] = None
+    ) -> Tuple[Dict[str, np.ndarray], List[Tuple[int, str]]]:
+        """
+        按块执行任务
+
+        Args:
+            task: 任务名（batch、sensitivity、reverse_rate、reverse_pmt）
+            inputs: 等长的一维输入列
+            extra: 各块共用的附加参数
+            per_row_extra: 逐行的附加参数（无法放入共享内存的对象，按块切片后随任务序列化）
+
+        Returns:
+            Tuple: (结果列, 按行号排序的 (行号, 错误信息) 列表)
+        """
+        size = len(next(iter(inputs.values())))
+        outputs = {
+            name: np.full(size, np.nan) if dtype is np.float64 else np.zeros(size, dtype=dtype)
+            for name, dtype in _OUTPUTS[task]
+        }
+
+        if self.workers == 1 or size <= self.chunk_size:
+            arrays = {**inputs, **outputs}
+            return outputs, _run_task(task, self.calculator, arrays, slice(0, size), per_row_extra or extra)
+
+        shared = _SharedColumns({**inputs, **outputs})
+        try:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(
+                    _run_chunk,
+                    task,
+                    shared.spec,
+                    start,
+                    min(start + self.chunk_size, size),
+                    per_row_extra[start : start + self.chunk_size] if per_row_extra is not None else extra,
+                )
+                for start in range(0, size, self.chunk_size)
+            ]
+            # 按提交顺序收集各块的错误，结果列已由各块写入各自的行区间
+            errors = []
+            for future in futures:
+                errors.extend(future.result())
+            outputs = {name: shared.arrays[name].copy() for name in outputs}
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，下次调用时重建
+            self._pool = None
+            raise
+        finally:
+            shared.close()
+        return outputs, errors
+
+    def calculate_batch(
+        self,
+        pv: ArrayLike,
+        annual_rate: ArrayLike,
+        periods: ArrayLike,
+        frequency: ArrayLike = 12,
+        method: ArrayLike = "equal_annuity",
+        guarantee: ArrayLike = 0.0,
+        guarantee_mode: ArrayLike = "尾期冲抵",
+        rate_reset_schedule: Optional[Sequence] = None,
+    ) -> Dict:
+        """
+        并行组合批量计算，参数与结果同 LeaseCalculator.calculate_batch（不返回还款计划）
+
+        Returns:
+            Dict: 各结果列及 error 列表
+        """
+        columns = np.broadcast_arrays(
+            np.asarray(pv, dtype=np.float64),
+            np.asarray(annual_rate, dtype=np.float64),
+            np.asarray(periods, dtype=np.int64),
+            np.asarray(frequency, dtype=np.int64),
+            np.asarray(guarantee, dtype=np.float64),
+            np.asarray(method, dtype=np.str_),
+            np.asarray(guarantee_mode, dtype=np.str_),
+        )
+        names = ("pv", "annual_rate", "periods", "frequency", "guarantee", "method", "guarantee_mode")
+        inputs = {name: np.ascontiguousarray(values.ravel()) for name, values in zip(names, columns)}
+        size = len(inputs["pv"])
+        if rate_reset_schedule is not None and len(rate_reset_schedule) != size:
+            raise ValueError("利率重置计划数量与租赁笔数不一致")
+
+        outputs, errors = self._run(
+            "batch", inputs, per_row_extra=list(rate_reset_schedule) if rate_reset_schedule is not None else None
+        )
+        outputs["error"] = [None] * size
+        for k, error in errors:
+            outputs["error"][k] = error
+        return outputs
+
+    def sensitivity_grid(
+        self,
+        pv: ArrayLike,
+        annual_rate: ArrayLike,
+        periods: ArrayLike,
+        frequency: ArrayLike = 12,
+        method: str = "equal_annuity",
+    ) -> Dict[str, np.ndarray]:
+        """
+        并行敏感性网格，参数按NumPy广播规则组合，结果同 LeaseCalculator.sensitivity_grid
+
+        Returns:
+            Dict: pmt、total_interest、total_payment、irr 结果数组及 valid 掩码（形状为广播后的网格形状）
+        """
+        if method not in ("equal_annuity", "equal_principal"):
+            raise ValueError(f"不支持的计算方法: {method}")
+        columns = np.broadcast_arrays(
+            np.asarray(pv, dtype=np.float64),
+            np.asarray(annual_rate, dtype=np.float64),
+            np.asarray(periods, dtype=np.int64),
+            np.asarray(frequency, dtype=np.int64),
+        )
+        shape = columns[0].shape
+        names = ("pv", "annual_rate", "periods", "frequency")
+        inputs = {name: np.ascontiguousarray(values.ravel()) for name, values in zip(names, columns)}
+
+        outputs, _ = self._run("sensitivity", inputs, extra=method)
+        return {name: values.reshape(shape) for name, values in outputs.items()}
+
+    def reverse_calculate_rate_batch(
+        self,
+        pv: ArrayLike,
+        target_pmt: ArrayLike,
+        periods: ArrayLike,
+        frequency: ArrayLike = 12,
+        method: ArrayLike = "equal_annuity",
+    ) -> Dict:
+        """
+        并行批量反向计算年利率，逐笔结果同 LeaseCalculator.reverse_calculate_rate
+
+        Returns:
+            Dict: calculated_rate、actual_pmt、error、iterations、converged、total_interest、total_payment
+            结果列及 errors 列表（求解失败的行号与错误信息）
+        """
+        inputs = self._reverse_inputs(pv, target_pmt, periods, frequency, method, 0.0, "尾期冲抵")
+        outputs, errors = self._run("reverse_rate", inputs)
+        outputs["errors"] = errors
+        return outputs
+
+    def reverse_calculate_pmt_batch(
+        self,
+        pv: ArrayLike,
+        target_irr: ArrayLike,
+        periods: ArrayLike,
+        frequency: ArrayLike = 12,
+        method: ArrayLike = "equal_annuity",
+        guarantee: ArrayLike = 0.0,
+        guarantee_mode: ArrayLike = "尾期冲抵",
+    ) -> Dict:
+        """
+        并行批量根据目标IRR反向计算租金，逐笔结果同 LeaseCalculator.reverse_calculate_pmt
+
+        Returns:
+            Dict: calculated_pmt、actual_irr、irr_error、iterations、converged、total_interest、total_payment
+            结果列及 errors 列表（求解失败的行号与错误信息）
+        """
+        inputs = self._reverse_inputs(pv, target_irr, periods, frequency, method, guarantee, guarantee_mode)
+        outputs, errors = self._run("reverse_pmt", inputs)
+        outputs["errors"] = errors
+        return outputs
+
+    @staticmethod
+    def _reverse_inputs(pv, target, periods, frequency, method, guarantee, guarantee_mode) -> Dict[str, np.ndarray]:
+        columns = np.broadcast_arrays(
+            np.asarray(pv, dtype=np.float64),
+            np.asarray(target, dtype=np.float64),
+            np.asarray(periods, dtype=np.int64),
+            np.asarray(frequency, dtype=np.int64),
+            np.asarray(guarantee, dtype=np.float64),
+            np.asarray(method, dtype=np.str_),
+            np.asarray(guarantee_mode, dtype=np.str_),
+        )
+        names = ("pv", "target", "periods", "frequency", "guarantee", "method", "guarantee_mode")
+        return {name: np.ascontiguousarray(values.ravel()) for name, values in zip(names, columns)}
+
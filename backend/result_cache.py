@@ -0,0 +1,573 @@
+"""
+计算结果缓存
+以规范化参数的哈希为键缓存计算结果（JSON字节串），支持条目数上限、TTL过期及命中/未命中计数。
+后端可选：进程内LRU（memory）、同一主机各worker共享的SQLite文件（sqlite）、Redis协议服务（redis）
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from single_flight import prepare_private_dir
+
+logger = logging.getLogger(__name__)
+
+# 缓存值格式版本：结果结构变化时递增，使旧条目不再命中
+CACHE_VERSION = 2
+
+
+def _canonical(value):
+    """规范化参数值：数值统一为float（-0.0 归一为 0.0），字典按键排序由 json.dumps 完成"""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value) + 0.0
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if hasattr(value, "tolist"):
+        return _canonical(value.tolist())
+    raise TypeError(f"无法作为缓存键的参数类型: {type(value).__name__}")
+
+
+def params_digest(params: Dict) -> str:
+    """
+    计算参数的摘要
+
+    参数规范化后（数值统一为float、键排序、无空白的JSON）取SHA-256，
+    因此 1000000 与 1000000.0、键顺序不同的同一组参数得到相同的摘要
+
+    Args:
+        params: 计算参数，值为None的参数视为未提供
+
+    Returns:
+        str: 64位十六进制摘要
+    """
+    canonical = {name: _canonical(value) for name, value in params.items() if value is not None}
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(params: Dict, namespace: str = "calculate") -> str:
+    """
+    计算参数的缓存键
+
+    Args:
+        params: 计算参数，值为None的参数视为未提供
+        namespace: 键前缀（区分不同接口）
+
+    Returns:
+        str: "{namespace}:v{版本}:{参数摘要}"
+    """
+    return f"{namespace}:v{CACHE_VERSION}:{params_digest(params)}"
+
+
+class CacheBackendError(Exception):
+    """缓存后端（SQLite文件、Redis服务）访问失败"""
+
+
+class ResultCache:
+    """
+    结果缓存基类
+
+    子类实现 _get/_set/_clear/_entries/_incr/_counters；后端出错时记录日志并按未命中处理，不影响计算
+    """
+
+    backend = "base"
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, max_value_bytes: int = 1024 * 1024):
+        if max_entries <= 0:
+            raise ValueError("缓存条目数上限必须大于0")
+        if ttl <= 0:
+            raise ValueError("缓存过期时间必须大于0")
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self.max_value_bytes = int(max_value_bytes)
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存值，未命中或已过期返回None"""
+        try:
+            value = self._get(key)
+            self._incr("hits" if value is not None else "misses")
+            return value
+        except CacheBackendError as e:
+            self.errors += 1
+            logger.warning("读取结果缓存失败: %s", e)
+            return None
+
+    def set(self, key: str, value: bytes) -> bool:
+        """写入缓存值（超过单值大小上限时不缓存），返回是否写入"""
+        if len(value) > self.max_value_bytes:
+            return False
+        try:
+            self._set(key, value)
+            return True
+        except CacheBackendError as e:
+            self.errors += 1
+            logger.warning("写入结果缓存失败: %s", e)
+            return False
+
+    def clear(self) -> None:
+        """清空缓存条目及计数"""
+        self._clear()
+
+    def stats(self) -> Dict:
+        """命中/未命中计数、条目数及配置（共享后端的计数为各进程合计）"""
+        try:
+            counters = self._counters()
+            entries = self._entries()
+        except CacheBackendError as e:
+            self.errors += 1
+            logger.warning("读取结果缓存统计失败: %s", e)
+            counters, entries = {}, None
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "backend": self.backend,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "errors": self.errors,
+        }
+
+    def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+    def _entries(self) -> int:
+        raise NotImplementedError
+
+    def _incr(self, name: str) -> None:
+        raise NotImplementedError
+
+    def _counters(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class LRUCache(ResultCache):
+    """进程内LRU缓存：超过条目数上限时淘汰最久未访问的条目，过期条目在访问时删除"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, max_value_bytes: int = 1024 * 1024):
+        super().__init__(max_entries, ttl, max_value_bytes)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _clear(self):
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = 0
+
+    def _entries(self):
+        return len(self._data)
+
+    def _incr(self, name):
+        with self._lock:
+            if name == "hits":
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def _counters(self):
+        return {"hits": self._hits, "misses": self._misses}
+
+
+def default_cache_path(name: str) -> str:
+    """
+    SQLite缓存的默认文件：系统临时目录下按用户区分的目录中（目录须为当前用户所有且其他用户不可写）
+
+    Raises:
+        ValueError: 目录已存在且不是当前用户所有，或其他用户可写
+    """
+    if not hasattr(os, "getuid"):
+        return os.path.join(tempfile.gettempdir(), f"lease-calculator-{name}.sqlite3")
+    directory = os.path.join(tempfile.gettempdir(), f"lease-calculator-cache-{os.getuid()}")
+    prepare_private_dir(directory)
+    return os.path.join(directory, f"lease-calculator-{name}.sqlite3")
+
+
+class SQLiteCache(ResultCache):
+    """
+    SQLite文件缓存：同一主机的各worker进程共享条目与计数
+
+    使用WAL模式，读写互不阻塞；每个进程、线程各自建立连接。读取只在读事务中查询，不取写锁；
+    命中/未命中计数和条目的最近访问时间先在进程内累积，达到 FLUSH_EVERY 次或距上次写入超过 FLUSH_INTERVAL 秒时，
+    以及写入条目、读取统计时一并写入数据库（统计中其他进程尚未写入的计数不计入）。
+    超过条目数上限时按最近访问时间淘汰，写入时顺带删除过期条目
+    """
+
+    backend = "sqlite"
+    FLUSH_EVERY = 256
+    FLUSH_INTERVAL = 5.0
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+        "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    )
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        max_value_bytes: int = 1024 * 1024,
+        timeout: float = 5.0,
+    ):
+        super().__init__(max_entries, ttl, max_value_bytes)
+        self.path = path or default_cache_path("cache")
+        self.timeout = timeout
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._reset_pending()
+        with self._connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        """当前进程、线程的连接（fork后的子进程重新连接）"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.Error as e:
+                raise CacheBackendError(str(e)) from e
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def _connection(self, write: bool = True):
+        return _SQLiteTransaction(self._connect(), write)
+
+    def _reset_pending(self) -> None:
+        """清空进程内累积的计数与访问时间（调用方持有 _pending_lock，或尚无其他线程）"""
+        self._pending_pid = os.getpid()
+        self._pending_counts: Dict[str, int] = {}
+        self._pending_accessed: Dict[str, float] = {}
+        self._pending_size = 0
+        self._pending_since = time.monotonic()
+
+    def _check_pending_pid(self) -> None:
+        """fork出的子进程丢弃从父进程继承的累积值，避免重复计数（调用方持有 _pending_lock）"""
+        if self._pending_pid != os.getpid():
+            self._reset_pending()
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        """在调用方的写事务中写入进程内累积的计数与访问时间"""
+        with self._pending_lock:
+            self._check_pending_pid()
+            counts, accessed = self._pending_counts, self._pending_accessed
+            self._reset_pending()
+        if counts:
+            conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                counts.items(),
+            )
+        if accessed:
+            conn.executemany(
+                "UPDATE entries SET accessed = MAX(accessed, ?) WHERE key = ?",
+                [(when, key) for key, when in accessed.items()],
+            )
+
+    def _get(self, key):
+        now = time.time()
+        with self._connection(write=False) as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        if row is None:
+            return None  # 过期条目在写入时删除
+        with self._pending_lock:
+            self._check_pending_pid()
+            self._pending_accessed[key] = now
+        return bytes(row[0])
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._connection() as conn:
+            self._flush(conn)  # 淘汰按最近访问时间，先写入累积的访问时间
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (excess,)
+                )
+
+    def _clear(self):
+        with self._pending_lock:
+            self._reset_pending()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
+
+    def _entries(self):
+        with self._connection(write=False) as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries WHERE expires > ?", (time.time(),)).fetchone()[0]
+
+    def _incr(self, name):
+        with self._pending_lock:
+            self._check_pending_pid()
+            self._pending_counts[name] = self._pending_counts.get(name, 0) + 1
+            self._pending_size += 1
+            due = self._pending_size >= self.FLUSH_EVERY or time.monotonic() - self._pending_since >= self.FLUSH_INTERVAL
+        if due:
+            with self._connection() as conn:
+                self._flush(conn)
+
+    def _counters(self):
+        with self._connection() as conn:
+            self._flush(conn)
+            return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+
+class _SQLiteTransaction:
+    """
+    在一个事务中执行，sqlite3.Error 转换为 CacheBackendError
+
+    写事务（BEGIN IMMEDIATE）开始时即取得写锁；读事务（BEGIN DEFERRED）在WAL模式下不取写锁，与其他读写并行
+    """
+
+    def __init__(self, conn: sqlite3.Connection, write: bool = True):
+        self.conn = conn
+        self.write = write
+
+    def __enter__(self) -> sqlite3.Connection:
+        try:
+            self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN DEFERRED")
+        except sqlite3.Error as e:
+            raise CacheBackendError(str(e)) from e
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        except sqlite3.Error as e:
+            raise CacheBackendError(str(e)) from e
+        if isinstance(exc, sqlite3.Error):
+            raise CacheBackendError(str(exc)) from exc
+        return False
+
+
+class RedisCache(ResultCache):
+    """
+    Redis协议缓存：多台主机的worker共享条目与计数
+
+    直接以RESP协议通信（不依赖redis客户端库），兼容任何实现了所用命令的服务。
+    条目以 SET ... PX 设置TTL；另以有序集合记录最近访问时间，超过条目数上限时淘汰最久未访问的条目
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        max_value_bytes: int = 1024 * 1024,
+        prefix: str = "lease-calculator:",
+        timeout: float = 1.0,
+    ):
+        super().__init__(max_entries, ttl, max_value_bytes)
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"不支持的Redis地址: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._index = prefix + "index"
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        """当前进程、线程的连接（fork后的子进程重新连接）"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            local.reader = local.sock.makefile("rb")
+            setup = []
+            if self.password:
+                setup.append(("AUTH", self.password))
+            if self.db:
+                setup.append(("SELECT", self.db))
+            if setup:
+                self._send(local, setup)
+            local.pid = os.getpid()
+        return local
+
+    def _disconnect(self) -> None:
+        local = self._local
+        sock = getattr(local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        local.pid = None
+
+    def _pipeline(self, *commands) -> List:
+        """依次发送多条命令并读取各自的回复（连接断开时重连一次）"""
+        for attempt in (0, 1):
+            try:
+                return self._send(self._connect(), commands)
+            except (OSError, EOFError) as e:
+                self._disconnect()
+                if attempt:
+                    raise CacheBackendError(f"Redis连接失败: {e}") from e
+
+    def _send(self, local, commands) -> List:
+        buffer = bytearray()
+        for command in commands:
+            buffer += b"*%d\r\n" % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode("utf-8")
+                buffer += b"$%d\r\n%s\r\n" % (len(arg), arg)
+        local.sock.sendall(buffer)
+        replies = [self._read_reply(local.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, CacheBackendError):
+                raise reply
+        return replies
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise EOFError("连接已关闭")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            return CacheBackendError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            if len(data) != size + 2:
+                raise EOFError("连接已关闭")
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read_reply(reader) for _ in range(size)]
+        raise CacheBackendError(f"无法解析的Redis回复: {line!r}")
+
+    def _get(self, key):
+        name = self.prefix + key
+        value = self._pipeline(("GET", name))[0]
+        if value is not None:
+            self._pipeline(("ZADD", self._index, repr(time.time()), name))
+        return value
+
+    def _set(self, key, value):
+        name = self.prefix + key
+        now = time.time()
+        _, _, _, count = self._pipeline(
+            ("SET", name, value, "PX", max(int(self.ttl * 1000), 1)),
+            ("ZADD", self._index, repr(now), name),
+            ("ZREMRANGEBYSCORE", self._index, "-inf", repr(now - self.ttl)),
+            ("ZCARD", self._index),
+        )
+        if count > self.max_entries:
+            evicted = self._pipeline(("ZPOPMIN", self._index, count - self.max_entries))[0]
+            names = evicted[::2]
+            if names:
+                self._pipeline(("DEL", *names))
+
+    def _clear(self):
+        names = self._pipeline(("ZRANGE", self._index, 0, -1))[0]
+        self._pipeline(("DEL", self._index, self.prefix + "hits", self.prefix + "misses", *names))
+
+    def _entries(self):
+        self._pipeline(("ZREMRANGEBYSCORE", self._index, "-inf", repr(time.time() - self.ttl)))
+        return self._pipeline(("ZCARD", self._index))[0]
+
+    def _incr(self, name):
+        self._pipeline(("INCR", self.prefix + name))
+
+    def _counters(self):
+        hits, misses = self._pipeline(("MGET", self.prefix + "hits", self.prefix + "misses"))[0]
+        return {"hits": int(hits or 0), "misses": int(misses or 0)}
+
+
+CACHE_BACKENDS = {"memory": LRUCache, "sqlite": SQLiteCache, "redis": RedisCache}
+
+
+def create_cache(
+    backend: Optional[str],
+    url: Optional[str] = None,
+    max_entries: int = 1024,
+    ttl: float = 3600.0,
+    name: str = "cache",
+) -> Optional[ResultCache]:
+    """
+    按名称创建缓存后端
+
+    Args:
+        backend: memory/sqlite/redis，为空或 none 时不启用缓存
+        url: sqlite为数据库文件路径，redis为 redis://host:port/db 地址（均有默认值）
+        max_entries: 条目数上限
+        ttl: 过期时间（秒）
+        name: 存储名称，区分同一进程中的多个缓存（SQLite默认文件名、Redis键前缀），使各自的淘汰与计数互不影响
+
+    Returns:
+        Optional[ResultCache]: 缓存实例，不启用时为None
+    """
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"不支持的缓存后端: {backend}")
+    if backend == "memory":
+        return LRUCache(max_entries, ttl)
+    if backend == "sqlite":
+        return SQLiteCache(url or default_cache_path(name), max_entries, ttl)
+    return RedisCache(url or "redis://localhost:6379/0", max_entries, ttl, prefix=f"lease-calculator:{name}:")
@@ -0,0 +1,185 @@
+"""
+列式还款计划
+以结构数组（每列一个连续NumPy数组）保存还款计划，按需提供行视图，
+仅在JSON边界转换为原有的逐期字典列表
+"""
+
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+# 列顺序与原逐期字典的键顺序一致，浮动利率法在剩余本金之前多一列当期利率
+BASE_COLUMNS = ("period", "payment", "principal", "interest", "remaining_balance")
+RATE_COLUMNS = ("period", "payment", "principal", "interest", "rate", "remaining_balance")
+
+
+class ScheduleRow(Mapping):
+    """还款计划的单行视图，读写均直接作用于所属计划的列数组"""
+
+    __slots__ = ("_schedule", "_index")
+
+    def __init__(self, schedule: "Schedule", index: int):
+        self._schedule = schedule
+        self._index = index
+
+    def __getitem__(self, key: str):
+        return self._schedule.column(key)[self._index].item()
+
+    def __setitem__(self, key: str, value) -> None:
+        self._schedule.column(key)[self._index] = value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._schedule.columns)
+
+    def __len__(self) -> int:
+        return len(self._schedule.columns)
+
+    def __repr__(self) -> str:
+        return f"ScheduleRow({dict(self)!r})"
+
+
+class Schedule:
+    """
+    列式还款计划
+
+    每列保存为一个连续数组：period为int64，金额及利率列为float64。
+    按字符串取值返回列数组本身（零拷贝），按整数取值返回惰性行视图，
+    按切片取值返回共享底层数组的子计划
+    """
+
+    __slots__ = ("_data", "columns")
+
+    def __init__(
+        self,
+        period: Iterable,
+        payment: Iterable,
+        principal: Iterable,
+        interest: Iterable,
+        remaining_balance: Iterable,
+        rate: Optional[Iterable] = None,
+    ):
+        data = {
+            "period": np.asarray(period, dtype=np.int64),
+            "payment": np.asarray(payment, dtype=np.float64),
+            "principal": np.asarray(principal, dtype=np.float64),
+            "interest": np.asarray(interest, dtype=np.float64),
+            "remaining_balance": np.asarray(remaining_balance, dtype=np.float64),
+        }
+        if rate is not None:
+            data["rate"] = np.asarray(rate, dtype=np.float64)
+
+        length = len(data["period"])
+        for name, values in data.items():
+            if values.ndim != 1 or len(values) != length:
+                raise ValueError(f"还款计划列长度不一致: {name}")
+
+        self._data = data
+        self.columns = RATE_COLUMNS if rate is not None else BASE_COLUMNS
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "Schedule":
+        """由逐期字典列表构造（用于客户端回传的计划）"""
+        if isinstance(records, Schedule):
+            return records
+        records = list(records)
+        has_rate = any("rate" in item for item in records)
+        return cls(
+            period=[item.get("period", 0) for item in records],
+            payment=[item.get("payment", 0) for item in records],
+            principal=[item.get("principal", 0) for item in records],
+            interest=[item.get("interest", 0) for item in records],
+            remaining_balance=[item.get("remaining_balance", 0) for item in records],
+            rate=[item.get("rate", 0) for item in records] if has_rate else None,
+        )
+
+    @property
+    def has_rate(self) -> bool:
+        return "rate" in self._data
+
+    def column(self, name: str) -> np.ndarray:
+        """返回列数组本身（零拷贝）"""
+        try:
+            return self._data[name]
+        except KeyError:
+            raise KeyError(f"还款计划不包含列: {name}") from None
+
+    @property
+    def period(self) -> np.ndarray:
+        return self._data["period"]
+
+    @property
+    def payment(self) -> np.ndarray:
+        return self._data["payment"]
+
+    @property
+    def principal(self) -> np.ndarray:
+        return self._data["principal"]
+
+    @property
+    def interest(self) -> np.ndarray:
+        return self._data["interest"]
+
+    @property
+    def remaining_balance(self) -> np.ndarray:
+        return self._data["remaining_balance"]
+
+    @property
+    def rate(self) -> Optional[np.ndarray]:
+        return self._data.get("rate")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self._data.values())
+
+    def __len__(self) -> int:
+        return len(self._data["period"])
+
+    def __iter__(self) -> Iterator[ScheduleRow]:
+        for index in range(len(self)):
+            yield ScheduleRow(self, index)
+
+    def __getitem__(self, key: Union[int, slice, str]):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, slice):
+            return self._take(key)
+        index = int(key)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("还款计划行号越界")
+        return ScheduleRow(self, index)
+
+    def _take(self, key: slice) -> "Schedule":
+        """按切片取子计划，基础切片共享底层数组"""
+        sub = Schedule.__new__(Schedule)
+        sub._data = {name: values[key] for name, values in self._data.items()}
+        sub.columns = self.columns
+        return sub
+
+    def copy(self) -> "Schedule":
+        """复制全部列数组"""
+        sub = Schedule.__new__(Schedule)
+        sub._data = {name: values.copy() for name, values in self._data.items()}
+        sub.columns = self.columns
+        return sub
+
+    def to_dicts(self) -> List[Dict]:
+        """转换为原有的逐期字典列表（仅在JSON序列化边界调用）"""
+        columns = [self._data[name].tolist() for name in self.columns]
+        return [dict(zip(self.columns, values)) for values in zip(*columns)]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Schedule):
+            return self.columns == other.columns and all(
+                np.array_equal(self._data[name], other._data[name]) for name in self.columns
+            )
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Schedule(periods={len(self)}, columns={self.columns})"
@@ -0,0 +1,481 @@
+"""
+向量化还款计划引擎
+以整数分为单位，使用NumPy数组计算利息、本金、剩余本金各列，
+逐期舍入规则与Decimal参考实现（LeaseCalculator中的逐期循环）完全一致
+"""
+
+import bisect
+import functools
+import inspect
+import math
+from decimal import ROUND_HALF_EVEN, Context, Decimal, localcontext
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+CENT = Decimal("0.01")
+
+# 金额计算使用的显式Decimal上下文（15位有效数字、四舍六入五成双，与原全局设置一致）。
+# 各入口通过 money_context 在线程局部的 localcontext 中执行，不读取也不修改进程全局上下文
+MONEY_CONTEXT = Context(prec=15, rounding=ROUND_HALF_EVEN)
+
+# 浮点乘积距离0.5分舍入边界的相对安全距离；落在该范围内的值回退到Decimal精确计算
+_TIE_GUARD = 1e-12
+
+# 整数分快速路径可覆盖的金额上限（元），超出后Decimal 15位有效数字会产生额外舍入
+MAX_EXACT_AMOUNT = Decimal("1e11")
+_MAX_EXACT_CENTS = 10**13
+
+
+def money_context(func):
+    """
+    装饰器：在 MONEY_CONTEXT 中执行函数，结果与调用方当前的Decimal上下文无关
+
+    用于生成器函数时，生成器每次恢复执行都进入 MONEY_CONTEXT，产出后恢复调用方的上下文
+    """
+    if inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            items = func(*args, **kwargs)
+            try:
+                while True:
+                    with localcontext(MONEY_CONTEXT):
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                items.close()
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with localcontext(MONEY_CONTEXT):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def to_decimal(value: Union[int, float, str, Decimal]) -> Decimal:
+    """金额、利率转换为Decimal：整数与Decimal直接构造，浮点按最短十进制表示（同 Decimal(str(x))）"""
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return Decimal(value)
+    return Decimal(str(value))
+
+
+def to_cents(value: Decimal) -> int:
+    """将已精确到分的Decimal金额转换为整数分"""
+    return int(value.scaleb(2))
+
+
+def is_cent_exact(value: Decimal) -> bool:
+    """判断金额是否恰好为整数分"""
+    return value == value.quantize(CENT)
+
+
+@money_context
+def annuity_payment(pv: Decimal, period_rate: Decimal, periods: int) -> Decimal:
+    """
+    等额年金每期租金（Decimal参考公式，已精确到分）
+
+    PMT = PV * [i * (1+i)^n] / [(1+i)^n - 1]，零利率时为 PV / n
+    """
+    n = Decimal(periods)
+    if period_rate == 0:
+        pmt = pv / n
+    else:
+        factor = (1 + period_rate) ** n
+        pmt = pv * (period_rate * factor) / (factor - 1)
+    return pmt.quantize(CENT)
+
+
+def round_interest_cents(balance_cents: int, period_rate: Decimal, rate_float: float) -> int:
+    """
+    计算 round(剩余本金 × 期利率) 并返回整数分
+
+    先用浮点乘积确定舍入方向，仅当乘积贴近半分边界时才回退到Decimal，
+    结果与 (balance * period_rate).quantize(CENT) 完全相同
+
+    Args:
+        balance_cents: 剩余本金（分）
+        period_rate: 期利率（Decimal参考值）
+        rate_float: 期利率的浮点值
+
+    Returns:
+        int: 当期利息（分）
+    """
+    x = balance_cents * rate_float
+    base = math.floor(x)
+    frac = x - base
+    if abs(frac - 0.5) > _TIE_GUARD * max(1.0, abs(x)):
+        return base + 1 if frac > 0.5 else base
+    # 贴近舍入边界，使用Decimal精确计算
+    with localcontext(MONEY_CONTEXT):
+        return to_cents((Decimal(balance_cents).scaleb(-2) * period_rate).quantize(CENT))
+
+
+@money_context
+def annuity_schedule_cents(pv: Decimal, period_rate: Decimal, pmt: Decimal, periods: int) -> Dict[str, np.ndarray]:
+    """
+    等额年金法还款计划（整数分）
+
+    Args:
+        pv: 租赁本金
+        period_rate: 期利率
+        pmt: 已精确到分的每期租金
+        periods: 总期数
+
+    Returns:
+        Dict: interest、principal、remaining_balance 三列（int64，单位分）
+
+    Raises:
+        OverflowError: 余额超出整数分快速路径的精确范围
+    """
+    return next(iter_annuity_schedule_cents(pv, period_rate, pmt, periods, max(periods, 1)))
+
+
+@money_context
+def iter_annuity_schedule_cents(
+    pv: Decimal, period_rate: Decimal, pmt: Decimal, periods: int, chunk_size: int, start: int = 0
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    等额年金法还款计划的分块生成器：按期递推，每次产出至多 chunk_size 期的
+    interest、principal、remaining_balance 三列（int64，单位分），可随时停止迭代
+
+    舍入后的余额没有闭式解（逐期舍入误差会累积），start > 0 时前 start 期只递推余额、不产出，
+    从第 start + 1 期起分块
+
+    Raises:
+        OverflowError: 余额超出整数分快速路径的精确范围
+    """
+    pmt_cents = to_cents(pmt)
+    rate_float = float(period_rate)
+    first = None
+    done = 0
+
+    if not is_cent_exact(pv):
+        # 本金含分以下尾数时首期按Decimal计算，之后余额已精确到分
+        first_interest = (pv * period_rate).quantize(CENT)
+        first_principal = (pmt - first_interest).quantize(CENT)
+        remaining = (pv - first_principal).quantize(CENT)
+        first = (to_cents(first_interest), to_cents(first_principal), to_cents(remaining))
+        bal = first[2]
+        done = 1
+    else:
+        bal = to_cents(pv)
+
+    # 跳过的各期只递推余额（利息舍入同 round_interest_cents，内联以减少逐期函数调用）
+    for _ in range(done, min(start, periods)):
+        x = bal * rate_float
+        base = math.floor(x)
+        frac = x - base
+        if abs(frac - 0.5) > _TIE_GUARD * max(1.0, abs(x)):
+            i_cents = base + 1 if frac > 0.5 else base
+        else:
+            i_cents = round_interest_cents(bal, period_rate, rate_float)
+        bal -= pmt_cents - i_cents
+        if abs(bal) >= _MAX_EXACT_CENTS:
+            raise OverflowError("剩余本金超出整数分引擎的精确范围")
+
+    for chunk_start in range(start, periods, chunk_size):
+        stop = min(chunk_start + chunk_size, periods)
+        interest = np.empty(stop - chunk_start, dtype=np.int64)
+        principal = np.empty(stop - chunk_start, dtype=np.int64)
+        balance = np.empty(stop - chunk_start, dtype=np.int64)
+
+        begin = chunk_start
+        if chunk_start == 0 and first is not None:
+            interest[0], principal[0], balance[0] = first
+            begin = 1
+
+        # 逐期余额依赖上一期舍入后的利息，按期递推；各列直接写入预分配数组
+        for k in range(begin, stop):
+            i_cents = round_interest_cents(bal, period_rate, rate_float)
+            p_cents = pmt_cents - i_cents
+            bal -= p_cents
+            if abs(bal) >= _MAX_EXACT_CENTS:
+                raise OverflowError("剩余本金超出整数分引擎的精确范围")
+            interest[k - chunk_start] = i_cents
+            principal[k - chunk_start] = p_cents
+            balance[k - chunk_start] = bal
+
+        # 最后一期处理剩余余额精度问题
+        if stop == periods:
+            balance[-1] = 0
+
+        yield {"interest": interest, "principal": principal, "remaining_balance": balance}
+
+
+def round_interest_cents_array(
+    balance_cents: np.ndarray,
+    period_rate: Union[Decimal, np.ndarray],
+    rate_float: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    round_interest_cents 的数组版本：逐元素计算 round(剩余本金 × 期利率)
+
+    Args:
+        balance_cents: 各期剩余本金（分，int64）
+        period_rate: 期利率（Decimal参考值），或与余额逐元素对应的Decimal对象数组
+        rate_float: 期利率的浮点值（标量或数组），默认由period_rate换算
+
+    Returns:
+        np.ndarray: 各期利息（分，int64）
+    """
+    if rate_float is None:
+        rate_float = float(period_rate)
+    rate_float = np.broadcast_to(rate_float, np.shape(balance_cents))
+    x = balance_cents * rate_float
+    base = np.floor(x)
+    frac = x - base
+    result = (base + (frac > 0.5)).astype(np.int64)
+
+    # 贴近舍入边界的少数元素逐个回退到Decimal
+    near_tie = np.abs(frac - 0.5) <= _TIE_GUARD * np.maximum(1.0, np.abs(x))
+    for k in zip(*np.nonzero(near_tie)):
+        rate_k = period_rate if isinstance(period_rate, Decimal) else period_rate[k]
+        result[k] = round_interest_cents(int(balance_cents[k]), rate_k, float(rate_float[k]))
+    return result
+
+
+@money_context
+def annuity_total_interest_cents(pv: Decimal, period_rate: Decimal, pmt: Decimal, periods: int) -> int:
+    """
+    等额年金法总利息（整数分），与 annuity_schedule_cents 的利息列之和相同，但不分配逐期数组
+
+    Args:
+        pv: 租赁本金
+        period_rate: 期利率
+        pmt: 已精确到分的每期租金
+        periods: 总期数
+
+    Returns:
+        int: 总利息（分）
+
+    Raises:
+        OverflowError: 余额超出整数分快速路径的精确范围
+    """
+    pmt_cents = to_cents(pmt)
+    rate_float = float(period_rate)
+    total = 0
+    start = 0
+
+    if not is_cent_exact(pv):
+        first_interest = (pv * period_rate).quantize(CENT)
+        first_principal = (pmt - first_interest).quantize(CENT)
+        bal = to_cents((pv - first_principal).quantize(CENT))
+        total = to_cents(first_interest)
+        start = 1
+    else:
+        bal = to_cents(pv)
+
+    for _ in range(start, periods):
+        i_cents = round_interest_cents(bal, period_rate, rate_float)
+        bal -= pmt_cents - i_cents
+        if abs(bal) >= _MAX_EXACT_CENTS:
+            raise OverflowError("剩余本金超出整数分引擎的精确范围")
+        total += i_cents
+
+    return total
+
+
+# 租金系数的相对误差容限：Decimal参考实现中 (1+i)^m - 1 的抵消误差随 F/(F-1) 放大
+_PMT_FACTOR_GUARD = 1e-11
+# 浮动利率法每次向量化求租金系数的最大期数（利率不变的长区段分块求，惰性迭代时不预先求整个计划）
+_FACTOR_BLOCK = 4096
+
+
+def _payment_factors(rate_float: float, remaining: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    剩余期数为m时的租金系数 i(1+i)^m / ((1+i)^m - 1) 及对应的舍入安全距离（逐元素）
+
+    利率为0或不小于100%期利率等无法用浮点公式求值的情形返回nan，调用方据此回退到Decimal
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if rate_float <= -1:
+            nan = np.full(len(remaining), np.nan)
+            return nan, nan
+        # 1 - (1+i)^-m
+        denominator = -np.expm1(-remaining * math.log1p(rate_float))
+        factors = rate_float / denominator
+        guards = _PMT_FACTOR_GUARD / np.abs(denominator)
+    return factors, guards
+
+
+@money_context
+def _decimal_payment(balance: Decimal, period_rate: Decimal, remaining: int) -> Decimal:
+    """按剩余本金、期利率、剩余期数计算等额租金（Decimal参考公式，已精确到分）"""
+    factor = (1 + period_rate) ** remaining
+    return (balance * (period_rate * factor) / (factor - 1)).quantize(CENT)
+
+
+@money_context
+def floating_schedule_cents(
+    pv: Decimal,
+    initial_rate: Decimal,
+    periods: int,
+    rate_changes: Dict[int, Decimal],
+    frequency: int,
+) -> Dict[str, np.ndarray]:
+    """
+    浮动利率法还款计划（整数分）
+
+    每期仍按剩余本金重算租金（与Decimal参考实现一致，舍入后的余额会使租金在重置之间出现分位变动），
+    但各剩余期数的租金系数只在利率重置时按段向量化求一次，不再逐期做Decimal幂运算；
+    仅浮点结果贴近半分边界时回退到Decimal公式
+
+    Args:
+        pv: 租赁本金
+        initial_rate: 初始年利率
+        periods: 总期数
+        rate_changes: 利率重置 {期数: 新年利率}
+        frequency: 年付次数
+
+    Returns:
+        Dict: payment、principal、interest、remaining_balance（int64，单位分）及 rate（float64）五列，
+        长度为实际期数（余额提前还清时短于periods）
+
+    Raises:
+        OverflowError: 余额或租金超出整数分快速路径的精确范围
+    """
+    chunks = list(iter_floating_schedule_cents(pv, initial_rate, periods, rate_changes, frequency, max(int(periods), 1)))
+    if not chunks:
+        return {name: np.array([], dtype=np.float64 if name == "rate" else np.int64) for name in _FLOATING_COLUMNS}
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in _FLOATING_COLUMNS}
+
+
+@money_context
+def iter_floating_schedule_cents(
+    pv: Decimal,
+    initial_rate: Decimal,
+    periods: int,
+    rate_changes: Dict[int, Decimal],
+    frequency: int,
+    chunk_size: int,
+    start: int = 0,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    浮动利率法还款计划的分块生成器：每次产出至多 chunk_size 期的五列（格式同 floating_schedule_cents），
+    余额提前还清时最后一块短于 chunk_size；可随时停止迭代。前 start 期只递推、不产出。
+    租金系数只对当前利率区段（至下一次重置，至多 _FACTOR_BLOCK 期）求值，
+    各期的系数只求一次，逐期重置的利率曲线总耗时仍与期数成正比
+
+    Raises:
+        OverflowError: 余额或租金超出整数分快速路径的精确范围
+    """
+    periods = max(int(periods), 0)
+    payment, principal, interest, balance, rates = [], [], [], [], []
+
+    frequency_decimal = to_decimal(frequency)
+    current_rate = initial_rate
+    period_rate = current_rate / frequency_decimal
+    rate_float = float(period_rate)
+    rate_value = float(current_rate)
+    change_periods = sorted(rate_changes)
+    # 已求租金系数的期数区间 [factor_start, factor_end)
+    factor_start = factor_end = 1
+    factors = guards = []
+
+    bal = 0
+    for period in range(1, periods + 1):
+        if (pv if period == 1 else bal) <= 0:
+            break
+
+        # 利率重置：更新期利率，租金系数从本期起按新利率重新求
+        if period in rate_changes:
+            current_rate = rate_changes[period]
+            period_rate = current_rate / frequency_decimal
+            rate_float = float(period_rate)
+            rate_value = float(current_rate)
+            factor_end = period
+
+        remaining_periods = periods - period + 1
+
+        if period >= factor_end:
+            # 求本期至下一次重置（至多 _FACTOR_BLOCK 期）各期的租金系数
+            next_change = bisect.bisect_right(change_periods, period)
+            end = change_periods[next_change] if next_change < len(change_periods) else periods + 1
+            factor_start, factor_end = period, min(end, period + _FACTOR_BLOCK, periods + 1)
+            remaining = np.arange(remaining_periods, periods - factor_end + 1, -1.0)
+            factors, guards = (values.tolist() for values in _payment_factors(rate_float, remaining))
+
+        if period == 1 and not is_cent_exact(pv):
+            # 本金含分以下尾数时首期按Decimal计算，之后余额已精确到分
+            # （单期租赁时末期租金即为未舍入的本金，由调用方交给Decimal参考实现）
+            pmt = _decimal_payment(pv, period_rate, remaining_periods)
+            first_interest = (pv * period_rate).quantize(CENT)
+            first_principal = (pmt - first_interest).quantize(CENT)
+            pmt_c, i_cents, p_cents = to_cents(pmt), to_cents(first_interest), to_cents(first_principal)
+            bal = to_cents((pv - first_principal).quantize(CENT))
+        else:
+            if period == 1:
+                bal = to_cents(pv)
+
+            if remaining_periods == 1:
+                pmt_c, i_cents, p_cents = bal, 0, bal
+            else:
+                k = period - factor_start
+                x = bal * factors[k]
+                if math.isfinite(x):
+                    base = math.floor(x)
+                    frac = x - base
+                else:
+                    frac = math.nan
+                if abs(frac - 0.5) > guards[k] * max(1.0, abs(x)):
+                    pmt_c = base + 1 if frac > 0.5 else base
+                else:
+                    # 贴近舍入边界或无法用浮点求值，使用Decimal公式（含原实现在零利率时的异常）
+                    pmt_c = to_cents(_decimal_payment(Decimal(bal).scaleb(-2), period_rate, remaining_periods))
+
+                # 利息舍入同 round_interest_cents（内联以减少逐期函数调用）
+                y = bal * rate_float
+                base = math.floor(y)
+                frac = y - base
+                if abs(frac - 0.5) > _TIE_GUARD * max(1.0, abs(y)):
+                    i_cents = base + 1 if frac > 0.5 else base
+                else:
+                    i_cents = round_interest_cents(bal, period_rate, rate_float)
+                p_cents = pmt_c - i_cents
+            bal -= p_cents
+
+        if abs(bal) >= _MAX_EXACT_CENTS or abs(pmt_c) >= _MAX_EXACT_CENTS:
+            raise OverflowError("剩余本金超出整数分引擎的精确范围")
+        if period <= start:
+            continue
+
+        payment.append(pmt_c)
+        principal.append(p_cents)
+        interest.append(i_cents)
+        balance.append(bal)
+        rates.append(rate_value)
+
+        if len(payment) == chunk_size:
+            yield _floating_chunk(payment, principal, interest, rates, balance)
+            payment, principal, interest, balance, rates = [], [], [], [], []
+
+    if payment:
+        yield _floating_chunk(payment, principal, interest, rates, balance)
+
+
+_FLOATING_COLUMNS = ("payment", "principal", "interest", "rate", "remaining_balance")
+
+
+def _floating_chunk(payment: list, principal: list, interest: list, rates: list, balance: list) -> Dict[str, np.ndarray]:
+    """逐期结果列表转换为浮动利率法的一块列数组"""
+    return {
+        "payment": np.array(payment, dtype=np.int64),
+        "principal": np.array(principal, dtype=np.int64),
+        "interest": np.array(interest, dtype=np.int64),
+        "rate": np.array(rates, dtype=np.float64),
+        "remaining_balance": np.array(balance, dtype=np.int64),
+    }
+
+
+def cents_to_float(cents: np.ndarray) -> np.ndarray:
+    """整数分转换为元（float64），与 float(Decimal) 结果逐位一致"""
+    return cents / 100.0
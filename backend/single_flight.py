@@ -0,0 +1,246 @@
+"""
+重复请求合并（single-flight）
+键相同的并发计算只执行一次，等待的请求共享其结果或异常。
+同一进程内的线程通过进程内登记表合并；各worker进程之间通过锁文件上按键哈希划分的字节区间记录锁（fcntl.lockf）
+互斥，其他进程等待期间留下标记，执行计算的进程据此把结果写入锁目录供其读取
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 无 fcntl，只在进程内合并
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """进行中的一次计算"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    重复请求合并
+
+    lock_dir 为None时只合并同一进程内的线程；否则各进程通过该目录下的锁文件和结果文件合并。
+    跨进程共享的结果及异常须可pickle（不可pickle时等待的进程自行计算）
+    """
+
+    LOCK_SLOTS = 1 << 20  # 锁文件的字节区间数；不同键落在同一区间的概率可忽略，落在同一区间时只是不合并
+    RESULT_TTL = 60.0  # 结果文件的保留时间（秒），之后由下一次写入结果时清理
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        """
+        Args:
+            lock_dir: 跨进程合并使用的目录（须为当前用户所有且不允许其他用户写入）
+        """
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executed = 0
+        self._thread_shared = 0
+        self._process_shared = 0
+
+        self.lock_dir = None
+        if lock_dir is not None and fcntl is not None:
+            prepare_private_dir(lock_dir)
+            self.lock_dir = lock_dir
+        self._fd = None
+        self._fd_pid = None
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        执行 func；已有键相同的计算进行中时等待并共享其结果
+
+        Args:
+            key: 规范化的请求键
+            func: 无参数的计算函数
+
+        Returns:
+            计算结果；计算抛出异常时在全部等待的请求中抛出同一异常
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._thread_shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._run_exclusive(key, func)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def stats(self) -> Dict:
+        """本进程执行的计算次数，以及共享同进程、其他进程结果的请求数"""
+        with self._lock:
+            return {
+                "scope": "process" if self.lock_dir else "thread",
+                "executed": self._executed,
+                "thread_shared": self._thread_shared,
+                "process_shared": self._process_shared,
+                "in_flight": len(self._calls),
+            }
+
+    def _execute(self, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._executed += 1
+        return func()
+
+    def _run_exclusive(self, key: str, func: Callable[[], Any]) -> Any:
+        """跨进程互斥地执行计算：区间锁被其他进程持有时等待，并读取其写出的结果"""
+        if self.lock_dir is None:
+            return self._execute(func)
+
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        offset = int(digest[:12], 16) % self.LOCK_SLOTS
+        try:
+            fd = self._lock_fd()
+        except OSError as e:
+            logger.warning("single-flight锁文件不可用，直接计算: %s", e)
+            return self._execute(func)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+        except OSError as e:
+            if e.errno not in (errno.EACCES, errno.EAGAIN):
+                logger.warning("single-flight加锁失败，直接计算: %s", e)
+                return self._execute(func)
+            return self._wait_other_process(fd, digest, offset, func)
+
+        try:
+            return self._execute_and_publish(digest, func)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+
+    def _wait_other_process(self, fd: int, digest: str, offset: int, func: Callable[[], Any]) -> Any:
+        """其他进程正在计算：留下等待标记后阻塞加锁，取得锁后读取其结果，没有可用结果时自行计算"""
+        started = time.time()
+        marker = os.path.join(self.lock_dir, digest + ".wait")
+        try:
+            os.close(os.open(marker, os.O_WRONLY | os.O_CREAT, 0o600))
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+        except OSError as e:  # 含死锁检测误报（EDEADLK）
+            logger.warning("single-flight等待其他进程失败，直接计算: %s", e)
+            return self._execute(func)
+
+        try:
+            shared = self._read_result(digest, started)
+            if shared is None:
+                return self._execute_and_publish(digest, func)
+            with self._lock:
+                self._process_shared += 1
+            outcome, value = shared
+            if outcome == "error":
+                raise value
+            return value
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+
+    def _execute_and_publish(self, digest: str, func: Callable[[], Any]) -> Any:
+        """持有区间锁时计算；有其他进程等待时把结果（或异常）写入结果文件"""
+        try:
+            value = self._execute(func)
+        except Exception as e:
+            self._publish(digest, ("error", e))
+            raise
+        self._publish(digest, ("value", value))
+        return value
+
+    def _publish(self, digest: str, outcome) -> None:
+        marker = os.path.join(self.lock_dir, digest + ".wait")
+        if not os.path.exists(marker):
+            return
+        try:
+            payload = pickle.dumps((time.time(), outcome), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning("single-flight结果无法序列化，等待的进程将自行计算: %s", e)
+            return
+        path = os.path.join(self.lock_dir, digest + ".result")
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(temp, "wb") as f:
+                f.write(payload)
+            os.replace(temp, path)
+            os.unlink(marker)
+        except OSError as e:
+            logger.warning("single-flight结果写入失败: %s", e)
+        self._sweep()
+
+    def _read_result(self, digest: str, started: float):
+        """读取开始等待之后写出的结果，没有时返回None"""
+        try:
+            with open(os.path.join(self.lock_dir, digest + ".result"), "rb") as f:
+                written, outcome = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return outcome if written >= started else None
+
+    def _sweep(self) -> None:
+        """清理超过保留时间的结果文件"""
+        expires = time.time() - self.RESULT_TTL
+        try:
+            with os.scandir(self.lock_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".result") and entry.stat().st_mtime < expires:
+                        os.unlink(entry.path)
+        except OSError:
+            pass
+
+    def _lock_fd(self) -> int:
+        """本进程的锁文件描述符；fork出的子进程重新打开（记录锁不随fork继承）"""
+        with self._lock:
+            if self._fd is None or self._fd_pid != os.getpid():
+                self._fd = os.open(os.path.join(self.lock_dir, "single-flight.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+                self._fd_pid = os.getpid()
+            return self._fd
+
+
+def prepare_private_dir(path: str) -> None:
+    """
+    创建目录并确认其为当前用户所有、其他用户不可写
+
+    用于系统临时目录下的锁目录、缓存目录：其中的文件会被读取（锁目录中的结果文件以pickle读取），
+    不能是其他用户预先创建或可以替换的
+
+    Raises:
+        ValueError: 目录不是当前用户所有，或其他用户可写
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise ValueError(f"目录须为当前用户所有且其他用户不可写: {path}")
+
+
+def default_lock_dir() -> str:
+    """默认锁目录：系统临时目录下按用户区分"""
+    user = os.getuid() if hasattr(os, "getuid") else "shared"
+    return os.path.join(tempfile.gettempdir(), f"lease-calculator-single-flight-{user}")
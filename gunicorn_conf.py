@@ -34,4 +34,35 @@ loglevel = 'info'
 # 自定义设置项请写到该处
 # 最好以上面相同的格式 <注释 + 换行 + key = value> 进行书写， 
 # PS: gunicorn 的配置文件是python扩展形式，即".py"文件，需要注意遵从python语法，
-# 如：loglevel的等级是字符串作为配置的，需要用引号包裹起来
\ No newline at end of file
+# 如：loglevel的等级是字符串作为配置的，需要用引号包裹起来
+
+import gc
+import os
+import sys
+
+# 预加载模式：LEASE_PRELOAD=1 时master进程加载应用并预热（导入全部依赖，执行示例计算、导出和图表生成），
+# fork前冻结GC堆，各worker以写时复制共享这部分内存；由 scripts/measure_worker_memory.py 查看各worker的共享与私有内存
+preload_app = os.environ.get('LEASE_PRELOAD') == '1'
+
+if preload_app:
+    # 加载应用期间不做GC，避免回收在堆页中留下空洞（fork后写入空洞会复制整页）
+    gc.disable()
+
+
+def when_ready(server):
+    """master就绪、fork worker之前：预热应用"""
+    if preload_app:
+        wsgi = server.app.wsgi()
+        sys.modules[wsgi.import_name].preload(wsgi)
+
+
+def pre_fork(server, worker):
+    """fork worker前冻结GC堆：已有对象移入永久代，worker的GC不再改写其所在页面"""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """worker中恢复GC"""
+    if preload_app:
+        gc.enable()
@@ -0,0 +1,84 @@
+"""
+worker启动基准
+在全新的解释器中导入 backend/app.py（即gunicorn worker加载应用的过程），输出导入耗时、常驻内存峰值和已加载模块数；
+导出、图表接口专用的重量级依赖出现在导入路径上，或耗时、内存超出预算时以非零状态退出
+
+用法:
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --max-seconds 1.0 --max-rss-mb 100
+    python scripts/benchmark_startup.py --warmup  # 测量 LEASE_WARMUP=1 时的启动开销（不检查重量级依赖）
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# 应用导入时不得加载的模块（按顶层包名匹配）
+HEAVY_MODULES = ("pandas", "openpyxl", "matplotlib", "seaborn", "plotly", "PIL", "scipy", "pyarrow")
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    "modules": len(sys.modules),
+    "heavy": sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r})),
+}}))
+"""
+
+
+def measure_startup(warmup: bool = False) -> dict:
+    """在子进程中导入应用一次，返回导入耗时、常驻内存峰值、模块数和已加载的重量级依赖"""
+    env = dict(os.environ)
+    env.pop("LEASE_WARMUP", None)
+    if warmup:
+        env["LEASE_WARMUP"] = "1"
+    probe = PROBE.format(backend=os.path.abspath(BACKEND_DIR), heavy=HEAVY_MODULES)
+    with tempfile.TemporaryDirectory() as cwd:  # 应用在工作目录下创建日志目录
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=cwd, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="测量次数，取中位数")
+    parser.add_argument("--max-seconds", type=float, default=None, help="导入耗时中位数上限（秒）")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="常驻内存峰值中位数上限（MB）")
+    parser.add_argument("--warmup", action="store_true", help="以 LEASE_WARMUP=1 启动")
+    args = parser.parse_args(argv)
+
+    samples = [measure_startup(args.warmup) for _ in range(args.runs)]
+    seconds = statistics.median(sample["seconds"] for sample in samples)
+    rss_mb = statistics.median(sample["rss_mb"] for sample in samples)
+    heavy = sorted({name for sample in samples for name in sample["heavy"]})
+    print(f"导入耗时 {seconds * 1000:.0f} ms  常驻内存峰值 {rss_mb:.1f} MB  模块数 {samples[-1]['modules']}")
+    if heavy:
+        print(f"已加载的重量级依赖: {', '.join(heavy)}")
+
+    failures = []
+    if heavy and not args.warmup:
+        failures.append(f"重量级依赖出现在应用导入路径上: {', '.join(heavy)}")
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        failures.append(f"导入耗时 {seconds:.2f}s 超出预算 {args.max_seconds}s")
+    if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+        failures.append(f"常驻内存峰值 {rss_mb:.1f}MB 超出预算 {args.max_rss_mb}MB")
+    for failure in failures:
+        print(f"失败: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+worker内存测量
+输出各worker进程的常驻内存（RSS）、按比例分摊的内存（PSS）、与其他进程共享的内存和私有内存（USS）。
+私有内存是每增加一个worker实际增加的内存
+
+用法:
+    python scripts/measure_worker_memory.py --pid <gunicorn master pid>   # 测量运行中的gunicorn各worker
+    python scripts/measure_worker_memory.py --workers 4                  # 模拟gunicorn分别以普通模式和预加载模式fork worker并对比
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import psutil
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# 模拟worker处理的请求：各计算方法、导出和图表接口各一次
+SAMPLE = {"pv": 1000000, "annual_rate": 0.08, "periods": 36}
+METHODS = ("equal_annuity", "equal_principal", "flat_rate", "floating_rate")
+
+
+def worker_memory(pid: int) -> dict:
+    """进程的内存分布（MB）"""
+    info = psutil.Process(pid).memory_full_info()
+    mb = 1024 * 1024
+    return {
+        "pid": pid,
+        "rss": info.rss / mb,
+        "pss": info.pss / mb,
+        "shared": (info.rss - info.uss) / mb,
+        "private": info.uss / mb,
+    }
+
+
+def serve_requests() -> None:
+    """以测试客户端走一遍计算、导出和图表接口，使worker处于处理过请求后的状态"""
+    import app as app_module
+
+    with app_module.app.test_client() as client:
+        for method in METHODS:
+            result = client.post("/api/calculate", json=dict(SAMPLE, method=method)).get_json()["data"]
+        for url in ("/api/export/excel", "/api/charts/payment_structure", "/api/charts/cash_flow"):
+            client.post(url, json=result)
+
+
+def simulate(workers: int, preload: bool) -> list:
+    """
+    按gunicorn的方式fork worker：预加载模式下master加载应用并预热、冻结GC堆后fork，
+    普通模式下各worker在fork后自行加载应用。worker处理请求后测量其内存
+
+    Returns:
+        各worker的内存分布
+    """
+    sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+    if preload:
+        gc.disable()
+        import app as app_module
+
+        app_module.preload()
+
+    children = []
+    for _ in range(workers):
+        ready_read, ready_write = os.pipe()
+        release_read, release_write = os.pipe()
+        if preload:
+            gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            if preload:
+                gc.enable()
+            serve_requests()
+            gc.collect()
+            os.write(ready_write, b"1")
+            os.read(release_read, 1)  # 保持存活直到测量结束
+            os._exit(0)
+        children.append((pid, ready_read, release_write))
+
+    for _, ready_read, _ in children:
+        os.read(ready_read, 1)
+    # 全部worker就绪后测量：PSS按共享页面的进程数分摊
+    samples = [worker_memory(pid) for pid, _, _ in children]
+    for pid, _, release_write in children:
+        os.write(release_write, b"1")
+        os.waitpid(pid, 0)
+    return samples
+
+
+def print_table(title: str, samples: list) -> None:
+    print(f"\n{title}")
+    print(f"{'pid':>8} {'RSS':>9} {'PSS':>9} {'共享':>9} {'私有':>9}  (MB)")
+    for sample in samples:
+        print(
+            f"{sample['pid']:>8} {sample['rss']:>9.1f} {sample['pss']:>9.1f} "
+            f"{sample['shared']:>9.1f} {sample['private']:>9.1f}"
+        )
+    total_pss = sum(sample["pss"] for sample in samples)
+    mean_private = sum(sample["private"] for sample in samples) / len(samples)
+    print(f"worker合计PSS {total_pss:.1f} MB，平均私有内存 {mean_private:.1f} MB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pid", type=int, help="gunicorn master进程号；不指定时模拟fork")
+    parser.add_argument("--workers", type=int, default=4, help="模拟的worker数")
+    parser.add_argument("--simulate", choices=("fork", "preload"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.pid:
+        samples = [worker_memory(child.pid) for child in psutil.Process(args.pid).children()]
+        if not samples:
+            print(f"进程 {args.pid} 没有worker子进程", file=sys.stderr)
+            return 1
+        print_table(f"gunicorn master {args.pid} 的worker", samples)
+        return 0
+
+    if args.simulate:
+        print(json.dumps(simulate(args.workers, args.simulate == "preload")))
+        return 0
+
+    # 两种模式分别在独立的解释器中模拟，互不影响已导入的模块
+    env = dict(os.environ, LEASE_SINGLE_FLIGHT="thread")
+    env.pop("LEASE_WARMUP", None)
+    for mode, title in (("fork", "普通模式（各worker自行加载应用）"), ("preload", "预加载模式（LEASE_PRELOAD=1）")):
+        with tempfile.TemporaryDirectory() as cwd:  # 应用在工作目录下创建日志目录
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--simulate", mode, "--workers", str(args.workers)],
+                cwd=cwd, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        print_table(title, json.loads(output.strip().splitlines()[-1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
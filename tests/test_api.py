@@ -56,6 +56,36 @@ class TestAPI:
         assert 'schedule' in result
         assert len(result['schedule']) == 36
     
+    @pytest.mark.parametrize('guarantee', [0, 50000])
+    def test_calculate_summary_only(self, client, guarantee):
+        """测试仅返回汇总指标的计算接口"""
+        payload = {
+            'method': 'equal_principal',
+            'pv': 1000000,
+            'annual_rate': 0.08,
+            'periods': 36,
+            'frequency': 12,
+            'guarantee': guarantee,
+        }
+        full = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        summary = json.loads(client.post('/api/calculate', json=dict(payload, summary_only=True)).data)['data']
+
+        assert 'schedule' not in summary
+        for key in ('total_interest', 'total_payment', 'irr'):
+            assert summary[key] == full[key]
+        if guarantee:
+            assert summary['guarantee_offset']['total_offset'] == full['guarantee_offset']['total_offset']
+
+    def test_sensitivity_analysis_equal_principal(self, client):
+        """测试等额本金法敏感性分析（平均租金）"""
+        payload = {'pv': 1000000, 'annual_rate': 0.08, 'periods': 36, 'method': 'equal_principal'}
+        response = client.post('/api/sensitivity_analysis', json=payload)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert len(data['sensitivity_analysis']) == 15
+        assert data['base_payment'] == pytest.approx(1123333.42 / 36)
+
     def test_calculate_equal_principal(self, client):
         """测试等额本金法计算接口"""
         payload = {
@@ -106,6 +136,172 @@ class TestAPI:
         
         assert response.status_code == 400
     
+    def test_reverse_calculate_extra_cash_flows(self, client):
+        """测试反向计算的附加现金流须为有限数值的列表"""
+        payload = {'calculation_type': 'find_irr', 'method': 'equal_annuity', 'pv': 1000000, 'periods': 36,
+                   'frequency': 12, 'target_irr': 0.1}
+        response = client.post('/api/reverse_calculate', json=dict(payload, extra_cash_flows=[20000, 0, 5000.5]))
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['converged']
+
+        for extra in ({'a': 1}, [None], '12', [True], ['1'], 1):
+            response = client.post('/api/reverse_calculate', json=dict(payload, extra_cash_flows=extra))
+            assert response.status_code == 400
+        response = client.post('/api/reverse_calculate', data='{"extra_cash_flows": [NaN], ' + json.dumps(payload)[1:],
+                               content_type='application/json')
+        assert response.status_code == 400
+
+    def test_batch_calculate(self, client):
+        """测试批量计算接口：逐笔结果与单笔计算一致，错误只影响对应租赁"""
+        leases = [
+            {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36},
+            {'method': 'equal_principal', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36, 'guarantee': 50000},
+            {'method': 'flat_rate', 'pv': 500000, 'annual_rate': 0.05, 'periods': 24},
+            {'method': 'equal_annuity', 'pv': -5, 'annual_rate': 0.08, 'periods': 36},
+            {'method': 'equal_annuity', 'pv': 'abc', 'annual_rate': 0.08, 'periods': 36},
+        ]
+        response = client.post('/api/batch/calculate', json=leases)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)['data']
+        assert (data['count'], data['succeeded'], data['failed']) == (5, 3, 2)
+        for lease, item in zip(leases[:3], data['results']):
+            single = json.loads(client.post('/api/calculate', json=lease).data)['data']
+            for key in ('total_interest', 'total_payment', 'irr'):
+                assert item[key] == single[key]
+        assert data['results'][3]['message'] == '租赁本金必须大于0'
+        assert data['results'][4]['status'] == 'error'
+
+    def test_batch_calculate_out_of_range(self, client):
+        """测试期数、年付次数过大的租赁只在该笔结果中报告错误"""
+        lease = {'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12}
+        leases = [dict(lease, periods=1e30), dict(lease, frequency=1e30), dict(lease, periods=10**12), lease]
+        for body in (leases, {'leases': leases}):
+            response = client.post('/api/batch/calculate', json=body)
+            assert response.status_code == 200
+            results = json.loads(response.data)['data']['results']
+            assert [item['status'] for item in results] == ['error', 'error', 'error', 'success']
+            assert results[0]['message'].startswith('期数超出范围')
+            assert results[1]['message'].startswith('年付次数超出范围')
+
+    def test_batch_calculate_csv(self, client):
+        """测试批量计算接口的CSV上传"""
+        import io
+
+        csv_text = 'method,pv,annual_rate,periods,frequency\nequal_annuity,1000000,0.08,36,12\nflat_rate,x,0.05,24,12\n'
+        response = client.post(
+            '/api/batch/calculate?include_schedule=1',
+            data={'file': (io.BytesIO(csv_text.encode('utf-8')), 'leases.csv')},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 200
+
+        results = json.loads(response.data)['data']['results']
+        assert results[0]['pmt'] == 31336.37
+        assert len(results[0]['schedule']) == 36
+        assert results[1]['status'] == 'error'
+
+        # 流式响应在视图返回后才读取上传的CSV
+        response = client.post(
+            '/api/batch/calculate?stream=1',
+            data={'file': (io.BytesIO(csv_text.encode('utf-8')), 'leases.csv')},
+            content_type='multipart/form-data'
+        )
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert records[1]['pmt'] == 31336.37
+        assert records[-1]['failed'] == 1
+
+    def test_calculate_ndjson(self, client):
+        """测试单笔计算的NDJSON流式响应：header后逐期返回冲抵后的还款计划"""
+        payload = {
+            'method': 'equal_annuity',
+            'pv': 1000000,
+            'annual_rate': 0.08,
+            'periods': 600,
+            'guarantee': 50000,
+        }
+        full = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        response = client.post('/api/calculate', json=payload, headers={'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+        header, rows = records[0], records[1:]
+        assert header['type'] == 'header'
+        assert header['data']['irr'] == full['irr']
+        assert header['data']['guarantee_offset']['total_offset'] == 50000
+        assert all(row.pop('type') == 'schedule' for row in rows)
+        assert rows == full['schedule']
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'])
+    def test_calculate_ndjson_lazy_schedule(self, client, method):
+        """测试无保证金时流式响应按需生成还款计划，与完整计算结果一致"""
+        payload = {
+            'method': method,
+            'pv': 1234567.89,
+            'annual_rate': 0.0725,
+            'periods': 600,
+            'rate_reset_schedule': [{'period': 100, 'new_rate': 0.05}],
+        }
+        full = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        response = client.post('/api/calculate?stream=1', json=payload)
+
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+        header, rows = records[0], records[1:]
+        assert all(row.pop('type') == 'schedule' for row in rows)
+        assert rows == full.pop('schedule')
+        assert header['data'] == full
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'])
+    def test_calculate_schedule_window(self, client, method):
+        """测试按 from_period/to_period 只返回还款计划的一个窗口，汇总指标不变"""
+        payload = {
+            'method': method,
+            'pv': 1000000,
+            'annual_rate': 0.08,
+            'periods': 360,
+            'rate_reset_schedule': [{'period': 100, 'new_rate': 0.05}],
+        }
+        full = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        page = json.loads(client.post('/api/calculate', json=dict(payload, from_period=349, to_period=360)).data)['data']
+
+        assert page['schedule'] == full['schedule'][348:360]
+        assert page['schedule_window'] == {'from_period': 349, 'to_period': 360, 'total_periods': 360}
+        assert page['irr'] == full['irr']
+        assert page['total_interest'] == full['total_interest']
+
+    def test_calculate_schedule_window_guarantee(self, client):
+        """测试含保证金冲抵时窗口取自冲抵后的还款计划"""
+        payload = {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36, 'guarantee': 50000}
+        full = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        page = json.loads(client.post('/api/calculate', json=dict(payload, from_period=25)).data)['data']
+
+        assert page['schedule'] == full['schedule'][24:]
+        assert page['irr'] == full['irr']
+        assert [item['period'] for item in page['guarantee_offset']['offset_details']] == [36, 35]
+
+    def test_calculate_schedule_window_invalid(self, client):
+        """测试无效的还款计划窗口"""
+        payload = {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}
+        for window in ({'from_period': 0}, {'from_period': 37}, {'from_period': 10, 'to_period': 5}, {'to_period': 'x'}):
+            response = client.post('/api/calculate', json=dict(payload, **window))
+            assert response.status_code == 400
+
+    def test_batch_calculate_ndjson(self, client):
+        """测试批量计算的NDJSON流式响应（跨多块）"""
+        leases = [{'method': 'equal_annuity', 'pv': 1000000 + i, 'annual_rate': 0.08, 'periods': 36} for i in range(1500)]
+        leases.append({'method': 'equal_annuity', 'pv': 1000000})
+
+        expected = json.loads(client.post('/api/batch/calculate', json=leases).data)['data']
+        response = client.post('/api/batch/calculate?stream=1', json=leases)
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        assert records[0]['type'] == 'header'
+        assert records[-1] == {'type': 'summary', 'count': 1501, 'succeeded': 1500, 'failed': 1}
+        results = records[1:-1]
+        assert all(item.pop('type') == 'result' for item in results)
+        assert results == expected['results']
+
     def test_export_excel(self, client):
         """测试Excel导出"""
         # 先计算得到结果
@@ -171,6 +367,47 @@ class TestAPI:
         # 应该能处理空数据而不报错
         assert response.status_code == 200
 
+    def test_export_by_result_id(self, client):
+        """测试导出、图表接口以结果ID引用完整结果，与提交完整结果一致"""
+        payload = {'method': 'floating_rate', 'pv': 500000, 'annual_rate': 0.06, 'periods': 24, 'guarantee': 20000,
+                   'rate_reset_schedule': [{'period': 7, 'new_rate': 0.07}]}
+        result = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        summary = json.loads(client.post('/api/calculate', json=dict(payload, summary_only=True)).data)['data']
+        assert summary['result_id'] == result['result_id']
+        assert result['export_data']['rate_reset_schedule'] == payload['rate_reset_schedule']
+
+        def exported(body):
+            response = client.post('/api/export/json', json=body)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            del data['导出信息']['导出时间']
+            return data
+
+        assert exported({'result_id': result['result_id']}) == exported(result)
+
+        chart = client.post('/api/charts/cash_flow', json={'result_id': result['result_id'], 'initial_payment': 500000})
+        assert chart.status_code == 200
+        assert json.loads(json.loads(chart.data)['chart'])['data'][0]['y'][0] == -500000
+
+    def test_export_by_result_id_evicted(self, client):
+        """测试结果已被淘汰时按 export_data 重新计算，缺少或不一致时返回错误"""
+        import app as app_module
+
+        payload = {'method': 'equal_principal', 'pv': 800000, 'annual_rate': 0.05, 'periods': 36, 'frequency': 4}
+        result = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        handle = {'result_id': result['result_id']}
+        app_module.result_store.clear()
+
+        assert client.post('/api/export/excel', json=handle).status_code == 404
+        tampered = dict(handle, export_data=dict(result['export_data'], pv=1))
+        assert client.post('/api/export/excel', json=tampered).status_code == 400
+        assert client.post('/api/charts/payment_structure', json={'result_id': 'x'}).status_code == 400
+
+        response = client.post('/api/charts/payment_structure', json=dict(handle, export_data=result['export_data']))
+        assert response.status_code == 200
+        bars = json.loads(json.loads(response.data)['chart'])['data']
+        assert bars[1]['y'] == [row['interest'] for row in result['schedule']]
+
 
 class TestFrontend:
     """前端页面测试"""
@@ -0,0 +1,107 @@
+"""
+应用工厂与轻量版应用测试
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from app import create_app, feature_available
+
+CORE_REQUESTS = [
+    ('/api/calculate', {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}),
+    ('/api/compare', {'schemes': [
+        {'method': 'equal_annuity', 'params': {'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}},
+        {'method': 'equal_principal', 'params': {'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}},
+    ]}),
+    ('/api/reverse_calculate', {
+        'calculation_type': 'find_rate', 'method': 'equal_annuity', 'pv': 1000000, 'periods': 36,
+        'frequency': 12, 'target_pmt': 31336.37,
+    }),
+    ('/api/sensitivity_analysis', {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}),
+]
+
+
+class TestCreateApp:
+    """应用工厂按可选功能注册蓝图"""
+
+    def test_default_features(self):
+        """测试默认注册依赖已安装的全部可选功能"""
+        client = create_app().test_client()
+        features = json.loads(client.get('/api/features').data)['data']
+        assert features == {'charts': True, 'exports': True, 'arrow': feature_available('arrow')}
+
+    def test_core_only(self):
+        """测试只注册核心接口时，核心接口可用，图表、导出接口不存在"""
+        flask_app = create_app(features=())
+        assert sorted(flask_app.blueprints) == ['core', 'frontend']
+        client = flask_app.test_client()
+        for url, payload in CORE_REQUESTS:
+            assert client.post(url, json=payload).status_code == 200, url
+        for url in ('/api/charts/cash_flow', '/api/charts/payment_structure', '/api/export/excel', '/api/export/csv',
+                    '/api/export/parquet', '/api/export/arrow'):
+            assert client.post(url, json={}).status_code in (404, 405), url
+        features = json.loads(client.get('/api/features').data)['data']
+        assert features == {'charts': False, 'exports': False, 'arrow': False}
+
+    def test_missing_dependency(self, monkeypatch):
+        """测试依赖未安装的可选功能不注册"""
+        monkeypatch.setitem(sys.modules, 'plotly', None)
+        monkeypatch.setitem(sys.modules, 'pyarrow', None)
+        flask_app = create_app(features=('charts', 'exports', 'arrow'))
+        assert sorted(flask_app.blueprints) == ['core', 'exports', 'frontend']
+
+    def test_file_logging(self, monkeypatch, tmp_path):
+        """测试日志写入 LOG_FILE，调试模式或 LOG_FILE 为空时不写日志文件"""
+        import app as app_module
+
+        monkeypatch.setattr(app_module.logger, 'handlers', [])
+        monkeypatch.setattr(app_module, 'LOG_FILE', '')
+        create_app(features=())
+        monkeypatch.setattr(app_module, 'LOG_FILE', str(tmp_path / 'logs' / 'lease.log'))
+        monkeypatch.setenv('FLASK_DEBUG', '1')
+        create_app(features=())
+        assert app_module.logger.handlers == [] and not (tmp_path / 'logs').exists()
+
+        monkeypatch.delenv('FLASK_DEBUG')
+        create_app(features=())
+        create_app(features=())
+        assert len(app_module.logger.handlers) == 1
+        for handler in app_module.logger.handlers:
+            handler.close()
+        assert '融资租赁计算器启动' in (tmp_path / 'logs' / 'lease.log').read_text(encoding='utf-8')
+
+    def test_unknown_feature(self):
+        """测试不支持的功能名"""
+        with pytest.raises(ValueError):
+            create_app(features=('pdf',))
+
+
+class TestAppLite:
+    """轻量版应用只依赖numpy即可运行"""
+
+    def test_runs_without_optional_dependencies(self, tmp_path):
+        """测试pandas、plotly、openpyxl、pyarrow等均不可导入时，轻量版应用的核心接口正常响应，且不创建 app.py 的默认应用"""
+        probe = f"""
+import json, sys
+for name in ('pandas', 'plotly', 'openpyxl', 'matplotlib', 'seaborn', 'PIL', 'scipy', 'pyarrow'):
+    sys.modules[name] = None
+sys.path.insert(0, {os.path.abspath(BACKEND_DIR)!r})
+import app_lite
+client = app_lite.app.test_client()
+codes = [client.post(url, json=payload).status_code for url, payload in {CORE_REQUESTS!r}]
+print(json.dumps([codes, sys.modules['app']._default_app is None]))
+"""
+        env = dict(os.environ, LEASE_SINGLE_FLIGHT='thread')
+        env.pop('LEASE_LITE_FEATURES', None)
+        result = subprocess.run([sys.executable, '-c', probe], cwd=tmp_path, env=env, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        codes, default_app_unbuilt = json.loads(result.stdout.strip().splitlines()[-1])
+        assert codes == [200] * len(CORE_REQUESTS)
+        assert default_app_unbuilt
@@ -0,0 +1,297 @@
+"""
+计算结果缓存测试
+"""
+
+import json
+import os
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from result_cache import LRUCache, RedisCache, SQLiteCache, cache_key, create_cache
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """最小的Redis协议服务：只实现缓存后端用到的命令"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            self.wfile.write(self.server.execute(args))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.values = {}
+        self.zsets = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def encode(value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(FakeRedisServer.encode(item) for item in value)
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def lookup(self, key):
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            del self.values[key]
+            return None
+        return value
+
+    def execute(self, args):
+        command, args = args[0].upper().decode(), args[1:]
+        with self.lock:
+            if command in ('SELECT', 'AUTH', 'PING'):
+                return b'+OK\r\n'
+            if command == 'GET':
+                return self.encode(self.lookup(args[0]))
+            if command == 'MGET':
+                return self.encode([self.lookup(key) for key in args])
+            if command == 'SET':
+                ttl = int(args[3]) / 1000 if len(args) > 3 else None
+                self.values[args[0]] = (args[1], time.time() + ttl if ttl else None)
+                return b'+OK\r\n'
+            if command == 'INCR':
+                value = int(self.lookup(args[0]) or 0) + 1
+                self.values[args[0]] = (str(value).encode(), None)
+                return self.encode(value)
+            if command == 'DEL':
+                removed = sum(self.values.pop(key, None) is not None or self.zsets.pop(key, None) is not None
+                              for key in args)
+                return self.encode(removed)
+            zset = self.zsets.setdefault(args[0], {})
+            if command == 'ZADD':
+                zset[args[2]] = float(args[1])
+                return self.encode(1)
+            if command == 'ZCARD':
+                return self.encode(len(zset))
+            if command == 'ZREMRANGEBYSCORE':
+                limit = float(args[2])
+                removed = [member for member, score in zset.items() if score <= limit]
+                for member in removed:
+                    del zset[member]
+                return self.encode(len(removed))
+            ordered = sorted(zset, key=zset.get)
+            if command == 'ZRANGE':
+                return self.encode(ordered)
+            if command == 'ZPOPMIN':
+                popped = ordered[:int(args[1])]
+                reply = []
+                for member in popped:
+                    reply += [member, repr(zset.pop(member)).encode()]
+                return self.encode(reply)
+        return b'-ERR unknown command\r\n'
+
+
+@pytest.fixture(scope='module')
+def redis_url():
+    server = FakeRedisServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'redis://127.0.0.1:%d/1' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def make_cache(request, tmp_path, redis_url):
+    """按后端名称创建缓存的工厂"""
+    def make(max_entries=3, ttl=60.0):
+        if request.param == 'memory':
+            cache = LRUCache(max_entries, ttl)
+        elif request.param == 'sqlite':
+            cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'), max_entries, ttl)
+        else:
+            cache = RedisCache(redis_url, max_entries, ttl)
+        cache.clear()
+        return cache
+    return make
+
+
+class TestCacheKey:
+    """缓存键规范化测试"""
+
+    def test_canonical(self):
+        """测试整数与浮点、键顺序不影响缓存键"""
+        left = cache_key({'pv': 1000000, 'annual_rate': 0.08, 'rate_reset_schedule': [{'period': 6, 'new_rate': 0.07}]})
+        right = cache_key({'rate_reset_schedule': [{'new_rate': 0.07, 'period': 6.0}], 'annual_rate': 0.08, 'pv': 1e6})
+        assert left == right
+        assert cache_key({'pv': 1000000, 'guarantee': None}) == cache_key({'pv': 1000000.0})
+
+    def test_distinct(self):
+        """测试参数不同、接口不同时缓存键不同"""
+        assert cache_key({'pv': 1000000}) != cache_key({'pv': 1000000.01})
+        assert cache_key({'pv': 1000000}) != cache_key({'pv': 1000000}, namespace='batch')
+
+    def test_create_cache(self):
+        """测试按名称创建后端"""
+        assert create_cache('none') is None
+        assert isinstance(create_cache('memory', max_entries=10), LRUCache)
+        assert create_cache('sqlite', name='results').path.endswith('lease-calculator-results.sqlite3')
+        with pytest.raises(ValueError):
+            create_cache('memcached')
+
+    def test_default_path_private(self, tmp_path, monkeypatch):
+        """测试默认的SQLite文件只放在当前用户所有且其他用户不可写的目录中"""
+        if not hasattr(os, 'getuid'):
+            pytest.skip('需要POSIX')
+        monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+        cache = create_cache('sqlite', name='results')
+        assert os.stat(os.path.dirname(cache.path)).st_mode & 0o077 == 0
+
+        directory = tmp_path / f'lease-calculator-cache-{os.getuid()}'
+        directory.chmod(0o777)
+        with pytest.raises(ValueError):
+            create_cache('sqlite', name='results')
+
+
+class TestResultCache:
+    """各缓存后端的淘汰与计数"""
+
+    def test_get_set(self, make_cache):
+        """测试读写与命中/未命中计数"""
+        cache = make_cache()
+        assert cache.get('a') is None
+        cache.set('a', b'{"pmt": 31336.37}')
+        assert cache.get('a') == b'{"pmt": 31336.37}'
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_size_eviction(self, make_cache):
+        """测试超过条目数上限时淘汰最久未访问的条目"""
+        cache = make_cache(max_entries=3)
+        for key in 'abc':
+            cache.set(key, key.encode())
+            time.sleep(0.002)
+        assert cache.get('a') == b'a'
+        time.sleep(0.002)
+        cache.set('d', b'd')
+
+        assert cache.get('b') is None
+        assert [cache.get(key) for key in 'acd'] == [b'a', b'c', b'd']
+        assert cache.stats()['entries'] == 3
+
+    def test_ttl_eviction(self, make_cache):
+        """测试过期条目不再命中"""
+        cache = make_cache(ttl=0.05)
+        cache.set('a', b'a')
+        assert cache.get('a') == b'a'
+        time.sleep(0.1)
+        assert cache.get('a') is None
+
+    def test_value_size_limit(self, make_cache):
+        """测试超过单值大小上限的结果不缓存"""
+        cache = make_cache()
+        cache.max_value_bytes = 8
+        assert not cache.set('a', b'x' * 9)
+        assert cache.get('a') is None
+
+
+class TestSharedBackends:
+    """共享后端在多个实例（worker进程）间可见"""
+
+    def test_sqlite_shared(self, tmp_path):
+        """测试同一SQLite文件的两个实例共享条目与计数（计数在写入条目或读取统计时写入）"""
+        path = str(tmp_path / 'shared.sqlite3')
+        first, second = SQLiteCache(path), SQLiteCache(path)
+        first.set('a', b'a')
+        assert second.get('a') == b'a'
+        assert first.stats()['hits'] == 0
+        second.set('b', b'b')
+        assert first.stats()['hits'] == 1
+
+    def test_sqlite_read_without_write_lock(self, tmp_path):
+        """测试其他进程持有写锁时读取不等待，命中计数在写锁释放后写入"""
+        path = str(tmp_path / 'locked.sqlite3')
+        cache = SQLiteCache(path, timeout=0.2)
+        cache.set('a', b'a')
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            assert [cache.get('a') for _ in range(3)] == [b'a'] * 3
+            assert cache.errors == 0
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+        assert cache.stats()['hits'] == 3
+
+    def test_sqlite_forked_worker(self, tmp_path):
+        """测试fork出的子进程重新连接并看到父进程写入的条目"""
+        if not hasattr(os, 'fork'):
+            pytest.skip('需要fork')
+        cache = SQLiteCache(str(tmp_path / 'fork.sqlite3'))
+        cache.set('a', b'a')
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if cache.get('a') == b'a' and cache.set('b', b'b') else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+        assert cache.get('b') == b'b'
+
+    def test_redis_unavailable(self):
+        """测试Redis不可用时按未命中处理，不影响调用方"""
+        cache = RedisCache('redis://127.0.0.1:1/0', timeout=0.2)
+        assert cache.get('a') is None
+        assert not cache.set('a', b'a')
+        assert cache.errors == 2
+
+
+class TestCalculateCache:
+    """/api/calculate 结果缓存"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        import app as app_module
+
+        monkeypatch.setattr(app_module, 'result_cache', LRUCache(16, 60))
+        app_module.app.config['TESTING'] = True
+        with app_module.app.test_client() as client:
+            yield client
+
+    def test_hit(self, client):
+        """测试相同参数（含等价写法）第二次命中缓存且结果一致"""
+        payload = {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36, 'guarantee': 50000}
+        first = client.post('/api/calculate', json=payload)
+        second = client.post('/api/calculate', json=dict(payload, pv=1000000.0, frequency=12))
+
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert json.loads(second.data)['data'] == json.loads(first.data)['data']
+
+        stats = json.loads(client.get('/api/cache/stats').data)['data']
+        assert (stats['backend'], stats['hits'], stats['misses']) == ('memory', 1, 1)
+
+    def test_distinct_requests(self, client):
+        """测试汇总模式、窗口、保证金方式不同的请求不共用条目，错误请求不缓存"""
+        payload = {'method': 'equal_principal', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}
+        variants = [payload, dict(payload, summary_only=True), dict(payload, from_period=13, to_period=24),
+                    dict(payload, guarantee=10000), dict(payload, guarantee=10000, guarantee_mode='按比例分摊')]
+        for variant in variants:
+            assert client.post('/api/calculate', json=variant).headers['X-Cache'] == 'MISS'
+
+        invalid = dict(payload, method='equal_annuity', pv=-1)
+        assert client.post('/api/calculate', json=invalid).status_code == 400
+        assert client.post('/api/calculate', json=invalid).status_code == 400
+        assert json.loads(client.get('/api/cache/stats').data)['data']['entries'] == 5
@@ -2,6 +2,8 @@ import pytest
 import sys
 import os
 
+import numpy as np
+
 # 添加项目路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
@@ -157,3 +159,668 @@ class TestCalculatorResults:
         
         # 最后一期剩余本金应该为0
         assert abs(balances[-1]) < 0.01
+
+
+class TestNumpyEngine:
+    """整数分数组引擎与Decimal参考实现一致性测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('pv, annual_rate, periods, frequency', [
+        (1000000, 0.08, 36, 12),
+        (1000000, 0.08, 360, 12),
+        (1, 0.08, 12, 12),
+        (120000, 0, 12, 12),
+        (100000, 5.0, 36, 12),
+        (1000000.005, 0.0735, 60, 4),
+        (28809554.5, 0.26, 271, 2),  # 余额发散，回退到Decimal实现
+    ])
+    def test_matches_decimal_reference(self, pv, annual_rate, periods, frequency):
+        """测试两种引擎逐期结果完全一致"""
+        reference = self.calculator.equal_annuity_method(pv, annual_rate, periods, frequency, engine='decimal')
+        result = self.calculator.equal_annuity_method(pv, annual_rate, periods, frequency, engine='numpy')
+        assert result == reference
+
+    def test_random_parameters_match(self):
+        """随机参数下两种引擎结果一致"""
+        import random
+
+        rng = random.Random(20240601)
+        for _ in range(200):
+            args = (
+                round(rng.uniform(1, 5e7), rng.choice([0, 1, 2])),
+                round(rng.uniform(0, 0.5), rng.choice([2, 3, 4])),
+                rng.randint(1, 400),
+                rng.choice([1, 2, 4, 12]),
+            )
+            assert self.calculator.equal_annuity_method(*args, engine='numpy') == \
+                self.calculator.equal_annuity_method(*args, engine='decimal')
+
+    def test_instance_default_engine(self):
+        """测试实例级默认引擎及非法引擎"""
+        calculator = LeaseCalculator(engine='numpy')
+        assert calculator.engine == 'numpy'
+        with pytest.raises(ValueError):
+            LeaseCalculator(engine='gpu')
+
+
+class TestIRREngine:
+    """IRR求解引擎测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('cash_flows', [
+        [-1000000] + [31336.37] * 36,
+        [-1000000] + [7337.65] * 360,
+        [-100000000] + [2500000.0] * 599 + [1000.0],
+        [-1000000] + [31336.37] * 34 + [0.0, 0.0],  # 尾期冲抵后的现金流
+        [-1000000] + [0.0] * 3 + [40000.0] * 30,  # 首期冲抵后的现金流
+        [-1000000] + [20000.0] * 36,  # IRR为负
+        [-1200] + [100] * 12,  # IRR为0
+    ])
+    def test_matches_numpy_financial(self, cash_flows):
+        """测试与numpy_financial.irr结果在六位小数内一致"""
+        npf = pytest.importorskip('numpy_financial')
+
+        expected = round((1 + npf.irr(cash_flows)) ** 12 - 1, 6)
+        assert self.calculator.calculate_irr(cash_flows, 12) == pytest.approx(expected, abs=1e-6)
+        assert self.calculator.calculate_irr(cash_flows, 12, guess=0.5) == pytest.approx(expected, abs=1e-6)
+
+    def test_no_sign_change(self):
+        """测试无符号变化的现金流返回0"""
+        assert self.calculator.calculate_irr([1000] * 12, 12) == 0.0
+        assert self.calculator.calculate_irr([-1000] + [0.0] * 12, 12) == 0.0
+
+
+class TestIRRBatch:
+    """批量IRR测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    def test_matrix_matches_scalar(self):
+        """测试矩阵输入与逐笔计算结果一致"""
+        import numpy as np
+
+        flows = np.array([
+            [-1000000] + [31336.37] * 36,
+            [-1000000] + [31336.37] * 34 + [0.0, 0.0],
+            [-1000000] + [20000.0] * 36,
+            [-1200] + [100] * 36,
+            [1000] * 37,
+        ])
+        result = self.calculator.calculate_irr_batch(flows, frequency=[12, 12, 12, 4, 12])
+        expected = [
+            self.calculator.calculate_irr(list(row), freq)
+            for row, freq in zip(flows, [12, 12, 12, 4, 12])
+        ]
+        assert result == pytest.approx(expected, abs=1e-6)
+        assert result[-1] == 0.0
+
+    def test_ragged_input(self):
+        """测试长度不一的现金流自动补齐"""
+        flows = [
+            [-100000] + [8884.88] * 12,
+            [-500000] + [22684.36] * 24,
+            [-1000000] + [0.0] * 3 + [40000.0] * 30,
+        ]
+        result = self.calculator.calculate_irr_batch(flows, frequency=12)
+        for row, irr in zip(flows, result):
+            assert irr == pytest.approx(self.calculator.calculate_irr(row, 12), abs=1e-6)
+
+    def test_lengths_ignore_padding(self):
+        """测试长度向量之外的补齐值被忽略"""
+        import numpy as np
+
+        flows = np.full((2, 40), 999.0)
+        flows[:, 0] = -100000
+        flows[0, 1:13] = 8884.88
+        flows[1, 1:25] = 4707.35
+        result = self.calculator.calculate_irr_batch(flows, lengths=[13, 25])
+        assert result[0] == pytest.approx(self.calculator.calculate_irr([-100000] + [8884.88] * 12), abs=1e-6)
+        assert result[1] == pytest.approx(self.calculator.calculate_irr([-100000] + [4707.35] * 24), abs=1e-6)
+
+
+class TestReverseCalculateRate:
+    """反向计算年利率测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate'])
+    def test_round_trip(self, method):
+        """测试由租金反推的利率可以复现目标租金"""
+        result = self.calculator.reverse_calculate_rate(1000000, 31336.37, 36, 12, method)
+        assert result['converged']
+        assert abs(result['error']) <= 0.01
+        assert result['iterations'] <= 10
+
+    def test_equal_annuity_recovers_rate(self):
+        """测试等额年金法反推出原始利率"""
+        pmt = self.calculator.equal_annuity_method(1000000, 0.0735, 60, 12)['pmt']
+        result = self.calculator.reverse_calculate_rate(1000000, pmt, 60, 12)
+        assert result['calculated_rate'] == pytest.approx(0.0735, abs=1e-5)
+        assert result['actual_pmt'] == pmt
+
+    def test_out_of_range_target(self):
+        """测试目标租金超出搜索区间时返回边界利率"""
+        low = self.calculator.reverse_calculate_rate(1000000, 20000, 36, 12)
+        assert low['calculated_rate'] == 0.001
+        assert not low['converged']
+
+        high = self.calculator.reverse_calculate_rate(1000000, 100000, 36, 12)
+        assert high['calculated_rate'] == 1.0
+        assert not high['converged']
+
+    def test_unsupported_method(self):
+        """测试不支持的计算方法"""
+        with pytest.raises(ValueError):
+            self.calculator.reverse_calculate_rate(1000000, 31336.37, 36, 12, 'floating_rate')
+
+
+class TestReverseCalculatePmt:
+    """根据目标IRR反向计算租金测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('target_irr', [0.0, 0.08, 0.5, 3.0])
+    def test_closed_form(self, target_irr):
+        """测试年金闭式解直接达到目标IRR（高利率不再被区间截断）"""
+        result = self.calculator.reverse_calculate_pmt(1000000, target_irr, 36, 12)
+        assert result['solver'] == 'closed_form'
+        assert result['iterations'] == 0
+        assert result['converged']
+        assert result['actual_irr'] == pytest.approx(target_irr, abs=1e-6)
+
+    def test_matches_annuity_schedule(self):
+        """测试闭式解与等额年金法租金一致"""
+        period_rate = 0.06 / 12
+        annual_irr = (1 + period_rate) ** 12 - 1
+        result = self.calculator.reverse_calculate_pmt(1000000, annual_irr, 60, 12)
+        pmt = self.calculator.equal_annuity_method(1000000, 0.06, 60, 12)['pmt']
+        assert result['calculated_pmt'] == pytest.approx(pmt, abs=0.01)
+
+    @pytest.mark.parametrize('mode', ['尾期冲抵', '首期冲抵', '按比例分摊'])
+    def test_guarantee_offset(self, mode):
+        """测试保证金冲抵后的现金流达到目标IRR"""
+        result = self.calculator.reverse_calculate_pmt(
+            1000000, 0.1, 36, 12, guarantee=100000, guarantee_mode=mode
+        )
+        assert result['solver'] == 'root'
+        assert result['converged']
+
+        schedule = self.calculator.equal_annuity_method(1000000, 0.1, 36, 12)['schedule']
+        schedule.payment[:] = result['calculated_pmt']
+        offset = self.calculator.apply_guarantee_offset(schedule, 100000, mode)
+        cash_flows = [-1000000] + offset['modified_schedule'].payment.tolist()
+        assert self.calculator.calculate_irr(cash_flows, 12) == pytest.approx(0.1, abs=1e-6)
+        assert result['total_payment'] == pytest.approx(sum(cash_flows[1:]))
+        assert result['total_interest'] == pytest.approx(sum(cash_flows))
+
+    def test_extra_cash_flows(self):
+        """测试手续费与残值等附加现金流"""
+        extra = [20000] + [0] * 35 + [200000]
+        result = self.calculator.reverse_calculate_pmt(1000000, 0.1, 36, 12, extra_cash_flows=extra)
+        assert result['converged']
+        assert abs(result['npv_residual']) < 1e-3
+
+        cash_flows = [-1000000 + 20000] + [result['calculated_pmt']] * 36
+        cash_flows[-1] += 200000
+        assert self.calculator.calculate_irr(cash_flows, 12) == pytest.approx(0.1, abs=1e-6)
+
+    def test_invalid_target(self):
+        """测试无效的目标IRR与附加现金流"""
+        with pytest.raises(ValueError):
+            self.calculator.reverse_calculate_pmt(1000000, -1.0, 36, 12)
+        with pytest.raises(ValueError):
+            self.calculator.reverse_calculate_pmt(1000000, 0.1, 12, 12, extra_cash_flows=[0] * 14)
+
+
+class TestSummaryOnly:
+    """仅计算汇总指标模式测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('pv', [1000000, 1234567.89, 98765.4321])
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'])
+    def test_matches_full_schedule(self, method, pv):
+        """测试汇总结果与完整还款计划的合计逐分一致"""
+        if method == 'flat_rate':
+            args = (pv, 0.05, 3, 12)
+        elif method == 'floating_rate':
+            args = (pv, 0.06, 36, [{'period': 13, 'new_rate': 0.07}], 12)
+        else:
+            args = (pv, 0.0735, 36, 12)
+        func = getattr(self.calculator, f'{method}_method')
+
+        full = func(*args)
+        summary = func(*args, summary_only=True)
+
+        assert 'schedule' not in summary
+        assert summary['total_interest'] == full['total_interest']
+        assert summary['total_payment'] == full['total_payment']
+        assert summary['total_interest'] == round(sum(full['schedule'].interest.tolist()), 2)
+        cash_flows = [-pv] + full['schedule'].payment.tolist()
+        assert summary['irr'] == self.calculator.calculate_irr(cash_flows, 12, guess=args[1] / 12)
+
+    def test_random_cases(self):
+        """测试随机参数下等额年金法、等额本金法汇总与完整计算一致"""
+        import random
+
+        rng = random.Random(7)
+        for _ in range(200):
+            pv = float(rng.randint(1000, 10**8))
+            rate = round(rng.uniform(0, 0.3), 4)
+            periods = rng.randint(1, 360)
+            frequency = rng.choice([1, 2, 4, 12])
+            for func in (self.calculator.equal_annuity_method, self.calculator.equal_principal_method):
+                full = func(pv, rate, periods, frequency)
+                summary = func(pv, rate, periods, frequency, summary_only=True)
+                assert summary['total_interest'] == full['total_interest']
+                assert summary['total_payment'] == full['total_payment']
+
+
+class TestFloatingRate:
+    """浮动利率法整数分引擎测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('pv,rate,periods,resets,frequency', [
+        (1000000, 0.05, 36, [{'period': 13, 'new_rate': 0.06}, {'period': 25, 'new_rate': 0.045}], 12),
+        (1234567.891, 0.0725, 240, [{'period': 61, 'new_rate': 0.081}], 12),
+        (500000, 0.08, 20, [{'period': 1, 'new_rate': 0.07}, {'period': 10, 'new_rate': 0.03}], 4),
+        (99.99, 0.123456, 7, [], 1),
+    ])
+    def test_matches_decimal_reference(self, pv, rate, periods, resets, frequency):
+        """测试逐期结果与Decimal参考实现完全一致"""
+        from decimal import Decimal
+
+        result = self.calculator.floating_rate_method(pv, rate, periods, resets, frequency)
+        columns, total_interest, total_payment = self.calculator._floating_rate_decimal(
+            Decimal(str(pv)), Decimal(str(rate)), periods,
+            self.calculator._rate_changes(resets, rate), frequency
+        )
+
+        schedule = result['schedule']
+        for name, values in columns.items():
+            assert schedule[name].tolist() == values
+        assert result['total_interest'] == total_interest
+        assert result['total_payment'] == total_payment
+
+    def test_rate_curve(self):
+        """测试逐期利率曲线与等价的重置计划结果一致"""
+        curve = np.array([0.05] * 12 + [0.06] * 12 + [0.045] * 12)
+        resets = [{'period': 13, 'new_rate': 0.06}, {'period': 25, 'new_rate': 0.045}]
+
+        by_curve = self.calculator.floating_rate_method(1000000, 0.05, 36, curve, 12)
+        by_resets = self.calculator.floating_rate_method(1000000, 0.05, 36, resets, 12)
+        assert by_curve['schedule'] == by_resets['schedule']
+        assert by_curve['total_interest'] == by_resets['total_interest']
+
+    def test_rate_curve_factors_linear(self, monkeypatch):
+        """测试逐期变动的利率曲线中各期租金系数只求一次（总耗时与期数成正比），结果与Decimal参考实现一致"""
+        from decimal import Decimal
+
+        import schedule_engine
+
+        evaluated = []
+        payment_factors = schedule_engine._payment_factors
+
+        def counting_factors(rate_float, remaining):
+            evaluated.append(len(remaining))
+            return payment_factors(rate_float, remaining)
+
+        monkeypatch.setattr(schedule_engine, '_payment_factors', counting_factors)
+        curve = 0.05 + 0.001 * (np.arange(240) % 7)
+        result = self.calculator.floating_rate_method(1000000, 0.05, 240, curve, 12)
+        assert sum(evaluated) == 240
+
+        rate_changes = self.calculator._rate_changes(curve, 0.05)
+        columns, total_interest, _ = self.calculator._floating_rate_decimal(
+            Decimal('1000000'), Decimal('0.05'), 240, rate_changes, 12
+        )
+        assert result['schedule']['payment'].tolist() == columns['payment']
+        assert result['total_interest'] == total_interest
+
+    def test_zero_initial_rate(self):
+        """测试零利率仍与原实现一样报错"""
+        with pytest.raises(Exception):
+            self.calculator.floating_rate_method(1000000, 0.0, 12, [], 12)
+
+
+class TestDecimalContext:
+    """金额计算与Decimal全局上下文无关的测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    def _results(self):
+        return [
+            self.calculator.equal_annuity_method(1234567.891, 0.0725, 60, 12),
+            self.calculator.equal_principal_method(1234567.891, 0.0725, 60, 12),
+            self.calculator.flat_rate_method(1234567.891, 0.0725, 60, 12),
+            self.calculator.floating_rate_method(1234567.891, 0.0725, 60, [{'period': 13, 'new_rate': 0.08}], 12),
+        ]
+
+    def test_global_context_untouched(self):
+        """测试计算不修改进程全局的Decimal上下文"""
+        from decimal import getcontext
+
+        prec = getcontext().prec
+        self._results()
+        assert getcontext().prec == prec
+
+    def test_independent_of_ambient_context(self):
+        """测试调用方的Decimal上下文（精度、舍入方式）不影响结果"""
+        from decimal import ROUND_DOWN, localcontext
+
+        expected = self._results()
+        with localcontext() as ctx:
+            ctx.prec = 6
+            ctx.rounding = ROUND_DOWN
+            actual = self._results()
+
+        for left, right in zip(expected, actual):
+            assert left['schedule'] == right['schedule']
+            assert left['total_interest'] == right['total_interest']
+
+    def test_threads(self):
+        """测试多线程并发计算结果一致"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        expected = self.calculator.floating_rate_method(1000000, 0.05, 120, [{'period': 37, 'new_rate': 0.06}], 12)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(
+                lambda _: self.calculator.floating_rate_method(1000000, 0.05, 120, [{'period': 37, 'new_rate': 0.06}], 12),
+                range(16)
+            ))
+        assert all(result['schedule'] == expected['schedule'] for result in results)
+
+
+class TestCalculateBatch:
+    """组合批量计算测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator(engine='numpy')
+
+    def test_matches_single_leases(self):
+        """测试向量化分组与逐笔计算结果一致"""
+        rng = np.random.default_rng(7)
+        size = 200
+        pv = np.round(rng.uniform(1e4, 1e7, size), 2)
+        rate = np.round(rng.uniform(0.01, 0.2, size), 4)
+        periods = rng.integers(6, 120, size)
+        method = rng.choice(['equal_annuity', 'equal_principal', 'flat_rate'], size)
+        guarantee = np.where(rng.random(size) < 0.2, 20000.0, 0.0)
+
+        batch = self.calculator.calculate_batch(pv, rate, periods, 12, method, guarantee)
+        assert batch['error'] == [None] * size
+        for k in range(size):
+            single = self.calculator._calculate_lease(
+                method[k], pv[k].item(), rate[k].item(), periods[k].item(), 12, guarantee[k].item(),
+                '尾期冲抵', None, False
+            )
+            for name in ('total_interest', 'total_payment', 'irr', 'total_offset'):
+                assert batch[name][k] == single[name]
+
+    def test_row_errors(self):
+        """测试单笔参数错误不影响其他租赁"""
+        batch = self.calculator.calculate_batch(
+            [1000000, -1, 1000000], 0.08, [36, 36, 36], 12, ['equal_annuity', 'equal_annuity', 'unknown']
+        )
+        assert batch['error'] == [None, '租赁本金必须大于0', '不支持的计算方法: unknown']
+        assert batch['pmt'][0] == 31336.37
+        assert np.isnan(batch['pmt'][1:]).all()
+
+    def test_row_overflow(self):
+        """测试计算结果超出数值范围的租赁记为该笔错误"""
+        batch = self.calculator.calculate_batch(100000, 0.06, [10**12, 12])
+        assert batch['error'] == ['计算结果超出数值范围', None]
+        assert batch['pmt'][1] == 8606.64
+
+    def test_include_schedule(self):
+        """测试返回冲抵后的逐笔还款计划"""
+        batch = self.calculator.calculate_batch(
+            1000000, 0.08, 36, 12, 'equal_annuity', guarantee=50000, include_schedule=True
+        )
+        schedule = batch['schedule'][0]
+        assert len(schedule) == 36
+        assert schedule.payment[-1] == 0
+        assert schedule.payment[-2] == pytest.approx(31336.37 * 2 - 50000)
+        assert batch['total_offset'][0] == 50000
+
+
+class TestIterSchedule:
+    """惰性还款计划生成器测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+        self.resets = [{'period': 13, 'new_rate': 0.06}, {'period': 400, 'new_rate': 0.045}]
+
+    def _full(self, method, pv, rate, periods):
+        if method == 'equal_annuity':
+            return self.calculator.equal_annuity_method(pv, rate, periods, 12)['schedule']
+        if method == 'equal_principal':
+            return self.calculator.equal_principal_method(pv, rate, periods, 12)['schedule']
+        if method == 'flat_rate':
+            return self.calculator.flat_rate_method(pv, rate, periods / 12, 12)['schedule']
+        return self.calculator.floating_rate_method(pv, rate, periods, self.resets, 12)['schedule']
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'])
+    @pytest.mark.parametrize('pv', [1000000, 1234567.891, 5e11])
+    def test_rows_match_full_schedule(self, method, pv):
+        """测试逐期产出的行与完整还款计划一致（含分以下尾数、超出整数分精确范围的本金）"""
+        expected = self._full(method, pv, 0.0725, 600).to_dicts()
+        rows = list(self.calculator.iter_schedule(method, pv, 0.0725, 600, 12, self.resets))
+        assert rows == expected
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'floating_rate'])
+    def test_chunks(self, method):
+        """测试按固定期数分块产出，期数连续且拼接后与完整计划一致"""
+        chunks = list(self.calculator.iter_schedule(method, 1000000, 0.08, 100, 12, self.resets, chunk_size=30))
+        assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+        assert chunks[1].period[0] == 31
+
+        expected = self._full(method, 1000000, 0.08, 100).to_dicts()
+        assert [row for chunk in chunks for row in chunk.to_dicts()] == expected
+
+    def test_early_termination(self):
+        """测试超长期限只计算实际取用的各期"""
+        from itertools import islice
+
+        rows = list(islice(self.calculator.iter_schedule('equal_annuity', 1000000, 0.08, 10 ** 8), 3))
+        assert [row['period'] for row in rows] == [1, 2, 3]
+        assert rows[0]['interest'] == 6666.67
+
+    def test_independent_of_ambient_context(self):
+        """测试生成器在调用方的Decimal上下文中恢复执行时结果不变"""
+        from decimal import localcontext
+
+        iterator = self.calculator.iter_schedule('floating_rate', 1234567.891, 0.0725, 60, 12, self.resets)
+        rows = [next(iterator)]
+        with localcontext() as ctx:
+            ctx.prec = 4
+            rows.extend(iterator)
+        assert rows == self._full('floating_rate', 1234567.891, 0.0725, 60).to_dicts()
+
+    def test_invalid_parameters(self):
+        """测试参数错误在创建生成器时立即抛出"""
+        with pytest.raises(ValueError):
+            self.calculator.iter_schedule('equal_annuity', -1, 0.08, 36)
+        with pytest.raises(ValueError):
+            self.calculator.iter_schedule('unknown', 1000000, 0.08, 36)
+        with pytest.raises(ValueError):
+            self.calculator.iter_schedule('equal_annuity', 1000000, 0.08, 36, chunk_size=0)
+
+
+class TestScheduleWindow:
+    """还款计划窗口（分页查询）测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+        self.resets = [{'period': 25, 'new_rate': 0.06}]
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'])
+    @pytest.mark.parametrize('pv', [1000000, 1234567.891, 5e11])
+    def test_matches_full_schedule(self, method, pv):
+        """测试任意窗口与完整还款计划对应各行一致"""
+        full = list(self.calculator.iter_schedule(method, pv, 0.0725, 120, 12, self.resets))
+        for from_period, to_period in [(1, 12), (13, 24), (61, 61), (109, 120), (100, 200)]:
+            window = self.calculator.schedule_window(
+                method, pv, 0.0725, 120, from_period, to_period, 12, self.resets
+            )
+            assert window.to_dicts() == full[from_period - 1:to_period]
+
+    def test_default_to_period(self):
+        """测试未指定截止期时取到最后一期"""
+        window = self.calculator.schedule_window('equal_principal', 1000000, 0.08, 36, 30)
+        assert window.period.tolist() == list(range(30, 37))
+
+    def test_floating_paid_off(self):
+        """测试浮动利率法余额提前还清后的窗口为空"""
+        assert len(self.calculator.floating_rate_method(0.05, 0.08, 36, [], 12)['schedule']) == 35
+        window = self.calculator.schedule_window('floating_rate', 0.05, 0.08, 36, 36, 36)
+        assert len(window) == 0
+        assert window.has_rate
+
+    @pytest.mark.parametrize('from_period,to_period', [(0, 12), (13, 12), (37, 40)])
+    def test_invalid_window(self, from_period, to_period):
+        """测试无效窗口"""
+        with pytest.raises(ValueError):
+            self.calculator.schedule_window('equal_annuity', 1000000, 0.08, 36, from_period, to_period)
+
+
+class TestSensitivityGrid:
+    """敏感性网格引擎测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @pytest.mark.parametrize('method', ['equal_annuity', 'equal_principal'])
+    def test_matches_scalar(self, method):
+        """测试二维网格每格与逐笔计算结果一致"""
+        rates = [0.0, 0.035, 0.0735, 0.12]
+        terms = [1, 12, 37, 120]
+        grid = self.calculator.sensitivity_grid(
+            1234567.89, [[rate] for rate in rates], terms, 12, method=method
+        )
+        assert grid['pmt'].shape == (4, 4)
+
+        func = getattr(self.calculator, f'{method}_method')
+        for i, rate in enumerate(rates):
+            for j, term in enumerate(terms):
+                result = func(1234567.89, rate, term, 12, summary_only=True)
+                assert grid['total_interest'][i, j] == result['total_interest']
+                assert grid['total_payment'][i, j] == result['total_payment']
+                assert grid['irr'][i, j] == result['irr']
+                assert grid['pmt'][i, j] == result.get('pmt', result['total_payment'] / term)
+
+    def test_random_cells(self):
+        """测试随机参数（含分以下尾数与超出整数分范围的本金）逐格一致"""
+        import random
+
+        rng = random.Random(11)
+        cases = []
+        for _ in range(300):
+            pv = rng.choice([float(rng.randint(1000, 10**8)), rng.uniform(1, 1e7), float(rng.randint(10**11, 10**12))])
+            cases.append((pv, round(rng.uniform(0, 0.3), 4), rng.randint(1, 240), rng.choice([1, 2, 4, 12])))
+
+        grid = self.calculator.sensitivity_grid(*zip(*cases))
+        for k, case in enumerate(cases):
+            result = self.calculator.equal_annuity_method(*case, summary_only=True)
+            assert grid['pmt'][k] == result['pmt']
+            assert grid['total_interest'][k] == result['total_interest']
+            assert grid['irr'][k] == result['irr']
+
+    def test_invalid_cells(self):
+        """测试参数不合法的格标记为无效"""
+        grid = self.calculator.sensitivity_grid(1000000, [0.08, -0.01], [36, 0])
+        assert grid['valid'].tolist() == [True, False]
+        assert np.isnan(grid['pmt'][1])
+
+    def test_nan_and_overflow_cells(self):
+        """测试含nan、溢出格的网格不产生RuntimeWarning，溢出格逐格回退"""
+        import warnings
+
+        from grid_engine import annuity_grid
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            grid = annuity_grid([1000000, np.nan, np.inf, 1e300], 0.08, 36, 12)
+        assert grid['valid'].tolist() == [True, False, True, True]
+        assert grid['fallback'].tolist() == [False, False, True, True]
+        assert grid['pmt'][0] == 31336.37
+
+    def test_sensitivity_analysis(self):
+        """测试敏感性分析与逐笔计算一致，非法情景返回错误信息"""
+        base = {'pv': 1000000, 'annual_rate': 0.08, 'periods': 36, 'frequency': 12}
+        result = self.calculator.sensitivity_analysis(base, {'annual_rate': [0.06, -0.01], 'frequency': [4]})
+
+        assert result['base_result']['pmt'] == 31336.37
+        rate_results = result['sensitivity_results']['annual_rate']
+        assert rate_results[0]['pmt'] == self.calculator.equal_annuity_method(1000000, 0.06, 36, 12)['pmt']
+        assert rate_results[1]['error'] == '年利率不能为负数'
+        assert result['sensitivity_results']['frequency'][0]['pmt'] == (
+            self.calculator.equal_annuity_method(1000000, 0.08, 36, 4)['pmt']
+        )
+
+
+class TestAnalyticSensitivities:
+    """解析敏感性测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    @staticmethod
+    def _pmt(pv, rate, periods, frequency=12):
+        i = rate / frequency
+        return pv * i / (1 - (1 + i) ** -periods) if i else pv / periods
+
+    def test_payment_derivatives(self):
+        """测试租金导数与有限差分一致"""
+        result = self.calculator.analytic_sensitivities(1000000, 0.08, 36, 12)
+        h = 1e-6
+        assert result['pmt'] == pytest.approx(self._pmt(1000000, 0.08, 36))
+        assert result['dpmt_drate'] == pytest.approx(
+            (self._pmt(1000000, 0.08 + h, 36) - self._pmt(1000000, 0.08 - h, 36)) / (2 * h), rel=1e-6
+        )
+        assert result['dpmt_dperiods'] == pytest.approx(
+            (self._pmt(1000000, 0.08, 36 + 1e-4) - self._pmt(1000000, 0.08, 36 - 1e-4)) / 2e-4, rel=1e-6
+        )
+        assert result['dpmt_dpv'] == pytest.approx(self._pmt(1, 0.08, 36))
+
+    def test_duration_and_convexity(self):
+        """测试久期、凸性与逐期现金流直接求和一致"""
+        result = self.calculator.analytic_sensitivities(1000000, 0.08, 36, 12)
+        pmt = result['pmt']
+        times = np.arange(1, 37)
+        discounted = pmt * (1 + 0.08 / 12) ** -times
+        price = discounted.sum()
+
+        assert result['macaulay_duration'] == pytest.approx((times / 12 * discounted).sum() / price)
+        assert result['modified_duration'] == pytest.approx(result['macaulay_duration'] / (1 + 0.08 / 12))
+        convexity = (times * (times + 1) * discounted).sum() / (1 + 0.08 / 12) ** 2 / price / 144
+        assert result['convexity'] == pytest.approx(convexity)
+
+    def test_zero_rate(self):
+        """测试零利率处的极限值"""
+        result = self.calculator.analytic_sensitivities(600000, 0.0, 24, 12)
+        assert result['pmt'] == pytest.approx(25000)
+        assert result['dpmt_dperiods'] == pytest.approx(-600000 / 24**2)
+        assert result['macaulay_duration'] == pytest.approx(12.5 / 12)
+
+    def test_batch(self):
+        """测试批量结果与逐笔结果一致，非法参数为nan"""
+        batch = self.calculator.analytic_sensitivities_batch(1000000, [0.05, 0.08, -0.01], 36, 12)
+        single = self.calculator.analytic_sensitivities(1000000, 0.08, 36, 12)
+        for name, value in single.items():
+            assert batch[name][1] == value
+        assert np.isnan(batch['pmt'][2])
+
+        with pytest.raises(ValueError):
+            self.calculator.analytic_sensitivities(1000000, -0.01, 36, 12)
@@ -0,0 +1,211 @@
+"""
+CSV、Parquet、Arrow列式导出测试
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from columnar_export import (
+    BATCH_EXPORT_FIELDS,
+    PORTFOLIO_SCHEDULE_FIELDS,
+    SCHEDULE_FIELDS,
+    record_batch,
+    schedule_columns,
+    write_table,
+)
+from lease_calculator import LeaseCalculator
+from schedule import Schedule
+
+
+def read_table(fmt, content):
+    """读取导出文件，返回逐行字典；CSV的空字段读作None"""
+    if fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(content.decode('utf-8'))))
+        return [{name: (value if value != '' else None) for name, value in row.items()} for row in rows]
+    pa = pytest.importorskip('pyarrow')
+    if fmt == 'arrow':
+        return pa.ipc.open_stream(content).read_all().to_pylist()
+    pq = pytest.importorskip('pyarrow.parquet')
+    return pq.read_table(io.BytesIO(content)).to_pylist()
+
+
+def as_numbers(rows):
+    """CSV读出的文本转换为数值，便于与Arrow、Parquet的结果比较"""
+    def convert(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+
+    return [{name: convert(value) for name, value in row.items()} for row in rows]
+
+
+@pytest.fixture(params=['csv', 'parquet', 'arrow'])
+def fmt(request):
+    if request.param != 'csv':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+
+class TestColumnarWriters:
+    """列式写出"""
+
+    def test_schedule_columns(self, fmt):
+        """测试还款计划按列写出：数值保持原始精度，无当期利率的计划该列为空，多块依次写出"""
+        schedule = Schedule([1, 2, 3], [100.1, 100.1, 100.12], [90.0, 95.0, 15.0], [10.1, 5.1, 0.12], [110.0, 15.0, 0.0])
+        output = io.BytesIO()
+        rows = write_table(output, fmt, PORTFOLIO_SCHEDULE_FIELDS, [
+            schedule_columns(schedule[:2], 0), schedule_columns(schedule[2:], 0), schedule_columns(schedule[:0], 1),
+        ])
+        assert rows == 3
+
+        table = as_numbers(read_table(fmt, output.getvalue()))
+        assert list(table[0]) == [field.name for field in PORTFOLIO_SCHEDULE_FIELDS]
+        assert [row['payment'] for row in table] == [100.1, 100.1, 100.12]
+        assert [row['period'] for row in table] == [1, 2, 3]
+        assert {row['index'] for row in table} == {0}
+        assert all(row['rate'] is None for row in table)
+
+    def test_nulls_and_text(self, fmt):
+        """测试nan、掩码和None写为空值，文本中的逗号、引号正确转义"""
+        output = io.BytesIO()
+        write_table(output, fmt, BATCH_EXPORT_FIELDS, [{
+            'index': np.arange(2),
+            'method': ['equal_annuity', None],
+            'pv': np.array([1000.0, np.nan]),
+            'periods': np.ma.array([12, 0], mask=[False, True]),
+            'error': [None, '参数错误: "pv", periods'],
+        }])
+
+        first, second = as_numbers(read_table(fmt, output.getvalue()))
+        assert first['method'] == 'equal_annuity' and first['pv'] == 1000.0 and first['periods'] == 12
+        assert first['error'] is None and first['irr'] is None
+        assert second['method'] is None and second['pv'] is None and second['periods'] is None
+        assert second['error'] == '参数错误: "pv", periods'
+
+    def test_arrow_zero_copy(self):
+        """测试Arrow的数值列直接引用列数组的内存"""
+        pytest.importorskip('pyarrow')
+        schedule = Schedule([1, 2], [10.5, 10.5], [10.0, 10.25], [0.5, 0.25], [10.25, 0.0], rate=[0.05, 0.06])
+        batch = record_batch(SCHEDULE_FIELDS, schedule_columns(schedule))
+        for field in SCHEDULE_FIELDS:
+            assert batch.column(field.name).buffers()[1].address == schedule.column(field.name).ctypes.data
+
+    def test_unsupported_format(self):
+        """测试不支持的导出格式"""
+        with pytest.raises(ValueError):
+            write_table(io.BytesIO(), 'xlsx', SCHEDULE_FIELDS, [])
+
+
+class TestLeaseCalculatorExport:
+    """LeaseCalculator 的导出接口"""
+
+    def test_export_schedule(self, fmt):
+        """测试分块导出的还款计划与完整计算结果逐期一致"""
+        calculator = LeaseCalculator()
+        output = io.BytesIO()
+        reset = [{'period': 10, 'new_rate': 0.07}]
+        rows = calculator.export_schedule(output, fmt, 'floating_rate', 500000, 0.06, 36, 12, reset, chunk_size=7)
+        assert rows == 36
+
+        expected = calculator.floating_rate_method(500000, 0.06, 36, reset)['schedule'].to_dicts()
+        table = as_numbers(read_table(fmt, output.getvalue()))
+        assert [{name: row[name] for name in expected[0]} for row in table] == expected
+
+    def test_export_batch(self, fmt):
+        """测试批量结果分块导出：与 calculate_batch 一致，失败的租赁只有失败原因"""
+        calculator = LeaseCalculator()
+        params = {
+            'pv': [100000, -1, 200000, 300000, 50000],
+            'annual_rate': [0.06, 0.06, 0.05, 0.04, 0.08],
+            'periods': [12, 12, 24, 36, 6],
+            'method': ['equal_annuity', 'equal_annuity', 'equal_principal', 'flat_rate', 'equal_annuity'],
+            'guarantee': [0, 0, 0, 0, 5000],
+        }
+        output = io.BytesIO()
+        assert calculator.export_batch(output, fmt, chunk_size=2, **params) == 5
+
+        expected = calculator.calculate_batch(**params)
+        table = as_numbers(read_table(fmt, output.getvalue()))
+        assert [row['index'] for row in table] == [0, 1, 2, 3, 4]
+        assert [row['method'] for row in table] == params['method']
+        assert [row['error'] for row in table] == expected['error']
+        for name in ('pmt', 'total_interest', 'total_payment', 'irr', 'total_offset'):
+            values = [row[name] for row in table]
+            assert values[1] is None
+            assert values[:1] + values[2:] == expected[name][[0, 2, 3, 4]].tolist()
+
+
+class TestExportEndpoints:
+    """/api/export/csv、/api/export/parquet、/api/export/arrow"""
+
+    @pytest.fixture
+    def client(self):
+        from app import app
+
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    def test_single_lease(self, client, fmt):
+        """测试单笔结果（结果ID引用）导出冲抵后的还款计划"""
+        payload = {'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12, 'guarantee': 5000}
+        result = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        response = client.post(f'/api/export/{fmt}', json={'result_id': result['result_id']})
+        assert response.status_code == 200
+        assert response.content_length == len(response.data)
+
+        table = as_numbers(read_table(fmt, response.data))
+        assert [[row[name] for name in result['schedule'][0]] for row in table] == [
+            list(item.values()) for item in result['schedule']
+        ]
+
+    def test_portfolio_and_results(self, client, fmt, monkeypatch):
+        """测试多笔租赁的合并还款计划和批量计算结果，index 列为请求中的序号"""
+        import app as app_module
+
+        monkeypatch.setattr(app_module, 'EXPORT_SPOOL_SIZE', 256)
+        monkeypatch.setattr(app_module, 'BATCH_STREAM_CHUNK', 2)
+        leases = [
+            {'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12},
+            {'method': 'floating_rate', 'pv': 200000, 'annual_rate': 0.05, 'periods': 6,
+             'rate_reset_schedule': [{'period': 3, 'new_rate': 0.06}]},
+            {'method': 'equal_principal', 'pv': 50000, 'annual_rate': 0.04, 'periods': 24, 'guarantee': 1000},
+        ]
+
+        response = client.post(f'/api/export/{fmt}', json={'leases': leases})
+        assert response.status_code == 200
+        table = as_numbers(read_table(fmt, response.data))
+        assert [sum(row['index'] == index for row in table) for index in range(3)] == [12, 6, 24]
+        assert [row['rate'] for row in table if row['index'] == 1] == [0.05, 0.05, 0.06, 0.06, 0.06, 0.06]
+
+        response = client.post(f'/api/export/{fmt}?table=results', json=leases + [{'pv': 1}])
+        assert response.status_code == 200
+        table = as_numbers(read_table(fmt, response.data))
+        batch = json.loads(client.post('/api/batch/calculate', json=leases + [{'pv': 1}]).data)['data']['results']
+        assert [row['index'] for row in table] == [item['index'] for item in batch]
+        assert [row['irr'] for row in table[:3]] == [item['irr'] for item in batch[:3]]
+        assert table[3]['error'] == batch[3]['message'] and table[3]['pv'] is None
+
+    def test_invalid(self, client):
+        """测试参数错误在响应开始前以400返回"""
+        lease = {'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12}
+        response = client.post('/api/export/csv', json={'leases': [lease, dict(lease, pv=-1)]})
+        assert response.status_code == 400
+        assert '第2笔' in json.loads(response.data)['message']
+        assert client.post('/api/export/csv', json={'pv': 1}).status_code == 400
+        assert client.post('/api/export/csv?table=summary', json=lease).status_code == 400
+        assert client.post('/api/export/csv?table=results', json={'leases': 1}).status_code == 400
@@ -0,0 +1,175 @@
+"""
+流式Excel导出测试
+"""
+
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import excel_export
+from excel_export import CURRENCY_FORMAT, PERCENT_FORMAT, ExcelWriter, Number
+
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def read_workbook(content):
+    """读取xlsx，返回 {工作表名: [(值, 数字格式) 行列表]}"""
+    workbook = openpyxl.load_workbook(io.BytesIO(content))
+    return {
+        sheet.title: [[(cell.value, cell.number_format) for cell in row] for row in sheet.iter_rows()]
+        for sheet in workbook
+    }
+
+
+class TestExcelWriter:
+    """xlsx写出器"""
+
+    def test_cells(self):
+        """测试数值按原值写出并带数字格式，文本转义，空值和非有限数值留空"""
+        output = io.BytesIO()
+        with ExcelWriter(output) as writer:
+            writer.write_rows('基本信息', ['项目', '数值'], [
+                ['租赁本金', Number(1000000.0, CURRENCY_FORMAT)],
+                ['年利率', Number(np.float64(0.08), PERCENT_FORMAT)],
+                ['期数', np.int64(36)],
+                ['<备注&>', None],
+            ])
+            writer.write_columns('还款计划表', ['期数', '租金(元)', '当期利率'], [
+                [np.arange(1, 3), np.array([100.5, 200.25])],
+                [np.array([3]), np.array([np.nan]), np.array([0.05])],
+            ], [None, CURRENCY_FORMAT, PERCENT_FORMAT])
+
+        sheets = read_workbook(output.getvalue())
+        assert list(sheets) == ['基本信息', '还款计划表']
+        assert sheets['基本信息'][1:] == [
+            [('租赁本金', 'General'), (1000000.0, CURRENCY_FORMAT)],
+            [('年利率', 'General'), (0.08, PERCENT_FORMAT)],
+            [('期数', 'General'), (36, 'General')],
+            [('<备注&>', 'General'), (None, 'General')],
+        ]
+        assert [[value for value, _ in row] for row in sheets['还款计划表']] == [
+            ['期数', '租金(元)', '当期利率'],
+            [1, 100.5, None],
+            [2, 200.25, None],
+            [3, None, 0.05],
+        ]
+        assert sheets['还款计划表'][1][1] == (100.5, CURRENCY_FORMAT)
+
+    def test_sheet_row_limit(self, monkeypatch):
+        """测试超出工作表行数上限时续写到下一个工作表，块在边界处拆分"""
+        monkeypatch.setattr(excel_export, 'MAX_SHEET_ROWS', 4)
+        monkeypatch.setattr(excel_export, 'BLOCK_ROWS', 2)
+        output = io.BytesIO()
+        with ExcelWriter(output) as writer:
+            written = writer.write_columns('计划', ['期数'], [[np.arange(1, 6)], [np.arange(6, 9)]], [None])
+        assert written == 8
+
+        sheets = read_workbook(output.getvalue())
+        assert list(sheets) == ['计划', '计划(2)', '计划(3)']
+        assert [[row[0][0] for row in rows] for rows in sheets.values()] == [
+            ['期数', 1, 2, 3], ['期数', 4, 5, 6], ['期数', 7, 8],
+        ]
+
+    def test_error_while_writing(self):
+        """测试写出过程中出错时抛出原始异常"""
+        def chunks():
+            yield [np.arange(3)]
+            raise ValueError('租赁本金必须大于0')
+
+        with pytest.raises(ValueError, match='租赁本金'):
+            with ExcelWriter(io.BytesIO()) as writer:
+                writer.write_columns('计划', ['期数'], chunks(), [None])
+
+        with pytest.raises(ValueError):
+            with ExcelWriter(io.BytesIO()) as writer:
+                writer.write_rows('计划', ['期数'], [])
+                writer.write_rows('计划', ['期数'], [])
+
+
+class TestExportExcel:
+    """/api/export/excel"""
+
+    @pytest.fixture
+    def client(self):
+        from app import app
+
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    def test_single_lease(self, client):
+        """测试单笔报告的金额、利率为带格式的数值单元格，还款计划与计算结果一致"""
+        payload = {'method': 'floating_rate', 'pv': 500000, 'annual_rate': 0.06, 'periods': 24, 'guarantee': 20000,
+                   'rate_reset_schedule': [{'period': 7, 'new_rate': 0.07}]}
+        result = json.loads(client.post('/api/calculate', json=payload).data)['data']
+        response = client.post('/api/export/excel', json=result)
+        assert response.status_code == 200
+
+        sheets = read_workbook(response.data)
+        assert list(sheets) == ['基本信息', '还款计划表', '保证金冲抵详情', '保证金汇总']
+        basic_info = {row[0][0]: row[1] for row in sheets['基本信息'][1:]}
+        assert basic_info['租赁本金'] == (500000, CURRENCY_FORMAT)
+        assert basic_info['年利率'] == (0.06, PERCENT_FORMAT)
+
+        rows = [[value for value, _ in row] for row in sheets['还款计划表'][1:]]
+        expected = [
+            [item['period'], item['payment'], item['principal'], item['interest'], item['remaining_balance'], item['rate']]
+            for item in result['schedule']
+        ]
+        assert rows == expected
+
+    def test_portfolio(self, client, monkeypatch):
+        """测试多笔租赁报告：汇总表每笔一行，还款计划表按租赁序号合并，超过阈值时写入临时文件"""
+        import app as app_module
+
+        monkeypatch.setattr(app_module, 'EXPORT_SPOOL_SIZE', 1024)
+        monkeypatch.setattr(app_module, 'EXPORT_SUMMARY_BLOCK', 16)
+        leases = [
+            {'method': ('equal_annuity', 'equal_principal')[k % 2], 'pv': 100000 + 1000 * k, 'annual_rate': 0.06,
+             'periods': 12}
+            for k in range(40)
+        ]
+        leases.append({'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12, 'guarantee': 5000})
+        reference = json.loads(client.post('/api/calculate', json={
+            'method': 'floating_rate', 'pv': 200000, 'annual_rate': 0.05, 'periods': 6,
+            'rate_reset_schedule': [{'period': 3, 'new_rate': 0.06}],
+        }).data)['data']
+        leases.append({'result_id': reference['result_id']})
+
+        response = client.post('/api/export/excel', json={'leases': leases})
+        assert response.status_code == 200
+        assert response.content_length == len(response.data)
+
+        sheets = read_workbook(response.data)
+        assert list(sheets) == ['租赁汇总', '还款计划表']
+        summary, schedule = sheets['租赁汇总'][1:], sheets['还款计划表'][1:]
+        assert len(summary) == len(leases) and len(schedule) == 41 * 12 + 6
+
+        for index, lease in enumerate(leases, 1):
+            if 'result_id' in lease:
+                expected = reference
+            else:
+                expected = json.loads(client.post('/api/calculate', json=lease).data)['data']
+            row = [value for value, _ in summary[index - 1]]
+            assert row[0] == index
+            assert row[7:10] == [expected['total_interest'], expected['total_payment'], expected['irr']]
+            periods = [[value for value, _ in item[1:6]] for item in schedule if item[0][0] == index]
+            assert periods == [
+                [item['period'], item['payment'], item['principal'], item['interest'], item['remaining_balance']]
+                for item in expected['schedule']
+            ]
+        assert schedule[-1][6] == (0.06, PERCENT_FORMAT)
+
+    def test_portfolio_invalid(self, client):
+        """测试多笔租赁中参数错误时返回400并指明租赁序号"""
+        lease = {'method': 'equal_annuity', 'pv': 100000, 'annual_rate': 0.06, 'periods': 12}
+        response = client.post('/api/export/excel', json={'leases': [lease, dict(lease, pv=-1)]})
+        assert response.status_code == 400
+        assert '第2笔' in json.loads(response.data)['message']
+        assert client.post('/api/export/excel', json={'leases': []}).status_code == 400
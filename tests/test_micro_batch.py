@@ -0,0 +1,161 @@
+"""
+请求微批处理测试
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from lease_calculator import LeaseCalculator
+from micro_batch import MicroBatcher
+
+
+def run_concurrently(func, items):
+    """各请求在独立线程中同时提交，返回逐项结果（异常按原样返回）"""
+    results = [None] * len(items)
+    barrier = threading.Barrier(len(items))
+
+    def worker(k):
+        barrier.wait()
+        try:
+            results[k] = func(items[k])
+        except Exception as e:
+            results[k] = e
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestMicroBatcher:
+    """微批处理器的合并、时延上限与结果分发"""
+
+    def test_batches_concurrent_requests(self):
+        """测试窗口内并发到达的请求合并为一批，结果按请求分发"""
+        sizes = []
+
+        def evaluate(items):
+            sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(evaluate, window=0.2)
+        assert run_concurrently(batcher.submit, list(range(8))) == [k * 2 for k in range(8)]
+        assert sizes == [8]
+
+        stats = batcher.stats()
+        assert (stats['batches'], stats['requests'], stats['max_batch_size']) == (1, 8, 8)
+        assert stats['batch_sizes'] == {'1': 0, '2': 0, '3-4': 0, '5-8': 1}
+
+    def test_latency_cap(self):
+        """测试单个请求最多等待一个窗口即开始计算"""
+        batcher = MicroBatcher(lambda items: items, window=0.05)
+        started = time.monotonic()
+        assert batcher.submit('a') == 'a'
+        assert 0.05 <= time.monotonic() - started < 0.5
+        assert batcher.stats()['max_wait_ms'] < 500
+
+    def test_full_batch_runs_immediately(self):
+        """测试批次满员时不等窗口结束立即计算"""
+        sizes = []
+        batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, window=5.0, max_size=4)
+        started = time.monotonic()
+        assert run_concurrently(batcher.submit, list(range(4))) == list(range(4))
+        assert time.monotonic() - started < 2.0
+        assert sizes == [4]
+
+    def test_errors(self):
+        """测试单项的异常只在对应请求中抛出，批量计算失败时整批请求得到该异常"""
+        batcher = MicroBatcher(lambda items: [ValueError(item) if item < 0 else item for item in items], window=0.1)
+        results = run_concurrently(batcher.submit, [1, -1, 2])
+        assert results[0] == 1 and results[2] == 2
+        assert isinstance(results[1], ValueError)
+
+        def broken(items):
+            raise RuntimeError('kernel failed')
+
+        batcher = MicroBatcher(broken, window=0.1)
+        assert all(isinstance(result, RuntimeError) for result in run_concurrently(batcher.submit, [1, 2]))
+        assert batcher.stats()['errors'] == 1
+
+    def test_invalid_config(self):
+        """测试窗口和批次上限必须为正"""
+        with pytest.raises(ValueError):
+            MicroBatcher(list, window=0)
+        with pytest.raises(ValueError):
+            MicroBatcher(list, max_size=0)
+
+
+class TestCalculateSummaries:
+    """多笔租赁汇总指标与单笔计算一致"""
+
+    def test_matches_single(self):
+        """测试向量化计算与逐笔计算的各笔结果完全一致，参数错误只影响对应租赁"""
+        calculator = LeaseCalculator(engine='numpy')
+        leases = [
+            (method, 100000.0 + 12345.67 * k, 0.03 + 0.002 * k, 12 + 3 * k, (12, 4)[k % 2])
+            for k in range(40)
+            for method in ('equal_annuity', 'equal_principal')
+        ]
+        leases += [('equal_annuity', -1.0, 0.08, 36, 12), ('flat_rate', 100000.0, 0.05, 36, 12)]
+
+        results = calculator.calculate_summaries(leases)
+        for lease, result in zip(leases[:-2], results):
+            method, pv, annual_rate, periods, frequency = lease
+            func = getattr(calculator, f'{method}_method')
+            assert result == func(pv, annual_rate, periods, frequency, summary_only=True)
+        assert isinstance(results[-2], ValueError)
+        assert isinstance(results[-1], ValueError)
+
+
+class TestCalculateMicroBatch:
+    """/api/calculate 的请求微批处理"""
+
+    @pytest.fixture
+    def app_module(self, monkeypatch):
+        import app as app_module
+
+        monkeypatch.setattr(app_module, 'result_cache', None)
+        monkeypatch.setattr(
+            app_module, 'micro_batcher', MicroBatcher(app_module.calculator.calculate_summaries, window=0.2)
+        )
+        app_module.app.config['TESTING'] = True
+        return app_module
+
+    def test_concurrent_requests(self, app_module, monkeypatch):
+        """测试并发的汇总请求合并计算，响应与单独计算一致，其他请求不经过微批处理"""
+        payloads = [
+            {'method': method, 'pv': 1000000 + 1000 * k, 'annual_rate': 0.08, 'periods': 36, 'summary_only': True}
+            for k in range(3)
+            for method in ('equal_annuity', 'equal_principal')
+        ]
+        payloads.append({'method': 'equal_annuity', 'pv': -1, 'annual_rate': 0.08, 'periods': 36, 'summary_only': True})
+
+        def post(payload):
+            with app_module.app.test_client() as client:
+                response = client.post('/api/calculate', json=payload)
+                return response.status_code, json.loads(response.data)
+
+        batched = run_concurrently(post, payloads)
+        assert [status for status, _ in batched] == [200] * 6 + [400]
+
+        with app_module.app.test_client() as client:
+            stats = json.loads(client.get('/api/microbatch/stats').data)['data']
+            assert stats['enabled'] and stats['requests'] == 7
+            assert stats['max_batch_size'] > 1
+
+            client.post('/api/calculate', json=dict(payloads[0], summary_only=False))
+            assert json.loads(client.get('/api/microbatch/stats').data)['data']['requests'] == 7
+
+        monkeypatch.setattr(app_module, 'micro_batcher', None)
+        for payload, (_, body) in zip(payloads[:-1], batched):
+            single = post(payload)[1]
+            assert body['data'] == single['data']
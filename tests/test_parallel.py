@@ -0,0 +1,82 @@
+"""
+进程池执行层测试
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from lease_calculator import LeaseCalculator
+from parallel_engine import ParallelExecutor
+
+
+@pytest.fixture(scope='module')
+def executor():
+    """两个子进程、小分块的执行器，保证任务被切成多块"""
+    with ParallelExecutor(workers=2, chunk_size=64) as executor:
+        yield executor
+
+
+class TestParallelExecutor:
+    """并行结果与单进程计算逐位一致"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator(engine='numpy')
+
+    def test_calculate_batch(self, executor):
+        """测试组合批量计算（含错误行、浮动利率重置计划）"""
+        rng = np.random.default_rng(11)
+        size = 300
+        pv = np.round(rng.uniform(1e4, 1e7, size), 2)
+        pv[17] = -1
+        rate = np.round(rng.uniform(0.01, 0.2, size), 4)
+        periods = rng.integers(6, 120, size)
+        method = rng.choice(['equal_annuity', 'equal_principal', 'flat_rate', 'floating_rate'], size)
+        guarantee = np.where(rng.random(size) < 0.1, 20000.0, 0.0)
+        resets = [[{'period': 3, 'new_rate': 0.09}] if name == 'floating_rate' else None for name in method]
+
+        expected = self.calculator.calculate_batch(pv, rate, periods, 12, method, guarantee, rate_reset_schedule=resets)
+        actual = executor.calculate_batch(pv, rate, periods, 12, method, guarantee, rate_reset_schedule=resets)
+
+        assert actual['error'] == expected['error']
+        assert actual['error'][17] == '租赁本金必须大于0'
+        for name in ('pmt', 'total_interest', 'total_payment', 'irr', 'total_offset'):
+            np.testing.assert_array_equal(actual[name], expected[name])
+
+    def test_sensitivity_grid(self, executor):
+        """测试敏感性网格保持广播后的形状"""
+        rates = np.linspace(0.01, 0.2, 20)[:, None]
+        terms = np.arange(12, 132, 12)[None, :]
+
+        expected = self.calculator.sensitivity_grid(1000000, rates, terms)
+        actual = executor.sensitivity_grid(1000000, rates, terms)
+
+        assert actual['pmt'].shape == (20, 10)
+        for name, values in expected.items():
+            np.testing.assert_array_equal(actual[name], values)
+
+    def test_reverse_calculate(self, executor):
+        """测试批量反向求解及逐行错误"""
+        targets = np.linspace(30000, 40000, 100)
+        result = executor.reverse_calculate_rate_batch(1000000, targets, 36)
+        single = self.calculator.reverse_calculate_rate(1000000, targets.item(70), 36)
+        assert result['calculated_rate'][70] == single['calculated_rate']
+        assert result['converged'].all()
+
+        irrs = np.append(np.linspace(0.01, 0.2, 99), -2)
+        result = executor.reverse_calculate_pmt_batch(1000000, irrs, 36, guarantee=50000)
+        single = self.calculator.reverse_calculate_pmt(1000000, irrs.item(10), 36, guarantee=50000)
+        assert result['calculated_pmt'][10] == single['calculated_pmt']
+        assert result['errors'] == [(99, '目标IRR必须大于-100%')]
+        assert np.isnan(result['calculated_pmt'][99])
+
+    def test_small_job_runs_in_process(self):
+        """测试不超过一块的任务不启动进程池"""
+        executor = ParallelExecutor(workers=4, chunk_size=1000)
+        result = executor.calculate_batch([1000000, 500000], 0.08, 36)
+        assert result['pmt'][0] == 31336.37
+        assert executor._pool is None
@@ -135,3 +135,70 @@ class TestPerformance:
         assert errors_queue.empty(), "并发计算出现错误"
         assert results_queue.qsize() == 10, "并发计算结果数量不正确"
         assert total_time < 5.0, f"并发计算时间过长: {total_time:.3f}秒"
+
+    def test_irr_performance(self):
+        """测试长期限IRR计算性能"""
+        result = self.calculator.equal_annuity_method(100000000, 0.08, 600, 12)
+        cash_flows = [-100000000] + result['schedule'].payment.tolist()
+        cash_flows[-1] -= 50000  # 非等额现金流
+
+        start_time = time.time()
+        for _ in range(100):
+            irr = self.calculator.calculate_irr(cash_flows, 12, guess=0.08 / 12)
+        calculation_time = (time.time() - start_time) / 100
+
+        assert abs(irr - ((1 + 0.08 / 12) ** 12 - 1)) < 1e-4
+        assert calculation_time < 0.01, f"IRR计算时间过长: {calculation_time:.4f}秒"
+
+    def test_irr_batch_performance(self):
+        """测试批量IRR性能"""
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        count = 20000
+        pv = rng.uniform(1e4, 1e7, count)
+        periods = rng.integers(12, 361, count)
+        rate = rng.uniform(0.002, 0.01, count)
+        pmt = np.round(pv * rate / (1 - (1 + rate) ** -periods), 2)
+
+        flows = np.zeros((count, 361))
+        flows[:, 0] = -pv
+        flows[:, 1:] = np.where(np.arange(1, 361) <= periods[:, None], pmt[:, None], 0.0)
+        flows[:, -1] += 10  # 补齐列之外追加非等额现金流，保证走Horner路径
+        periods[::2] = 360
+
+        start_time = time.time()
+        result = self.calculator.calculate_irr_batch(flows, 12, lengths=periods + 1, guess=rate)
+        total_time = time.time() - start_time
+
+        assert len(result) == count
+        assert total_time < 5.0, f"批量IRR计算时间过长: {total_time:.3f}秒"
+
+    def test_startup_imports(self):
+        """测试worker加载应用不导入导出、图表专用依赖，导入耗时与内存在预算内"""
+        import subprocess
+
+        script = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'benchmark_startup.py')
+        result = subprocess.run(
+            [sys.executable, script, '--runs', '1', '--max-seconds', '3', '--max-rss-mb', '80'],
+            capture_output=True, text=True,
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+
+    def test_preload_worker_memory(self, tmp_path):
+        """测试预加载模式下fork出的worker与master共享已加载的内存，私有内存少于各自加载应用"""
+        import json
+        import subprocess
+
+        script = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'measure_worker_memory.py')
+        private = {}
+        for mode in ('fork', 'preload'):
+            result = subprocess.run(
+                [sys.executable, script, '--simulate', mode, '--workers', '2'],
+                cwd=tmp_path, env=dict(os.environ, LEASE_SINGLE_FLIGHT='thread'),
+                capture_output=True, text=True,
+            )
+            assert result.returncode == 0, result.stderr
+            samples = json.loads(result.stdout.strip().splitlines()[-1])
+            private[mode] = max(sample['private'] for sample in samples)
+        assert private['preload'] < private['fork'] * 0.6, private
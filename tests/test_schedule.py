@@ -0,0 +1,79 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from lease_calculator import LeaseCalculator
+from schedule import Schedule
+
+
+class TestSchedule:
+    """列式还款计划测试"""
+
+    def setup_method(self):
+        self.calculator = LeaseCalculator()
+
+    def test_all_methods_return_schedule(self):
+        """测试四种计算方法均返回列式计划"""
+        results = [
+            self.calculator.equal_annuity_method(1000000, 0.08, 36, 12),
+            self.calculator.equal_principal_method(1000000, 0.08, 36, 12),
+            self.calculator.flat_rate_method(1000000, 0.08, 3, 12),
+            self.calculator.floating_rate_method(1000000, 0.08, 36, [{'period': 12, 'new_rate': 0.09}], 12),
+        ]
+        for result in results:
+            assert isinstance(result['schedule'], Schedule)
+            assert len(result['schedule']) == 36
+
+        assert results[3]['schedule'].has_rate
+        assert list(results[3]['schedule'][0].keys()) == [
+            'period', 'payment', 'principal', 'interest', 'rate', 'remaining_balance'
+        ]
+
+    def test_column_access_is_zero_copy(self):
+        """测试列访问不复制数据"""
+        schedule = self.calculator.equal_annuity_method(1000000, 0.08, 36, 12)['schedule']
+        assert schedule['payment'] is schedule.payment
+        assert schedule.payment.dtype == np.float64
+        assert schedule.period.dtype == np.int64
+        assert np.shares_memory(schedule[:12].interest, schedule.interest)
+
+    def test_row_views(self):
+        """测试行视图读写直接作用于列数组"""
+        schedule = self.calculator.equal_annuity_method(1000000, 0.08, 36, 12)['schedule']
+        row = schedule[-1]
+        assert row['period'] == 36
+        assert row['remaining_balance'] == 0.0
+        assert 'rate' not in row
+
+        row['payment'] = 1.5
+        assert schedule.payment[-1] == 1.5
+
+    def test_round_trip_records(self):
+        """测试与逐期字典列表互相转换"""
+        schedule = self.calculator.floating_rate_method(500000, 0.06, 24, [{'period': 6, 'new_rate': 0.05}])['schedule']
+        records = schedule.to_dicts()
+        assert isinstance(records[0]['period'], int)
+        assert isinstance(records[0]['payment'], float)
+        assert Schedule.from_records(records) == schedule
+        assert schedule == records
+
+    def test_guarantee_offset_updates_payment_column(self):
+        """测试保证金冲抵只改写租金列"""
+        schedule = self.calculator.equal_annuity_method(1000000, 0.08, 36, 12)['schedule']
+        pmt = schedule.payment[0]
+        offset = self.calculator.apply_guarantee_offset(schedule, pmt * 1.5, '尾期冲抵')
+
+        assert offset['modified_schedule'] is schedule
+        assert schedule.payment[-1] == 0.0
+        assert schedule.payment[-2] == pytest.approx(pmt * 0.5)
+        assert [item['period'] for item in offset['offset_details']] == [36, 35]
+
+    def test_mismatched_columns(self):
+        """测试列长度不一致时报错"""
+        with pytest.raises(ValueError):
+            Schedule(period=[1, 2], payment=[1.0], principal=[1.0], interest=[0.0], remaining_balance=[0.0])
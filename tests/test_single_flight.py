@@ -0,0 +1,203 @@
+"""
+重复请求合并（single-flight）测试
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(func, count):
+    """count 个线程同时调用 func，返回逐个结果（异常按原样返回）"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(k):
+        barrier.wait()
+        try:
+            results[k] = func()
+        except Exception as e:
+            results[k] = e
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def slow(value, calls, delay=0.2):
+    """记录调用次数的慢计算"""
+    def func():
+        calls.append(1)
+        time.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return func
+
+
+class TestSingleFlight:
+    """同一进程内线程间的合并"""
+
+    def test_threads_share_result(self):
+        """测试并发的相同键只计算一次，全部请求得到同一结果"""
+        flight, calls = SingleFlight(), []
+        results = run_concurrently(lambda: flight.do('a', slow({'pmt': 31336.37}, calls)), 8)
+        assert calls == [1]
+        assert all(result is results[0] for result in results)
+
+        stats = flight.stats()
+        assert (stats['executed'], stats['thread_shared'], stats['in_flight']) == (1, 7, 0)
+
+    def test_threads_share_error(self):
+        """测试计算失败时全部等待的请求得到同一异常"""
+        flight, calls = SingleFlight(), []
+        results = run_concurrently(lambda: flight.do('a', slow(ValueError('期数必须大于0'), calls)), 4)
+        assert calls == [1]
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_distinct_and_sequential(self):
+        """测试不同键并行计算，计算结束后的相同键重新计算"""
+        flight, calls = SingleFlight(), []
+        keys = iter('abab')
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                key = next(keys)
+            return flight.do(key, slow(key, calls))
+
+        assert sorted(run_concurrently(call, 4)) == ['a', 'a', 'b', 'b']
+        assert len(calls) == 2
+        flight.do('a', slow('a', calls, 0))
+        assert len(calls) == 3
+
+
+class TestCrossProcess:
+    """同一主机各worker进程间的合并"""
+
+    def test_forked_worker_shares_result(self, tmp_path):
+        """测试其他进程计算进行中时，本进程等待并读取其结果或异常"""
+        if not hasattr(os, 'fork'):
+            pytest.skip('需要fork')
+        flight = SingleFlight(str(tmp_path))
+        for value in ({'pid': 'child'}, ValueError('租赁本金必须大于0')):
+            started_read, started_write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                def func():
+                    os.write(started_write, b'1')
+                    time.sleep(0.3)
+                    if isinstance(value, Exception):
+                        raise value
+                    return value
+                try:
+                    flight.do('quote', func)
+                except ValueError:
+                    pass
+                os._exit(0)
+
+            os.read(started_read, 1)
+            calls = []
+            if isinstance(value, Exception):
+                with pytest.raises(ValueError, match='租赁本金'):
+                    flight.do('quote', slow('parent', calls, 0))
+            else:
+                assert flight.do('quote', slow('parent', calls, 0)) == {'pid': 'child'}
+            assert calls == []
+            assert os.waitpid(pid, 0)[1] == 0
+            os.close(started_read)
+            os.close(started_write)
+        assert flight.stats()['process_shared'] == 2
+
+        # 没有进程在计算时照常自行计算
+        assert flight.do('quote', lambda: 'parent') == 'parent'
+
+    def test_insecure_dir(self, tmp_path):
+        """测试其他用户可写的目录不用于跨进程合并"""
+        if not hasattr(os, 'getuid'):
+            pytest.skip('需要POSIX')
+        path = tmp_path / 'shared'
+        path.mkdir()
+        path.chmod(0o777)
+        with pytest.raises(ValueError):
+            SingleFlight(str(path))
+
+
+class TestEndpointsSingleFlight:
+    """计算、图表、Excel导出接口的请求合并"""
+
+    @pytest.fixture
+    def app_module(self, monkeypatch):
+        import app as app_module
+
+        monkeypatch.setattr(app_module, 'result_cache', None)
+        monkeypatch.setattr(app_module, 'single_flight', SingleFlight())
+        app_module.app.config['TESTING'] = True
+        return app_module
+
+    @staticmethod
+    def post_concurrently(app_module, url, payload, count=4):
+        def post():
+            with app_module.app.test_client() as client:
+                response = client.post(url, json=payload)
+                return response.status_code, response.data
+        return run_concurrently(post, count)
+
+    def test_calculate(self, app_module, monkeypatch):
+        """测试相同的并发计算请求只计算一次，参数错误同样共享"""
+        calls = []
+        method = app_module.calculator.equal_annuity_method
+
+        def counted(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(app_module.calculator, 'equal_annuity_method', counted)
+        payload = {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 36}
+        responses = self.post_concurrently(app_module, '/api/calculate', payload)
+        assert calls == [1]
+        assert {status for status, _ in responses} == {200}
+        assert len({json.dumps(json.loads(body)['data'], sort_keys=True) for _, body in responses}) == 1
+        assert json.loads(responses[0][1])['data']['pmt'] == 31336.37
+
+        responses = self.post_concurrently(app_module, '/api/calculate', dict(payload, pv=-1))
+        assert len(calls) == 2
+        assert {status for status, _ in responses} == {400}
+
+    def test_export_and_charts(self, app_module, monkeypatch):
+        """测试相同的并发导出、图表请求只生成一次"""
+        with app_module.app.test_client() as client:
+            payload = {'method': 'equal_annuity', 'pv': 1000000, 'annual_rate': 0.08, 'periods': 12}
+            result = json.loads(client.post('/api/calculate', json=payload).data)['data']
+
+        for name, url in (
+            ('build_excel_report', '/api/export/excel'),
+            ('build_payment_structure_chart', '/api/charts/payment_structure'),
+            ('build_cash_flow_chart', '/api/charts/cash_flow'),
+        ):
+            calls = []
+            build = getattr(app_module, name)
+
+            def counted(data, build=build, calls=calls):
+                calls.append(1)
+                time.sleep(0.2)
+                return build(data)
+
+            monkeypatch.setattr(app_module, name, counted)
+            responses = self.post_concurrently(app_module, url, result)
+            assert calls == [1], url
+            assert {status for status, _ in responses} == {200}
+            shared = {body if name == 'build_excel_report' else json.loads(body)['chart'] for _, body in responses}
+            assert len(shared) == 1